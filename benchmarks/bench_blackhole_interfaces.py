@@ -0,0 +1,40 @@
+"""
+Blackhole interface padding cost for dense and sparse port usage.
+
+Usage: PYTHONPATH=. python benchmarks/bench_blackhole_interfaces.py
+"""
+from grifter.api import add_blackhole_interfaces
+
+from topology import timed
+
+PORTS = [24, 64, 96]
+GUESTS = 1000
+
+
+def interfaces(ports, step):
+    return [
+        {'local_port': port, 'remote_guest': 'peer', 'remote_port': port}
+        for port in range(1, ports + 1, step)
+    ]
+
+
+def pad_guests(ports, interface_list):
+    for _ in range(GUESTS):
+        add_blackhole_interfaces(1, ports, interface_list)
+
+
+def main():
+    print(f'{"usage":>8} {"ports":>6} {"declared":>9} {"per guest (us)":>16}')
+    for usage, step in (('dense', 1), ('sparse', 8)):
+        for ports in PORTS:
+            interface_list = interfaces(ports, step)
+            if step == 1:
+                # A fully declared list is returned as is, drop one port
+                # so the padding path is exercised.
+                interface_list = interface_list[1:]
+            elapsed = timed(pad_guests, ports, interface_list)
+            print(f'{usage:>8} {ports:>6} {len(interface_list):>9} {elapsed / GUESTS * 1e6:>16.1f}')
+
+
+if __name__ == '__main__':
+    main()
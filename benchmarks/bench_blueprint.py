@@ -0,0 +1,42 @@
+"""
+Blueprint expansion time for Clos, ring and mesh fabrics.
+
+Usage: PYTHONPATH=. python benchmarks/bench_blueprint.py
+"""
+from grifter.api import get_default_config
+from grifter.blueprint import expand_blueprint
+
+from topology import timed
+
+BOX = 'CumulusCommunity/cumulus-vx'
+
+BLUEPRINTS = [
+    ('clos 96x96', {
+        'topology': 'clos',
+        'spines': {'count': 96, 'box': BOX},
+        'leaves': {'count': 96, 'box': BOX},
+    }),
+    ('ring 5000', {
+        'topology': 'ring',
+        'nodes': {'count': 5000, 'box': BOX},
+        'links': 4,
+    }),
+    ('mesh 97', {
+        'topology': 'mesh',
+        'nodes': {'count': 97, 'box': BOX},
+    }),
+]
+
+
+def main():
+    config = get_default_config()
+    print(f'{"blueprint":>12} {"guests":>8} {"links":>8} {"expand (s)":>11}')
+    for name, blueprint in BLUEPRINTS:
+        guests = expand_blueprint(blueprint, config)
+        links = sum(len(data['data_interfaces']) for data in guests.values()) // 2
+        seconds = timed(expand_blueprint, blueprint, config)
+        print(f'{name:>12} {len(guests):>8} {links:>8} {seconds:>11.3f}')
+
+
+if __name__ == '__main__':
+    main()
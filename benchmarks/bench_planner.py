@@ -0,0 +1,30 @@
+"""
+Capacity planning cost on merged guest data.
+
+Usage: PYTHONPATH=. python benchmarks/bench_planner.py
+"""
+from grifter.api import update_guest_data
+from grifter.planner import (
+    topology_requirements,
+    plan_capacity,
+)
+
+from topology import make_guests, timed
+
+SIZES = [100, 1000, 10000]
+CAPACITY = {'cpus': 64, 'memory': 256 * 1024, 'huge_pages_memory': 0}
+
+
+def plan(guests):
+    plan_capacity(topology_requirements(guests), CAPACITY)
+
+
+def main():
+    print(f'{"guests":>8} {"plan (ms)":>10}')
+    for size in SIZES:
+        guests = update_guest_data(make_guests(size))
+        print(f'{size:>8} {timed(plan, guests) * 1e3:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Vagrantfile render time from scratch, with every guest block cached and
+with the block of one guest changed.
+
+Usage: PYTHONPATH=. python benchmarks/bench_regeneration.py
+"""
+import os
+import tempfile
+
+from grifter.api import (
+    get_default_config,
+    generate_loopbacks,
+    generate_vagrant_file,
+    update_guest_data,
+    update_guest_interfaces,
+)
+from grifter.cache import guest_digest
+
+from topology import make_guests, timed
+
+SIZES = [100, 1000, 2000]
+PORTS = 8
+
+
+def main():
+    config = get_default_config()
+    print(f'{"guests":>8} {"full (s)":>9} {"cached (s)":>11} {"one changed (s)":>16}')
+    with tempfile.TemporaryDirectory() as directory:
+        for size in SIZES:
+            guest_data = make_guests(size, ports=PORTS)
+            guest_digests = {guest: guest_digest(data) for guest, data in guest_data.items()}
+            guests = update_guest_interfaces(update_guest_data(guest_data), config)
+            loopbacks = generate_loopbacks(guests)
+            filename = os.path.join(directory, f'Vagrantfile-{size}')
+            block_cache = {}
+
+            def render(cache):
+                generate_vagrant_file(guests, loopbacks, filename=filename, domain_uuid='benchmark',
+                                      block_cache=cache, guest_digests=guest_digests)
+
+            full = timed(render, None, repeat=1)
+            render(block_cache)
+            cached = timed(render, block_cache)
+
+            def change_one_guest():
+                guests['sw0']['provider_config']['cpus'] += 1
+                guest_digests['sw0'] = guest_digest(guests['sw0'].to_dict())
+                render(block_cache)
+
+            changed = timed(change_one_guest)
+            print(f'{size:>8} {full:>9.3f} {cached:>11.3f} {changed:>16.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Vagrantfile size, render time and Ruby parse time of the unrolled and
+compact templates. Parse time is measured with `ruby -c` when ruby is
+installed.
+
+Usage: PYTHONPATH=. python benchmarks/bench_vagrantfile.py
+"""
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+from grifter.api import (
+    get_default_config,
+    generate_loopbacks,
+    generate_vagrant_file,
+    update_guest_data,
+    update_guest_interfaces,
+)
+from grifter.constants import (
+    COMPACT_VAGRANTFILE_TEMPLATE,
+    VAGRANTFILE_TEMPLATE,
+)
+
+from topology import make_guests, timed
+
+SIZES = [100, 1000]
+PORTS = 32
+TEMPLATES = {
+    'unrolled': VAGRANTFILE_TEMPLATE,
+    'compact': COMPACT_VAGRANTFILE_TEMPLATE,
+}
+
+
+def ruby_parse_time(filename):
+    start = time.perf_counter()
+    subprocess.run(['ruby', '-c', filename], check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def main():
+    ruby = shutil.which('ruby')
+    config = get_default_config()
+    print(f'{"mode":>10} {"guests":>8} {"size (KB)":>10} {"render (s)":>11} {"ruby -c (s)":>12}')
+    with tempfile.TemporaryDirectory() as directory:
+        for size in SIZES:
+            guests = update_guest_interfaces(update_guest_data(make_guests(size, ports=PORTS)), config)
+            loopbacks = generate_loopbacks(guests)
+            for mode, template_name in TEMPLATES.items():
+                filename = os.path.join(directory, f'Vagrantfile-{mode}-{size}')
+                elapsed = timed(
+                    generate_vagrant_file, guests, loopbacks, template_name=template_name,
+                    filename=filename, domain_uuid='benchmark', repeat=1)
+                parse = f'{ruby_parse_time(filename):>12.3f}' if ruby else f'{"n/a":>12}'
+                print(f'{mode:>10} {size:>8} {os.path.getsize(filename) / 1024:>10.0f} '
+                      f'{elapsed:>11.3f} {parse}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,25 @@
+"""
+Per-guest schema validation cost for each validator engine.
+
+Usage: PYTHONPATH=. python benchmarks/bench_validators.py
+"""
+from grifter.validators import validate_data, VALIDATOR_ENGINES
+
+from topology import make_guests, timed
+
+SIZES = [10, 100, 1000, 10000]
+
+
+def main():
+    print(f'{"engine":>10} {"guests":>8} {"total (s)":>12} {"per guest (us)":>16}')
+    for engine in VALIDATOR_ENGINES:
+        # Load and compile the schema outside of the timed runs.
+        validate_data({}, engine=engine)
+        for size in SIZES:
+            guests = make_guests(size)
+            elapsed = timed(validate_data, guests, engine=engine, repeat=1)
+            print(f'{engine:>10} {size:>8} {elapsed:>12.4f} {elapsed / size * 1e6:>16.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""
+Synthetic topology helpers shared by the benchmark scripts.
+"""
+
+
+def make_guests(num_guests, box='CumulusCommunity/cumulus-vx', ports=4):
+    """
+    Build a guests dict where each guest is wired to its neighbours in a ring.
+    :param num_guests: Number of guests to create
+    :param box: Vagrant box name for every guest
+    :param ports: Number of data interfaces per guest, must be even
+    :return: Dict of guest data in the guests file format
+    """
+    guests = {}
+    for i in range(num_guests):
+        data_interfaces = []
+        for port in range(1, ports + 1, 2):
+            step = (port + 1) // 2
+            data_interfaces.append({
+                'local_port': port,
+                'remote_guest': f'sw{(i + step) % num_guests}',
+                'remote_port': port + 1,
+            })
+            data_interfaces.append({
+                'local_port': port + 1,
+                'remote_guest': f'sw{(i - step) % num_guests}',
+                'remote_port': port,
+            })
+        guests[f'sw{i}'] = {
+            'vagrant_box': {'name': box},
+            'provider_config': {'nic_adapter_count': ports, 'cpus': 1, 'memory': 768},
+            'data_interfaces': data_interfaces,
+        }
+    return guests
+
+
+def timed(func, *args, repeat=3, **kwargs):
+    """
+    Return the best wall clock time in seconds of repeat calls to func.
+    """
+    import time
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
@@ -1,37 +1,60 @@
 import os
-import copy
+import hashlib
+import json
 import logging
-import random
 import pathlib
+import shutil
+import sys
+import tempfile
 import time
 
+from collections import namedtuple
+from collections.abc import Mapping
+
 from .utils import (
+    get_image_virtual_size,
+    get_mac,
     get_uuid,
-    remove_duplicates,
-    sort_nicely,
-    dict_merge,
+    natural_key,
+    file_digest,
+    LayeredDict,
 )
 from .custom_filters import (
     explode_port,
+    tunnel_port,
 )
 from .loaders import (
     render_from_template,
     load_data,
     load_config_file,
 )
+from .shards import (
+    partition_guests,
+    generate_cross_host_endpoints,
+)
+from .validators import validate_links
+from .cache import guest_digest
 from .constants import (
     TEMPLATES_DIR,
+    SHARD_DIRECTORY_FORMAT,
     BLACKHOLE_LOOPBACK_MAP,
-    ALL_GUEST_DEFAULTS,
+    BLACKHOLE_PORT,
     DEFAULT_CONFIG_FILE,
+    GUEST_BLOCK_TEMPLATES,
+    INTERFACE_BASE_PORTS,
     VAGRANTFILE_BACKUP_DIR,
+    VAGRANTFILE_TEMPLATE,
+    VAGRANTFILE_VOLATILE_LINES,
+    VAGRANTFILE_GENERATED_UUID_LINE,
     TIMESTAMP_FORMAT,
+    get_all_guest_defaults,
 )
 
 logger = logging.getLogger(__name__)
 
 custom_filters = [
     explode_port,
+    tunnel_port,
 ]
 
 
@@ -39,11 +62,31 @@ def get_default_config(config=DEFAULT_CONFIG_FILE):
     return load_data(config)
 
 
+CONNECTION_FIELDS = ('local_guest', 'local_port', 'remote_guest', 'remote_port')
+_CONNECTION_FIELD_INDEX = {field: i for i, field in enumerate(CONNECTION_FIELDS)}
+
+
+class Connection(namedtuple('Connection', CONNECTION_FIELDS)):
+    """
+    A link between the data interfaces of two guests. Fields can also be
+    read by name with [] like a connection dict, eg: connection['local_port'].
+    """
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            key = _CONNECTION_FIELD_INDEX[key]
+        return tuple.__getitem__(self, key)
+
+
 def generate_connection_strings(connections, dotfile=False):
     """
     Generate a list of connection strings. The format of connections
     is the output from the 'generate_int_to_port_mappings' function.
-    :param connections: List of dicts containing connection information ie:
+    Connections are sorted naturally by local guest, local port, remote
+    guest and remote port before they are formatted, the sort key of
+    each guest and port name is computed once.
+    :param connections: List of Connections or dicts containing connection information ie:
       [{'local_guest': 'p1sw1',
         'local_port': 'swp7',
         'remote_guest': 'p1r7',
@@ -51,15 +94,24 @@ def generate_connection_strings(connections, dotfile=False):
     :param dotfile: Generate a dotfile format undirected link
     :return: List of connection strings
     """
+    name_keys = {}
+
+    def name_key(name):
+        key = name_keys.get(name)
+        if key is None:
+            key = name_keys[name] = natural_key(name)
+        return key
+
+    def sort_key(x):
+        return (name_key(x['local_guest']), name_key(x['local_port']),
+                name_key(x['remote_guest']), name_key(x['remote_port']))
+
     def make_link(x):
         if dotfile:
             return f'''"{x['local_guest']}":"{x['local_port']}" -- "{x['remote_guest']}":"{x['remote_port']}";'''
         else:
             return f"{x['local_guest']}-{x['local_port']} <--> {x['remote_guest']}-{x['remote_port']}"
-    connections_list = []
-    for connection in connections:
-        connections_list.append(make_link(connection))
-    return sort_nicely(connections_list)
+    return [make_link(connection) for connection in sorted(connections, key=sort_key)]
 
 
 def int_to_port_map(name, offset, number_of_interfaces):
@@ -127,29 +179,114 @@ def generate_guest_interface_mappings(config_file=DEFAULT_CONFIG_FILE):
     return mappings
 
 
-def generate_connections_list(guests, int_map, unique=False):
+def generate_connections_list(guests, int_map, unique=False, check_links=True):
     """
     Generate a map of interface connections.
     :param guests: Dict of guests data
     :param int_map: Dict of interface mappings
     :param unique: Remove duplicate connection between guests
-    :return: List of Dicts of connections between guests
+    :param check_links: Raise an AttributeError with the errors from
+                        validators.validate_links if a port is used more
+                        than once or a link is not declared on both guests.
+                        Without the check every declared link is returned,
+                        including those of a port used more than once.
+    :return: List of Connections between guests in the order they are
+             declared, guest and remote guest names are interned
     """
-    dict_keys = ('local_guest', 'local_port', 'remote_guest', 'remote_port')
+    if check_links:
+        link_errors = validate_links(guests)
+        if link_errors:
+            raise AttributeError('\n'.join(link_errors))
+
     connections = []
+    # ((guest, local_port), (remote_guest, remote_port)) of each link seen.
+    seen_links = set()
     box_map = {k: v['vagrant_box']['name'] for k, v in guests.items()}
     for k, v in guests.items():
         if v.get('data_interfaces'):
+            k = sys.intern(k)
             for i in v['data_interfaces']:
                 if not i['remote_guest'] == 'blackhole':
+                    port = (k, i['local_port'])
+                    remote = (i['remote_guest'], i['remote_port'])
+                    # The port pair is the undirected key of the link, it
+                    # is a duplicate if the remote side was seen first.
+                    if unique and remote != port and (remote, port) in seen_links:
+                        continue
+                    seen_links.add((port, remote))
                     local_box = box_map[k]
                     local_int = int_map[local_box]['data_interfaces'][i['local_port']]
                     remote_box = box_map[i['remote_guest']]
                     remote_int = int_map[remote_box]['data_interfaces'][i['remote_port']]
-                    connections.append((k, local_int, i['remote_guest'], remote_int))
-    if unique:
-        return [dict(zip(dict_keys, i)) for i in remove_duplicates(connections)]
-    return [dict(zip(dict_keys, i)) for i in connections]
+                    connections.append(Connection(k, local_int, sys.intern(i['remote_guest']), remote_int))
+    return connections
+
+
+def add_reverse_interfaces(guest_data):
+    """
+    Add the missing reverse side of each data interface link so that a
+    link only needs to be declared on one of the two guests. Links whose
+    remote port is already in use are left for validation to report.
+    :param guest_data: Dict of merged guest data
+    :return: Updated dict of guest data
+    """
+    occupied = set()
+    for guest, data in guest_data.items():
+        for interface in data.get('data_interfaces') or []:
+            occupied.add((guest, interface['local_port']))
+
+    reverse_interfaces = {}
+    for guest, data in guest_data.items():
+        for interface in data.get('data_interfaces') or []:
+            remote_guest = interface['remote_guest']
+            if remote_guest == 'blackhole' or remote_guest not in guest_data:
+                continue
+            remote_port = (remote_guest, interface['remote_port'])
+            if remote_port not in occupied:
+                occupied.add(remote_port)
+                reverse_interfaces.setdefault(remote_guest, []).append({
+                    'local_port': interface['remote_port'],
+                    'remote_guest': guest,
+                    'remote_port': interface['local_port'],
+                })
+
+    # Build new lists rather than appending, the interface lists may be
+    # shared with the caller's guest data.
+    for guest, interfaces in reverse_interfaces.items():
+        data = guest_data[guest]
+        data['data_interfaces'] = list(data.get('data_interfaces') or []) + interfaces
+    return guest_data
+
+
+def add_link_interfaces(guest_data, links):
+    """
+    Add data interfaces from a stream of links, as from iter_links, to
+    the guests they are local to. Links are grouped per guest in a
+    single pass over the stream.
+    :param guest_data: Dict of guest data
+    :param links: Iterable of dicts with local_guest, local_port,
+                  remote_guest and remote_port keys
+    :return: List of errors
+    """
+    errors = []
+    link_interfaces = {}
+    for link in links:
+        guest = link['local_guest']
+        if guest not in guest_data:
+            errors.append(f'Link from unknown guest: {guest} local_port: {link["local_port"]}')
+            continue
+        link_interfaces.setdefault(guest, []).append({
+            'local_port': link['local_port'],
+            'remote_guest': link['remote_guest'],
+            'remote_port': link['remote_port'],
+        })
+
+    # Build new lists rather than appending, the interface lists may be
+    # shared with the caller's guest data.
+    for guest, interfaces in link_interfaces.items():
+        data = guest_data[guest]
+        data['data_interfaces'] = list(data.get('data_interfaces') or []) + interfaces
+    return errors
 
 
 def create_reserved_interfaces(num_reserved_interfaces):
@@ -169,67 +306,157 @@ def generate_blackhole_interface_map(guests, int_map):
     return blackhole_interfaces
 
 
-def generate_loopbacks(guest_dict=None):
+def loopback_address(index):
+    """
+    Map an index in the loopback pool to an address. The pool covers
+    127.2.0.1 to 127.254.255.254, skipping .0 and .255 host octets.
+    :param index: Index from 0 to LOOPBACK_POOL_SIZE - 1
+    :return: Loopback address string
+    """
+    second, remainder = divmod(index, 256 * 254)
+    third, fourth = divmod(remainder, 254)
+    return f'127.{second + 2}.{third}.{fourth + 1}'
+
+
+LOOPBACK_POOL_SIZE = 253 * 256 * 254
+
+
+def generate_loopbacks(guest_dict=None, allocated=None):
     """
-    Generate a dict of loopback addresses
+    Generate a dict of loopback addresses. Each guest is allocated an
+    address derived from a hash of its name so allocations are stable
+    between runs. Collisions are resolved by probing the next address,
+    with guests processed in name order to keep the result deterministic.
     :param guest_dict: List of guests
+    :param allocated: Dict of prior guest to loopback allocations, guests
+                      that are still present keep their address
     :return: Dictionary of loopback addresses
     """
     if guest_dict is None or not isinstance(guest_dict, dict):
         raise AttributeError('guest_dict should contain a list of guests')
     elif not guest_dict:
         raise ValueError('dict of guests is empty')
+    elif len(guest_dict) >= LOOPBACK_POOL_SIZE:
+        raise ValueError(f'more than {LOOPBACK_POOL_SIZE - 1} guests cannot be allocated a loopback')
+
+    reserved = set(BLACKHOLE_LOOPBACK_MAP.values())
+    allocated_loopbacks = set()
+    guest_to_loopback_map = {}
+    for guest, loopback in (allocated or {}).items():
+        if guest in guest_dict and loopback not in reserved and loopback not in allocated_loopbacks:
+            allocated_loopbacks.add(loopback)
+            guest_to_loopback_map[guest] = loopback
+
+    for guest in sorted(guest_dict, key=str):
+        if guest in guest_to_loopback_map:
+            continue
+        digest = hashlib.sha256(str(guest).encode()).digest()
+        index = int.from_bytes(digest[:8], 'big') % LOOPBACK_POOL_SIZE
+        loopback = loopback_address(index)
+        while loopback in allocated_loopbacks or loopback in reserved:
+            index = (index + 1) % LOOPBACK_POOL_SIZE
+            loopback = loopback_address(index)
+        allocated_loopbacks.add(loopback)
+        guest_to_loopback_map[guest] = loopback
+
+    guest_to_loopback_map = {guest: guest_to_loopback_map[guest] for guest in guest_dict}
+    return {**guest_to_loopback_map, **BLACKHOLE_LOOPBACK_MAP}
 
-    def generate_network():
-        net = f'127.{random.randint(2, 254)}.{random.randint(2, 254)}'
-        if net == '127.6.6':
-            generate_network()
-        return net
-    network = generate_network()
-    guests = list(guest_dict.keys())
-    loopbacks = [f'{network}.{i}' for i in range(1, len(guests) + 1)]
-    guest_to_loopback_map = dict(zip(guests, loopbacks))
 
-    return {**guest_to_loopback_map, **BLACKHOLE_LOOPBACK_MAP}
+def guest_interface_names(guest, data, int_map):
+    """
+    Names of the libvirt interfaces created for a guest, without the
+    domain_uuid suffix added in the Vagrantfile.
+    :param guest: Guest name
+    :param data: Dict of guest data
+    :param int_map: Dict of interface mappings
+    :return: List of interface names
+    """
+    data_int_map = int_map[data['vagrant_box']['name']]['data_interfaces']
+    names = []
+    for interface in data.get('internal_interfaces') or []:
+        names.append(f'{guest}-internal-{interface["local_port"]}')
+    for interface in data.get('reserved_interfaces') or []:
+        names.append(f'{guest}-reserved-{interface["local_port"]}')
+    for interface in data.get('data_interfaces') or []:
+        names.append(f'{guest}-{data_int_map[interface["local_port"]]}')
+    return names
+
+
+def generate_macs(guests, int_map, allocated=None):
+    """
+    Generate a dict of interface name to MAC address. Interfaces that
+    are still present keep their prior MAC, new interfaces are given a
+    random MAC that is not already in use.
+    :param guests: Dict of guest data
+    :param int_map: Dict of interface mappings
+    :param allocated: Dict of prior interface name to MAC allocations
+    :return: Dictionary of MAC addresses
+    """
+    allocated = allocated or {}
+    interface_names = []
+    for guest, data in guests.items():
+        interface_names += guest_interface_names(guest, data, int_map)
+
+    macs = {name: allocated[name] for name in interface_names if name in allocated}
+    used_macs = set(macs.values())
+    for name in interface_names:
+        if name in macs:
+            continue
+        mac = get_mac()
+        while mac in used_macs:
+            mac = get_mac()
+        used_macs.add(mac)
+        macs[name] = mac
+    return macs
 
 
 def merge_user_config():
     default_config = get_default_config()
     user_config = load_config_file('config.yml')
     if user_config:
-        merged_config = dict_merge(copy.deepcopy(default_config), user_config)
-        return merged_config
+        return LayeredDict(default_config, user_config)
     return default_config
 
 
 def update_guest_data(
         guest_data,
         guest_defaults_file='guest-defaults.yml',
-        all_guest_defaults=ALL_GUEST_DEFAULTS):
+        all_guest_defaults=None,
+        guest_defaults=None):
     """
     Build data vars for guests. This function will take all_guest_defaults and merge in
     guest and guest group vars.
+    Each guest is a LayeredDict view over its host vars and a context of
+    the defaults merged with its box group vars. The group contexts are
+    merged once per box type and host vars are never copied.
     :param guest_data: Dict of guest data
     :param guest_defaults_file: Guest defaults filename
-    :param all_guest_defaults: All guest default data
+    :param all_guest_defaults: All guest default data, defaults to
+                               the packaged guest defaults
+    :param guest_defaults: Guest group vars already loaded from
+                           guest_defaults_file
     :return: Updated Dict of guest data
     """
+    if all_guest_defaults is None:
+        all_guest_defaults = get_all_guest_defaults()
 
-    guest_defaults = load_config_file(guest_defaults_file)
+    if guest_defaults is None:
+        guest_defaults = load_config_file(guest_defaults_file)
+    default_context = all_guest_defaults['guest_defaults']
 
+    group_contexts = {}
     new_guest_data = {}
     for guest, data in guest_data.items():
-        # Copy the default dict, that contains all top level variables
-        # Group vars, then host vars will be merged into this dict
-        default_context = copy.deepcopy(all_guest_defaults['guest_defaults'])
         if guest_defaults and data['vagrant_box'].get('name') in guest_defaults:
             # Merge group vars with host vars
-            group_context = guest_defaults.get(data['vagrant_box']['name'])
-            new_context = dict_merge(default_context, group_context)
-            new_guest_data.update({guest: (dict_merge(new_context, data))})
+            box_name = data['vagrant_box']['name']
+            if box_name not in group_contexts:
+                group_contexts[box_name] = LayeredDict(default_context, guest_defaults[box_name])
+            new_guest_data.update({guest: LayeredDict(group_contexts[box_name], data)})
         else:
             # No group vars found, just merge host vars
-            new_guest_data.update({guest: (dict_merge(default_context, data))})
+            new_guest_data.update({guest: LayeredDict(default_context, data)})
     return new_guest_data
 
 
@@ -237,7 +464,7 @@ def blackhole_interface_config(port_number):
     return {
         'local_port': port_number,
         'remote_guest': 'blackhole',
-        'remote_port': 666
+        'remote_port': BLACKHOLE_PORT
         }
 
 
@@ -245,6 +472,8 @@ def add_blackhole_interfaces(offset, total_interfaces, interface_list):
     """
     Adds blackhole interfaces to host data by inserting a
     dict of blackhole config in the correct interface index position.
+    Runs in O(ports) using a port to interface map. The interface dicts
+    in the returned list are the ones from interface_list, not copies.
     :param offset: Interface numbering offset.
     :param total_interfaces: Total number of interfaces.
     :param interface_list: List of interface dicts to update.
@@ -253,22 +482,17 @@ def add_blackhole_interfaces(offset, total_interfaces, interface_list):
     if total_interfaces == len(interface_list):
         return interface_list
 
+    port_map = {}
+    for interface in interface_list:
+        # The first interface declared for a port wins.
+        port_map.setdefault(interface['local_port'], interface)
+
     updated_interface_list = []
     for i in range(offset, total_interfaces + offset):
-        for interface in interface_list:
-            try:
-                if interface['local_port'] == i:
-                    updated_interface_list.append(interface)
-                    # When a port number is matched terminate the
-                    # loop to prevent adding unnecessary interfaces.
-                    break
-            except IndexError:
-                # Have run out of interfaces in the original list.
-                # Blackhole interfaces will populate the rest of the list
-                updated_interface_list.append(blackhole_interface_config(i))
-        else:
-            # No match on the port number so add a blackhole interface.
-            updated_interface_list.append(blackhole_interface_config(i))
+        interface = port_map.get(i)
+        if interface is None:
+            interface = blackhole_interface_config(i)
+        updated_interface_list.append(interface)
 
     return updated_interface_list
 
@@ -301,7 +525,7 @@ def update_guest_interfaces(guest_data, config):
             updated_interfaces = add_blackhole_interfaces(
                 config['guest_config'][guest_box]['data_interface_offset'],
                 data['provider_config']['nic_adapter_count'],
-                copy.deepcopy(data['data_interfaces'])
+                data['data_interfaces']
             )
             data['data_interfaces'] = updated_interfaces
             updated_guest_dict.update({guest: data})
@@ -311,74 +535,336 @@ def update_guest_interfaces(guest_data, config):
 
 def update_guest_additional_storage(guest_data):
     """
-    Add storage volume size to additional storage volumes
+    Add storage volume size to additional storage volumes. Overlay volumes
+    are sized to the virtual size of their base image.
     :param guest_data: List of host dicts.
     :return: New dict of guest data.
     """
+    # Guests commonly share the same images, only stat each once.
+    sizes = {}
     updated_guest_dict = {}
     for guest, data in guest_data.items():
         if not data['provider_config'].get('additional_storage_volumes'):
             updated_guest_dict.update({guest: data})
         else:
             for volume in data['provider_config']['additional_storage_volumes']:
-                try:
-                    volume['size'] = os.path.getsize(volume['location'])
-                except OSError:
-                    raise OSError(f'No such file: {volume["location"]}')
+                key = (volume['location'], bool(volume.get('overlay')))
+                if key not in sizes:
+                    try:
+                        if volume.get('overlay'):
+                            sizes[key] = get_image_virtual_size(volume['location'])
+                        else:
+                            sizes[key] = os.path.getsize(volume['location'])
+                    except OSError:
+                        raise OSError(f'No such file: {volume["location"]}')
+                volume['size'] = sizes[key]
             updated_guest_dict.update({guest: data})
 
     return updated_guest_dict
 
 
+def write_if_changed(filename, render, ignore_prefixes=(), backup_dir=None):
+    """
+    Render a file to a temporary file alongside filename and atomically
+    move it into place only if its content differs from the existing file.
+    :param filename: Destination file path
+    :param render: Callable that writes the content to the file object it is given
+    :param ignore_prefixes: Line prefixes excluded from the content comparison
+    :param backup_dir: Directory to back up the existing file to on change
+    :return: True if the file was written, False if it was unchanged
+    """
+    target = pathlib.Path(filename)
+    fd, tmp_name = tempfile.mkstemp(
+        dir=str(target.parent), prefix=f'.{target.name}-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            render(f)
+
+        if target.exists():
+            if file_digest(tmp_name, ignore_prefixes) == file_digest(target, ignore_prefixes):
+                os.unlink(tmp_name)
+                return False
+            if backup_dir is not None:
+                backup_path = pathlib.Path(backup_dir)
+                if not backup_path.exists():
+                    backup_path.mkdir()
+                time_now = time.strftime(TIMESTAMP_FORMAT)
+                shutil.copy2(str(target), str(backup_path / f'{target.name}-{time_now}'))
+
+        # mkstemp creates files readable by the owner only.
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp_name, 0o666 & ~umask)
+        os.replace(tmp_name, str(target))
+    except BaseException:
+        if os.path.exists(tmp_name):
+            os.unlink(tmp_name)
+        raise
+    return True
+
+
+def guest_block_key(
+        template_name, guest, guests, guest_digests, loopbacks, interface_mappings, macs,
+        tunnel_endpoints,
+        ):
+    """
+    Digest of the data a guest block template reads. Rather than
+    serialising the merged guest data, it is keyed on the input digest of
+    the guest, the links of the guest, which include those added from the
+    other side with reverse links, and the box and loopback of each remote
+    guest, along with the loopbacks, MACs, storage volume sizes and tunnel
+    endpoints of the guest. The rest of the merged data comes from the
+    config, guest defaults and options, which are part of cache.inputs_digest.
+    :param template_name: Name of the guest block template
+    :param guest: Guest name
+    :param guests: Dictionary of guest data
+    :param guest_digests: Dictionary of guest to the digest of its data as
+                          loaded from the datafile, see cache.guest_digest
+    :param loopbacks: Dictionary of loopback addresses
+    :param interface_mappings: Dictionary of guest type interface port mappings
+    :param macs: Dictionary of interface MAC addresses
+    :param tunnel_endpoints: Dictionary of (guest, local_port) to tunnel endpoints
+    :return: Hex digest string
+    """
+    data = guests[guest]
+    links = [
+        (interface_type, interface['local_port'], interface['remote_guest'], interface['remote_port'])
+        for interface_type in INTERFACE_BASE_PORTS
+        for interface in data.get(interface_type) or []
+    ]
+    remote_guests = sorted({link[2] for link in links}, key=str)
+    key = {
+        'template': template_name,
+        'guest': guest,
+        'digest': guest_digests[guest],
+        'loopback': loopbacks.get(guest),
+        'links': links,
+        'remote_guests': [
+            (i, guests[i]['vagrant_box']['name'] if i in guests else None, loopbacks.get(i))
+            for i in remote_guests
+        ],
+        'macs': [macs.get(i) for i in guest_interface_names(guest, data, interface_mappings)],
+        'volume_sizes': [
+            volume.get('size') for volume in data['provider_config'].get('additional_storage_volumes') or []],
+        'tunnel_endpoints': [
+            tunnel_endpoints.get((guest, interface['local_port']))
+            for interface in data.get('data_interfaces') or []
+        ] if tunnel_endpoints else None,
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class _MergedDataDigests(dict):
+    """
+    Guest digests computed from the merged guest data on first use, for
+    callers that do not have the digests of the datafile.
+    """
+    def __init__(self, guests):
+        super().__init__()
+        self._guests = guests
+
+    def __missing__(self, guest):
+        data = self._guests[guest]
+        digest = guest_digest(data.to_dict() if isinstance(data, LayeredDict) else data)
+        self[guest] = digest
+        return digest
+
+
+class GuestBlocks(Mapping):
+    """
+    Rendered blocks of the guests defined in a Vagrantfile, by guest name.
+    A block is rendered from the guest block template when it is read,
+    while the Vagrantfile is streamed, unless block_cache holds a block
+    with the same guest_block_key. Rendered blocks are added to block_cache.
+    """
+    def __init__(self, template_name, template_directory, block_cache, guest_digests=None, **context):
+        """
+        :param template_name: Name of the guest block template
+        :param template_directory: Template directory location
+        :param block_cache: Dict of guest to (key, block) tuples
+        :param guest_digests: Dictionary of guest to the digest of its data as
+                              loaded from the datafile, computed from the
+                              merged guest data if not set
+        :param context: Vagrantfile template context
+        """
+        self.template_name = template_name
+        self.template_directory = template_directory
+        self.block_cache = block_cache
+        self.guest_digests = _MergedDataDigests(context['guests']) if guest_digests is None else guest_digests
+        self.context = context
+        self.rendered = 0
+        shard_guests = context['shard_guests']
+        self._guests = [guest for guest in context['guests'] if shard_guests is None or guest in shard_guests]
+
+    def __getitem__(self, guest):
+        context = self.context
+        key = guest_block_key(
+            self.template_name, guest, context['guests'], self.guest_digests, context['loopbacks'],
+            context['interface_mappings'], context['macs'], context['tunnel_endpoints'],
+        )
+        cached = self.block_cache.get(guest)
+        if cached is None or cached[0] != key:
+            cached = (key, render_from_template(
+                template_name=self.template_name,
+                template_directory=self.template_directory,
+                custom_filters=custom_filters,
+                guest=guest,
+                data=context['guests'][guest],
+                **context,
+            ))
+            self.block_cache[guest] = cached
+            self.rendered += 1
+        return cached[1]
+
+    def __iter__(self):
+        return iter(self._guests)
+
+    def __len__(self):
+        return len(self._guests)
+
+
 def generate_vagrant_file(
-        guest_data, loopbacks, template_name='guest.j2',
-        template_directory=f'{TEMPLATES_DIR}/'
+        guest_data, loopbacks, template_name=VAGRANTFILE_TEMPLATE,
+        template_directory=f'{TEMPLATES_DIR}/', macs=None, domain_uuid=None,
+        filename='Vagrantfile', shard_guests=None, tunnel_endpoints=None,
+        block_cache=None, guest_digests=None, interface_mappings=None,
         ):
     """
-    Generate a Vagrantfile in the current directory.
+    Generate a Vagrantfile in the current directory. The existing
+    Vagrantfile is only backed up and replaced when the generated
+    content changes.
     :param guest_data: Dictionary of data to apply to Jinja2 template.
     :param loopbacks: Dictionary of loopback addresses.
     :param template_name: Name of Jinja2 template
     :param template_directory: Template directory location
+    :param macs: Dictionary of interface MAC addresses, interfaces without
+                 one are given a random MAC by Vagrant
+    :param domain_uuid: Domain UUID, a new UUID is generated if not set.
+                        A changed UUID is only written when it is set.
+    :param filename: Vagrantfile path
+    :param shard_guests: Only define these guests in the Vagrantfile,
+                         every guest if None
+    :param tunnel_endpoints: Dictionary of (guest, local_port) to tunnel
+                             endpoints that replace the loopback endpoints
+    :param block_cache: Dict of rendered guest blocks from a previous run,
+                        see GuestBlocks. Only guests whose data changed are
+                        rendered again. Without it every guest is rendered
+                        straight to the Vagrantfile.
+    :param guest_digests: Dictionary of guest to the digest of its data as
+                          loaded from the datafile, that keys block_cache
+    :param interface_mappings: Dictionary of guest type interface port
+                               mappings, generated from the packaged config
+                               if not set
+    :return: True if the Vagrantfile was written, False if it was unchanged
     """
     time_now = time.strftime(TIMESTAMP_FORMAT)
-    current_vagrantfile = pathlib.Path('Vagrantfile')
-    if current_vagrantfile.exists():
-        backup_dir = pathlib.Path(VAGRANTFILE_BACKUP_DIR)
-        if not backup_dir.exists():
-            backup_dir.mkdir()
-        dest_file = pathlib.Path(f'{VAGRANTFILE_BACKUP_DIR}/Vagrantfile-{time_now}')
-        src_file = pathlib.Path('Vagrantfile')
-        src_file.replace(dest_file)
-
-    interface_map = generate_guest_interface_mappings()
+    interface_map = interface_mappings
+    if interface_map is None:
+        interface_map = generate_guest_interface_mappings()
     blackhole_interface_map = generate_blackhole_interface_map(guest_data, interface_map)
-    with open('Vagrantfile', 'w') as f:
-        vagrantfile = render_from_template(
+    ignore_prefixes = VAGRANTFILE_VOLATILE_LINES
+    if domain_uuid is None:
+        domain_uuid = get_uuid()
+        ignore_prefixes += (VAGRANTFILE_GENERATED_UUID_LINE,)
+
+    context = {
+        'guests': guest_data,
+        'shard_guests': None if shard_guests is None else set(shard_guests),
+        'loopbacks': loopbacks,
+        'tunnel_endpoints': tunnel_endpoints,
+        'interface_mappings': interface_map,
+        'macs': macs or {},
+        'domain_uuid': domain_uuid,
+        'blackhole_interfaces': blackhole_interface_map,
+    }
+    guest_blocks = None
+    if block_cache is not None and template_name in GUEST_BLOCK_TEMPLATES:
+        guest_blocks = GuestBlocks(
+            GUEST_BLOCK_TEMPLATES[template_name], template_directory, block_cache, guest_digests, **context)
+
+    def render(f):
+        render_from_template(
             template_name=template_name,
             template_directory=template_directory,
             custom_filters=custom_filters,
-            guests=guest_data,
-            loopbacks=loopbacks,
-            interface_mappings=interface_map,
-            domain_uuid=get_uuid(),
+            stream_to=f,
             creation_time=time_now,
-            blackhole_interfaces=blackhole_interface_map,
+            guest_blocks=guest_blocks,
+            **context,
+        )
+
+    changed = write_if_changed(
+        filename, render,
+        ignore_prefixes=ignore_prefixes,
+        backup_dir=os.path.join(os.path.dirname(filename), VAGRANTFILE_BACKUP_DIR),
+    )
+    if guest_blocks is not None:
+        logger.info(f'{guest_blocks.rendered} of {len(guest_blocks)} guest blocks rendered')
+    if changed:
+        logger.info(f'{filename} created')
+    else:
+        logger.info(f'{filename} unchanged')
+    return changed
+
+
+def generate_sharded_vagrant_files(
+        guest_data, loopbacks, connections, hosts, macs=None, domain_uuid=None,
+        template_name=VAGRANTFILE_TEMPLATE, block_cache=None, guest_digests=None,
+        interface_mappings=None,
+        ):
+    """
+    Partition guests across hosts and generate a Vagrantfile per host in
+    a shard directory. Links between guests on different hosts tunnel
+    over the host addresses rather than loopbacks.
+    :param guest_data: Dictionary of guest data.
+    :param loopbacks: Dictionary of loopback addresses.
+    :param connections: List of Connections from generate_connections_list
+    :param hosts: List of host tunnel addresses, one per shard
+    :param macs: Dictionary of interface MAC addresses
+    :param domain_uuid: Domain UUID, a new UUID is generated if not set
+    :param template_name: Name of Jinja2 template
+    :param block_cache: Dict of rendered guest blocks from a previous run
+    :param guest_digests: Dictionary of guest to the digest of its data as
+                          loaded from the datafile, that keys block_cache
+    :param interface_mappings: Dictionary of guest type interface port mappings
+    :return: List of lists of guest names, one per shard
+    """
+    if domain_uuid is None:
+        domain_uuid = get_uuid()
+    shards = partition_guests(guest_data, connections, len(hosts))
+    tunnel_endpoints = generate_cross_host_endpoints(guest_data, shards, hosts)
+
+    for i, shard_guests in enumerate(shards, 1):
+        shard_directory = SHARD_DIRECTORY_FORMAT.format(shard=i)
+        os.makedirs(shard_directory, exist_ok=True)
+        generate_vagrant_file(
+            guest_data, loopbacks, template_name=template_name,
+            macs=macs, domain_uuid=domain_uuid,
+            filename=os.path.join(shard_directory, 'Vagrantfile'),
+            shard_guests=shard_guests, tunnel_endpoints=tunnel_endpoints,
+            block_cache=block_cache, guest_digests=guest_digests,
+            interface_mappings=interface_mappings,
         )
-        f.write(vagrantfile)
-        logger.info('Vagrantfile created')
+    return shards
 
 
 def generate_dotfile(connections_list):
     """
     Generate undirected dotfile.
     :param connections_list: List of connections strings
+    :return: True if topology.dot was written, False if it was unchanged
     """
-    with open('topology.dot', 'w') as f:
-        dotfile = render_from_template(
+    def render(f):
+        render_from_template(
             template_name='topology.dot.j2',
             template_directory=f'{TEMPLATES_DIR}/',
+            stream_to=f,
             connections_list=connections_list,
         )
-        f.write(dotfile)
+
+    changed = write_if_changed('topology.dot', render)
+    if changed:
         logger.info('topology.dot file created')
+    else:
+        logger.info('topology.dot file unchanged')
+    return changed
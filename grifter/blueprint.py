@@ -0,0 +1,166 @@
+import copy
+
+from .utils import dict_merge
+
+# Roles of each blueprint topology and the default guest name format of
+# each role, formatted with the 1 based index of the guest in its role.
+BLUEPRINT_ROLES = {
+    'clos': {'spines': 'spine{index}', 'leaves': 'leaf{index}'},
+    'ring': {'nodes': 'node{index}'},
+    'mesh': {'nodes': 'node{index}'},
+}
+
+
+def parse_port_range(ports, box, box_config):
+    """
+    Data ports of a box that a blueprint role may use. Ports are numbered
+    like local_port in the guests file, from the box data_interface_offset
+    up to max_data_interfaces ports.
+    :param ports: Port range string eg: 1-24 or 5, None for every port
+    :param box: Vagrant box name
+    :param box_config: guest_config of the box
+    :return: range of port numbers
+    """
+    first_port = box_config['data_interface_offset']
+    last_port = first_port + box_config['max_data_interfaces'] - 1
+    if ports is None:
+        return range(first_port, last_port + 1)
+
+    first, _, last = str(ports).partition('-')
+    try:
+        port_range = range(int(first), int(last or first) + 1)
+    except ValueError:
+        raise ValueError(f'Invalid port range: {ports}') from None
+    if not port_range or port_range[0] < first_port or port_range[-1] > last_port:
+        raise ValueError(
+            f'Port range: {ports} is outside the {box} data ports: {first_port}-{last_port}.')
+    return port_range
+
+
+class FabricBuilder:
+    """
+    Builds guests and their data interfaces, handing out the ports of
+    each guest in ascending order as links are added.
+    """
+    def __init__(self, config):
+        self.guest_config = config['guest_config']
+        self.guests = {}
+        self._free_ports = {}
+
+    def add_guests(self, role, role_data, name_format, guest=None):
+        """
+        Add the guests of a blueprint role.
+        :param role: Role name
+        :param role_data: Blueprint role dict
+        :param name_format: Default guest name format of the role
+        :param guest: Guest data shared by every guest in the blueprint
+        :return: List of guest names
+        """
+        box = role_data['box']
+        box_config = self.guest_config.get(box)
+        if box_config is None:
+            raise ValueError(f'{role} vagrant box type: {box} is not defined in the config file.')
+        ports = parse_port_range(role_data.get('ports'), box, box_config)
+        name_format = role_data.get('name', name_format)
+        try:
+            name_format.format(index=1)
+        except (AttributeError, IndexError, KeyError, ValueError):
+            raise ValueError(f'Invalid {role} name: {name_format}, use {{index}} for the guest index.') from None
+
+        # Role guest data is merged over the blueprint guest data.
+        guest_template = dict_merge(copy.deepcopy(guest or {}), role_data.get('guest') or {})
+        guest_template['vagrant_box'] = dict(guest_template.get('vagrant_box') or {}, name=box)
+
+        names = []
+        for index in range(1, role_data['count'] + 1):
+            name = name_format.format(index=index)
+            if name in self.guests:
+                raise ValueError(f'Guest: {name} is defined more than once, '
+                                 f'the {role} name must contain {{index}}.')
+            data = copy.deepcopy(guest_template)
+            data['data_interfaces'] = []
+            self.guests[name] = data
+            self._free_ports[name] = iter(ports)
+            names.append(name)
+        return names
+
+    def _next_port(self, guest, remote_guest):
+        port = next(self._free_ports[guest], None)
+        if port is None:
+            raise ValueError(f'{guest} has no free data port left to connect to {remote_guest}.')
+        return port
+
+    def connect(self, guest, remote_guest):
+        """
+        Link the next free port of two guests.
+        :param guest: Guest name
+        :param remote_guest: Remote guest name
+        """
+        local_port = self._next_port(guest, remote_guest)
+        remote_port = self._next_port(remote_guest, guest)
+        self.guests[guest]['data_interfaces'].append({
+            'local_port': local_port,
+            'remote_guest': remote_guest,
+            'remote_port': remote_port,
+        })
+        self.guests[remote_guest]['data_interfaces'].append({
+            'local_port': remote_port,
+            'remote_guest': guest,
+            'remote_port': local_port,
+        })
+
+    def finish(self):
+        """
+        Size the NIC adapter count of each guest to its highest used port,
+        unless the blueprint sets one.
+        :return: Dict of guest data
+        """
+        for data in self.guests.values():
+            provider_config = data.setdefault('provider_config', {})
+            if 'nic_adapter_count' not in provider_config and data['data_interfaces']:
+                offset = self.guest_config[data['vagrant_box']['name']]['data_interface_offset']
+                last_port = max(i['local_port'] for i in data['data_interfaces'])
+                provider_config['nic_adapter_count'] = last_port - offset + 1
+        return self.guests
+
+
+def expand_blueprint(blueprint, config):
+    """
+    Expand a fabric blueprint into guest data in the guests file format.
+      - clos: every leaf has uplinks links to every spine
+      - ring: every node has links links to the next node
+      - mesh: every node has links links to every other node
+    Ports are assigned in ascending order within the port range of each
+    role, which defaults to every data port of its box.
+    :param blueprint: Validated blueprint dict
+    :param config: Dict of config data
+    :return: Dict of guest data
+    """
+    topology = blueprint['topology']
+    roles = BLUEPRINT_ROLES[topology]
+    missing_roles = [role for role in roles if role not in blueprint]
+    if missing_roles:
+        raise ValueError(f'A {topology} blueprint requires: {", ".join(missing_roles)}.')
+
+    builder = FabricBuilder(config)
+    guests = {role: builder.add_guests(role, blueprint[role], name_format, blueprint.get('guest'))
+              for role, name_format in roles.items()}
+
+    if topology == 'clos':
+        for leaf in guests['leaves']:
+            for spine in guests['spines']:
+                for _ in range(blueprint.get('uplinks', 1)):
+                    builder.connect(leaf, spine)
+    else:
+        nodes = guests['nodes']
+        if topology == 'ring':
+            if len(nodes) < 3:
+                raise ValueError('A ring blueprint requires at least 3 nodes.')
+            pairs = zip(nodes, nodes[1:] + nodes[:1])
+        else:
+            pairs = ((node, remote_node) for i, node in enumerate(nodes) for remote_node in nodes[i + 1:])
+        for node, remote_node in pairs:
+            for _ in range(blueprint.get('links', 1)):
+                builder.connect(node, remote_node)
+
+    return builder.finish()
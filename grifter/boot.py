@@ -0,0 +1,91 @@
+from .constants import BOOT_CONCURRENCY
+
+
+def boot_dependencies(guests, guest_pairs):
+    """
+    Find the guests each guest must boot after. The child of a guest
+    pair, such as a vMX VCP, boots after the parent guest it is joined
+    to by internal interfaces.
+    :param guests: Dict of merged guest data
+    :param guest_pairs: Dict of guest_pairs from config.yml
+    :return: Dict of guest to set of guests it boots after
+    """
+    parent_boxes = {pair['child']: pair['parent'] for pair in (guest_pairs or {}).values()}
+    dependencies = {guest: set() for guest in guests}
+
+    def add_dependency(guest, remote_guest):
+        parent_box = parent_boxes.get(guests[guest]['vagrant_box']['name'])
+        if parent_box is not None and guests[remote_guest]['vagrant_box']['name'] == parent_box:
+            dependencies[guest].add(remote_guest)
+
+    for guest, data in guests.items():
+        for interface in data.get('internal_interfaces') or []:
+            remote_guest = interface['remote_guest']
+            if remote_guest in guests and remote_guest != guest:
+                # Either side of the pair may declare the link.
+                add_dependency(guest, remote_guest)
+                add_dependency(remote_guest, guest)
+    return dependencies
+
+
+def boot_waves(guests, guest_pairs=None, concurrency=BOOT_CONCURRENCY, cpus=None):
+    """
+    Schedule guests into waves that are booted one after another.
+    Each wave holds at most concurrency guests and, when cpus is set, at
+    most that many guest cpus. A guest with more cpus than that is booted
+    in a wave of its own.
+    A guest is placed in the first wave with room for it after the waves
+    of the guests it depends on. Guests with the most cpus are placed
+    first so the waves are packed tightly.
+    :param guests: Dict of merged guest data
+    :param guest_pairs: Dict of guest_pairs from config.yml
+    :param concurrency: Maximum number of guests in a wave
+    :param cpus: Maximum number of guest cpus in a wave
+    :return: List of lists of guest names, one per wave
+    """
+    if concurrency < 1:
+        raise ValueError('concurrency must be at least 1')
+
+    dependencies = boot_dependencies(guests, guest_pairs)
+    guest_cpus = {k: v['provider_config']['cpus'] for k, v in guests.items()}
+    index = {guest: i for i, guest in enumerate(guests)}
+
+    waves = []
+    load = []
+    wave_of = {}
+    # Waves before first_open already hold concurrency guests.
+    first_open = 0
+    remaining = set(guests)
+    while remaining:
+        ready = [g for g in remaining if not dependencies[g] & remaining]
+        if not ready:
+            raise ValueError(f'Guests have circular boot dependencies: {", ".join(sorted(remaining))}')
+        ready.sort(key=lambda g: (-guest_cpus[g], index[g]))
+
+        for guest in ready:
+            first = max([wave_of[d] + 1 for d in dependencies[guest]] + [first_open])
+            for wave in range(first, len(waves)):
+                if len(waves[wave]) < concurrency and (
+                        cpus is None or not waves[wave] or load[wave] + guest_cpus[guest] <= cpus):
+                    break
+            else:
+                waves.append([])
+                load.append(0)
+                wave = len(waves) - 1
+            waves[wave].append(guest)
+            load[wave] += guest_cpus[guest]
+            wave_of[guest] = wave
+            while first_open < len(waves) and len(waves[first_open]) >= concurrency:
+                first_open += 1
+        remaining.difference_update(ready)
+
+    return [sorted(wave, key=index.get) for wave in waves]
+
+
+def boot_commands(waves):
+    """
+    Build the vagrant up command for each boot wave.
+    :param waves: List of lists of guest names from boot_waves
+    :return: List of command argument lists
+    """
+    return [['vagrant', 'up', *wave, '--parallel'] for wave in waves]
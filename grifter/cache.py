@@ -0,0 +1,149 @@
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import pickle
+
+from .constants import (
+    BASE_DIR,
+    REGENERATION_CACHE_FORMAT,
+)
+from .loaders import (
+    DEFAULT_CONFIG_DIRS,
+    dump_pickle,
+    get_cache_dir,
+)
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 2
+
+# User files merged into the packaged config and guest defaults.
+USER_CONFIG_FILES = ('config.yml', 'guest-defaults.yml')
+
+
+def empty_cache(inputs=''):
+    return {
+        'version': CACHE_VERSION,
+        'inputs': inputs,
+        'valid_guests': {},
+        'blocks': {},
+    }
+
+
+def cache_filename(datafile):
+    """
+    Regeneration cache file of a datafile.
+    :param datafile: Datafile path
+    :return: Cache file path or None if caching is disabled
+    """
+    cache_dir = get_cache_dir()
+    if cache_dir is None:
+        return None
+    digest = hashlib.sha256(os.path.abspath(datafile).encode()).hexdigest()[:16]
+    return os.path.join(cache_dir, REGENERATION_CACHE_FORMAT.format(digest=digest))
+
+
+def _update_digest(digest, path):
+    digest.update(path.encode())
+    try:
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    except OSError:
+        digest.update(b'\0')
+
+
+def inputs_digest(*options):
+    """
+    Digest of everything besides the datafile that affects validation and
+    rendering: the grifter package, including its templates, schemas and
+    packaged config, the user config files and options.
+    :param options: Command options that affect the result
+    :return: Hex digest string
+    """
+    digest = hashlib.sha256()
+    for directory, dirs, files in os.walk(BASE_DIR):
+        dirs[:] = sorted(d for d in dirs if d not in ('__pycache__', 'examples'))
+        for name in sorted(files):
+            if not name.endswith('.pyc'):
+                _update_digest(digest, os.path.join(directory, name))
+    for directory in DEFAULT_CONFIG_DIRS:
+        for name in USER_CONFIG_FILES:
+            _update_digest(digest, os.path.abspath(f'{directory}/{name}'))
+    digest.update(repr(options).encode())
+    return digest.hexdigest()
+
+
+def guest_digest(data):
+    """
+    Digest of a guest's data as loaded from the datafile.
+    :param data: Dict of guest data
+    :return: Hex digest string
+    """
+    return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def load_cache(filename, inputs):
+    """
+    Load a regeneration cache. A missing or unreadable file, or one built
+    from different inputs, results in an empty cache.
+    :param filename: Cache file path
+    :param inputs: Digest from inputs_digest
+    :return: Dict of cached data
+    """
+    try:
+        with open(filename, 'rb') as f:
+            cache = pickle.load(f)
+    except FileNotFoundError:
+        return empty_cache(inputs)
+    except Exception:
+        logger.warning(f'Cache file: "{filename}" is not readable, regenerating from scratch')
+        return empty_cache(inputs)
+
+    if (not isinstance(cache, dict) or cache.get('version') != CACHE_VERSION
+            or cache.get('inputs') != inputs):
+        return empty_cache(inputs)
+    return cache
+
+
+def save_cache(cache, filename):
+    """
+    Atomically write a regeneration cache.
+    :param cache: Dict of cached data
+    :param filename: Cache file path
+    """
+    dump_pickle(cache, filename)
+
+
+def _snapshot(cache):
+    return {key: dict(value) if isinstance(value, dict) else value for key, value in cache.items()}
+
+
+@contextlib.contextmanager
+def regeneration_cache(datafile, *options):
+    """
+    Cache of the guests that passed validation and the rendered guest
+    blocks of a datafile, so that a rerun only validates and renders the
+    guests whose data changed. The cache yielded is saved when the block
+    exits without an exception and the cache changed.
+    :param datafile: Datafile path
+    :param options: Command options that affect the result
+    :return: Dict of cached data or None if caching is disabled
+    """
+    filename = cache_filename(datafile)
+    if filename is None:
+        yield None
+        return
+
+    inputs = inputs_digest(*options)
+    cache = load_cache(filename, inputs)
+    # A shallow copy is enough to tell whether the cache changed, as
+    # cached values are replaced rather than mutated.
+    loaded = _snapshot(cache)
+    yield cache
+    if cache != loaded:
+        try:
+            save_cache(cache, filename)
+        except OSError:
+            logger.warning(f'Cache file: "{filename}" is not writable')
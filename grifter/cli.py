@@ -1,74 +1,131 @@
 import click
+import subprocess
 import sys
 
 from .constants import (
+    BOOT_CONCURRENCY,
+    COMPACT_VAGRANTFILE_TEMPLATE,
+    SHARD_DIRECTORY_FORMAT,
+    VAGRANTFILE_TEMPLATE,
     GUESTS_EXAMPLE_FILE,
     GROUPS_EXAMPLE_FILE,
+    BLUEPRINT_EXAMPLE_FILE,
 )
 from .loaders import (
+    iter_links,
     load_data,
-    load_config_file,
 )
 from .api import (
     generate_loopbacks,
+    generate_macs,
     update_guest_interfaces,
     generate_vagrant_file,
+    generate_sharded_vagrant_files,
     update_guest_data,
     update_guest_additional_storage,
-    generate_guest_interface_mappings,
     update_reserved_interfaces,
     generate_connections_list,
-    merge_user_config,
+    add_reverse_interfaces,
+    add_link_interfaces,
     generate_dotfile,
     generate_connection_strings,
 )
+from .blueprint import expand_blueprint
+from .boot import (
+    boot_waves,
+    boot_commands,
+)
+from .cache import (
+    regeneration_cache,
+    guest_digest,
+)
+from .planner import (
+    host_capacity,
+    topology_requirements,
+    plan_capacity,
+)
+from .context import TopologyContext
+from .shards import partition_guests
+from .state import locked_state
+from .utils import get_uuid
 from .validators import (
-    validate_guests_in_guest_config,
-    validate_guest_interfaces,
+    validate_topology,
+    validate_tunnel_ports,
     validate_data,
     validate_config,
+    validate_blueprint,
+    VALIDATOR_ENGINES,
+    DEFAULT_VALIDATOR_ENGINE,
 )
 
-interface_mappings = generate_guest_interface_mappings()
 
-
-def validate_guest_config(config):
-    errors = validate_config(config)
+def validate_guest_config(config, engine=DEFAULT_VALIDATOR_ENGINE):
+    errors = validate_config(config, engine)
     if errors:
         display_errors(errors)
 
 
-def validate_guest_data(guest_data, config):
+def load_topology_context(engine=DEFAULT_VALIDATOR_ENGINE):
+    """
+    Load the config and guest defaults shared by every stage of a command
+    and validate the config. Loading happens when a command runs rather
+    than at import time so that --help and example stay fast.
+    :param engine: Schema validator engine.
+    :return: TopologyContext
+    """
+    context = TopologyContext()
+    validate_guest_config(context.config, engine)
+    return context
+
+
+def validate_guest_data(guest_data, context, engine=DEFAULT_VALIDATOR_ENGINE, reverse_links=False, cache=None):
     """
     Validate and update guest data if validation is successful.
     :param guest_data: Dict of guest data.
-    :param config: Dict of config data.
+    :param context: TopologyContext.
+    :param engine: Schema validator engine.
+    :param reverse_links: Add the reverse side of links declared on one guest only.
+    :param cache: Regeneration cache, guests that passed validation with
+                  the same data before are not validated again.
     :return: Dict of updated data.
     """
-    guest_defaults = load_config_file('guest-defaults.yml')
+    guest_defaults = context.guest_defaults
     errors = []
 
-    guest_errors = validate_data(guest_data)
+    valid_guests = {}
+    unvalidated_guest_data = guest_data
+    if cache is not None:
+        valid_guests = {guest: guest_digest(data) for guest, data in guest_data.items()}
+        unvalidated_guest_data = {
+            guest: data for guest, data in guest_data.items()
+            if cache['valid_guests'].get(guest) != valid_guests[guest]
+        }
+
+    guest_errors = validate_data(unvalidated_guest_data, engine=engine)
     if guest_errors:
         errors += guest_errors
 
-    if guest_defaults:
-        guest_defaults_errors = validate_data(guest_defaults, guest_default_data=True)
+    # Guest defaults are part of the cache inputs, so they were validated
+    # if any guest was.
+    if guest_defaults and not (cache and cache['valid_guests']):
+        guest_defaults_errors = validate_data(guest_defaults, guest_default_data=True, engine=engine)
         if guest_defaults_errors:
             errors += guest_defaults_errors
 
     if not errors:
-        merged_data = update_guest_data(guest_data)
-        update_guest_interfaces(merged_data, config)
-        update_reserved_interfaces(merged_data, config)
+        merged_data = update_guest_data(
+            guest_data, all_guest_defaults=context.all_guest_defaults, guest_defaults=guest_defaults)
+        if reverse_links:
+            add_reverse_interfaces(merged_data)
+        update_guest_interfaces(merged_data, context.config)
+        update_reserved_interfaces(merged_data, context.config)
         update_guest_additional_storage(merged_data)
 
-        try:
-            validate_guests_in_guest_config(merged_data, config)
-            validate_guest_interfaces(merged_data, config, interface_mappings)
-        except AttributeError as e:
-            errors.append(e)
+        errors += validate_topology(merged_data, context.config, context.interface_mappings)
+        errors += validate_tunnel_ports(merged_data)
         if not errors:
+            if cache is not None:
+                cache['valid_guests'] = valid_guests
             return merged_data
     if errors:
         display_errors(errors)
@@ -88,6 +145,75 @@ def load_data_file(datafile):
     return guest_data
 
 
+def load_blueprint_file(datafile, context, engine=DEFAULT_VALIDATOR_ENGINE):
+    """
+    Load a fabric blueprint and expand it into guest data.
+    :param datafile: Name of blueprint datafile
+    :param context: TopologyContext.
+    :param engine: Schema validator engine.
+    :return: Dict of guest data.
+    """
+    blueprint = load_data_file(datafile)
+    errors = validate_blueprint(blueprint, engine)
+    if errors:
+        display_errors(errors)
+    try:
+        return expand_blueprint(blueprint, context.config)
+    except ValueError as e:
+        display_errors([str(e)])
+
+
+def load_link_file(guest_data, links):
+    """
+    Add the links of a link file to the data interfaces of the guests.
+    :param guest_data: Dict of guest data.
+    :param links: Name of a JSONL or CSV link file.
+    """
+    try:
+        errors = add_link_interfaces(guest_data, iter_links(links))
+    except FileNotFoundError:
+        click.echo(f'Link file: {links} not found.')
+        sys.exit(1)
+    except ValueError as e:
+        errors = [str(e)]
+    if errors:
+        display_errors(errors)
+
+
+def load_guest_data(datafile, context, engine=DEFAULT_VALIDATOR_ENGINE, blueprint=False, links=None):
+    """
+    Load guest data from a guests datafile or a fabric blueprint.
+    :param datafile: Name of datafile
+    :param context: TopologyContext.
+    :param engine: Schema validator engine.
+    :param blueprint: The datafile is a fabric blueprint.
+    :param links: Name of a JSONL or CSV link file whose links are
+                  added to the data interfaces of the guests.
+    :return: Dict of guest data.
+    """
+    if blueprint:
+        guest_data = load_blueprint_file(datafile, context, engine)
+    else:
+        guest_data = load_data_file(datafile)
+    if links:
+        load_link_file(guest_data, links)
+    return guest_data
+
+
+def check_shard_options(shards, hosts):
+    """
+    Check the --shards and --host options of a command.
+    :param shards: Number of hosts or None to count the --host addresses
+    :param hosts: Tuple of host tunnel addresses
+    :return: Number of hosts
+    """
+    if shards is None:
+        shards = len(hosts) or 1
+    if shards > 1 and len(hosts) != shards:
+        display_errors([f'--shards {shards} requires a --host address for each shard.'])
+    return shards
+
+
 def display_errors(errors_list):
     """
     Outputs a list of errors
@@ -101,15 +227,13 @@ def display_errors(errors_list):
 def display_connections(connections, guest=''):
     """
     Output a list of connections
-    :param connections: List of dicts containing connection information ie:
-      [{'local_guest': 'p1sw1',
-        'local_port': 'swp7',
-        'remote_guest': 'p1r7',
-        'remote_port': 'ge-0/0/9'}]
+    :param connections: List of Connections ie:
+      [Connection(local_guest='p1sw1', local_port='swp7',
+                  remote_guest='p1r7', remote_port='ge-0/0/9')]
     :param guest: Display connections for guest.
     """
     if guest:
-        guest_connections = [i for i in connections if i['local_guest'] == guest]
+        guest_connections = [i for i in connections if i.local_guest == guest]
         connections_list = generate_connection_strings(guest_connections)
     else:
         connections_list = generate_connection_strings(connections)
@@ -118,11 +242,27 @@ def display_connections(connections, guest=''):
         click.echo(i)
 
 
+def display_shards(shards, hosts):
+    """
+    Output the guests placed on each host
+    :param shards: List of lists of guest names, one per shard
+    :param hosts: List of host tunnel addresses, one per shard
+    """
+    for i, (guests, host) in enumerate(zip(shards, hosts), 1):
+        directory = SHARD_DIRECTORY_FORMAT.format(shard=i)
+        click.echo(f'{directory} ({host}): {", ".join(guests)}')
+
+
 @click.group(context_settings={'help_option_names': ['-h', '--help']})
 @click.version_option(version='0.2.11')
-def cli():
+@click.option('--validator', type=click.Choice(VALIDATOR_ENGINES), default=DEFAULT_VALIDATOR_ENGINE,
+              envvar='GRIFTER_VALIDATOR', show_default=True,
+              help='Schema validator engine.')
+@click.pass_context
+def cli(ctx, validator):
     """Create a Vagrantfile from a YAML data input file."""
-    pass
+    ctx.ensure_object(dict)
+    ctx.obj['validator'] = validator
 
 
 @cli.command(help='''
@@ -131,16 +271,54 @@ def cli():
     DATAFILE - Name of DATAFILE.
     ''')
 @click.argument('datafile')
-def create(datafile):
+@click.option('--reverse-links', is_flag=True, default=False,
+              help='Add the reverse side of links only declared on one guest.')
+@click.option('--shards', type=click.IntRange(min=1), default=None,
+              help='Partition guests across this many hosts, one Vagrantfile per host.')
+@click.option('--host', 'hosts', multiple=True,
+              help='Tunnel address of a host, once per shard in shard order.')
+@click.option('--compact', is_flag=True, default=False,
+              help='Write guest data as Ruby hashes defined in a loop, for large topologies.')
+@click.option('--links', type=click.Path(dir_okay=False), default=None,
+              help='JSONL or CSV file of links added to the data interfaces of the guests.')
+@click.option('--blueprint', is_flag=True, default=False,
+              help='DATAFILE is a fabric blueprint to expand into guests.')
+@click.pass_context
+def create(ctx, datafile, reverse_links, shards, hosts, compact, links, blueprint):
     """Create a Vagrantfile."""
-    guest_config = merge_user_config()
-    validate_guest_config(guest_config)
-    guest_data = load_data_file(datafile)
-    validated_guest_data = validate_guest_data(guest_data, guest_config)
-    loopbacks = generate_loopbacks(guest_data)
-    generate_vagrant_file(validated_guest_data, loopbacks)
-    unsorted_connections = generate_connections_list(validated_guest_data, interface_mappings,
-                                                     unique=True)
+    shards = check_shard_options(shards, hosts)
+
+    template_name = COMPACT_VAGRANTFILE_TEMPLATE if compact else VAGRANTFILE_TEMPLATE
+    engine = ctx.obj['validator']
+    context = load_topology_context(engine)
+    with regeneration_cache(datafile, engine, reverse_links, links, blueprint) as cache:
+        guest_data = load_guest_data(datafile, context, engine, blueprint, links)
+        validated_guest_data = validate_guest_data(guest_data, context, engine, reverse_links, cache)
+        unsorted_connections = generate_connections_list(validated_guest_data, context.interface_mappings,
+                                                         unique=True)
+        block_cache = cache['blocks'] if cache is not None else None
+        guest_digests = cache['valid_guests'] if cache is not None else None
+        # Reuse prior allocations so regenerating the Vagrantfile only
+        # changes the guests and links that were added or modified.
+        with locked_state() as state:
+            state['domain_uuid'] = state['domain_uuid'] or get_uuid()
+            state['loopbacks'] = generate_loopbacks(guest_data, state['loopbacks'])
+            state['macs'] = generate_macs(validated_guest_data, context.interface_mappings, state['macs'])
+            if shards > 1:
+                guest_shards = generate_sharded_vagrant_files(
+                    validated_guest_data, state['loopbacks'], unsorted_connections, list(hosts),
+                    macs=state['macs'], domain_uuid=state['domain_uuid'], template_name=template_name,
+                    block_cache=block_cache, guest_digests=guest_digests,
+                    interface_mappings=context.interface_mappings)
+                display_shards(guest_shards, hosts)
+            else:
+                generate_vagrant_file(validated_guest_data, state['loopbacks'], template_name=template_name,
+                                      macs=state['macs'], domain_uuid=state['domain_uuid'],
+                                      block_cache=block_cache, guest_digests=guest_digests,
+                                      interface_mappings=context.interface_mappings)
+        # Drop the blocks of guests that were removed.
+        if cache is not None:
+            cache['blocks'] = {k: v for k, v in block_cache.items() if k in validated_guest_data}
     connections_list = generate_connection_strings(unsorted_connections, dotfile=True)
     generate_dotfile(connections_list)
 
@@ -148,7 +326,8 @@ def create(datafile):
 @cli.command(help='Print example file declaration.')
 @click.option('--guest', is_flag=True)
 @click.option('--group', is_flag=True)
-def example(guest, group):
+@click.option('--blueprint', is_flag=True)
+def example(guest, group, blueprint):
     """Display example variable file"""
     if guest:
         with open(GUESTS_EXAMPLE_FILE, 'r') as f:
@@ -156,6 +335,9 @@ def example(guest, group):
     if group:
         with open(GROUPS_EXAMPLE_FILE, 'r') as f:
             click.echo(f.read())
+    if blueprint:
+        with open(BLUEPRINT_EXAMPLE_FILE, 'r') as f:
+            click.echo(f.read())
 
 
 @cli.command(help='''
@@ -166,13 +348,21 @@ def example(guest, group):
 @click.argument('datafile')
 @click.argument('guest', default='')
 @click.option('--unique', is_flag=True, default=False, help='Remove duplicate connections.')
-def connections(datafile, guest, unique):
+@click.option('--reverse-links', is_flag=True, default=False,
+              help='Add the reverse side of links only declared on one guest.')
+@click.option('--links', type=click.Path(dir_okay=False), default=None,
+              help='JSONL or CSV file of links added to the data interfaces of the guests.')
+@click.option('--blueprint', is_flag=True, default=False,
+              help='DATAFILE is a fabric blueprint to expand into guests.')
+@click.pass_context
+def connections(ctx, datafile, guest, unique, reverse_links, links, blueprint):
     """Show device to device connections."""
-    guest_config = merge_user_config()
-    validate_guest_config(guest_config)
-    guest_data = load_data_file(datafile)
-    validated_guest_data = validate_guest_data(guest_data, guest_config)
-    connections_list = generate_connections_list(validated_guest_data, interface_mappings, unique)
+    engine = ctx.obj['validator']
+    context = load_topology_context(engine)
+    with regeneration_cache(datafile, engine, reverse_links, links, blueprint) as cache:
+        guest_data = load_guest_data(datafile, context, engine, blueprint, links)
+        validated_guest_data = validate_guest_data(guest_data, context, engine, reverse_links, cache)
+    connections_list = generate_connections_list(validated_guest_data, context.interface_mappings, unique)
     display_connections(connections_list, guest)
 
 
@@ -182,12 +372,134 @@ def connections(datafile, guest, unique):
     DATAFILE - Name of DATAFILE.
     ''')
 @click.argument('datafile')
-def dotfile(datafile):
+@click.option('--reverse-links', is_flag=True, default=False,
+              help='Add the reverse side of links only declared on one guest.')
+@click.option('--links', type=click.Path(dir_okay=False), default=None,
+              help='JSONL or CSV file of links added to the data interfaces of the guests.')
+@click.option('--blueprint', is_flag=True, default=False,
+              help='DATAFILE is a fabric blueprint to expand into guests.')
+@click.pass_context
+def dotfile(ctx, datafile, reverse_links, links, blueprint):
     """Generate undirected dotfile."""
-    guest_config = merge_user_config()
-    validate_guest_config(guest_config)
-    guest_data = load_data_file(datafile)
-    validated_guest_data = validate_guest_data(guest_data, guest_config)
-    unsorted_connections = generate_connections_list(validated_guest_data, interface_mappings, unique=True)
+    engine = ctx.obj['validator']
+    context = load_topology_context(engine)
+    with regeneration_cache(datafile, engine, reverse_links, links, blueprint) as cache:
+        guest_data = load_guest_data(datafile, context, engine, blueprint, links)
+        validated_guest_data = validate_guest_data(guest_data, context, engine, reverse_links, cache)
+    unsorted_connections = generate_connections_list(validated_guest_data, context.interface_mappings, unique=True)
     connections_list = generate_connection_strings(unsorted_connections, dotfile=True)
     generate_dotfile(connections_list)
+
+
+@cli.command(help='''
+    Check whether a topology fits on a host.
+
+    DATAFILE - Name of DATAFILE.
+    ''')
+@click.argument('datafile')
+@click.option('--cpus', type=click.IntRange(min=0), default=None,
+              help='Host cpus, defaults to the cpus of this host.')
+@click.option('--memory', type=click.IntRange(min=0), default=None,
+              help='Host memory in MB, defaults to the memory of this host.')
+@click.option('--huge-pages', type=click.IntRange(min=0), default=None,
+              help='Host huge pages memory in MB, defaults to the huge pages of this host.')
+@click.option('--reverse-links', is_flag=True, default=False,
+              help='Add the reverse side of links only declared on one guest.')
+@click.option('--blueprint', is_flag=True, default=False,
+              help='DATAFILE is a fabric blueprint to expand into guests.')
+@click.pass_context
+def plan(ctx, datafile, cpus, memory, huge_pages, reverse_links, blueprint):
+    """Check whether a topology fits on a host."""
+    engine = ctx.obj['validator']
+    context = load_topology_context(engine)
+    with regeneration_cache(datafile, engine, reverse_links, None, blueprint) as cache:
+        guest_data = load_guest_data(datafile, context, engine, blueprint)
+        validated_guest_data = validate_guest_data(guest_data, context, engine, reverse_links, cache)
+
+    capacity = host_capacity()
+    for name, value in (('cpus', cpus), ('memory', memory), ('huge_pages_memory', huge_pages)):
+        if value is not None:
+            capacity[name] = value
+    requirements = topology_requirements(validated_guest_data)
+
+    click.echo(f'Guests: {requirements["guests"]}')
+    click.echo(f'CPUs: {requirements["cpu_demand"]:g} required, {capacity["cpus"]} available')
+    click.echo(f'Memory: {requirements["memory"]} MB required, {capacity["memory"]} MB available')
+    click.echo(f'Huge pages: {requirements["huge_pages_memory"]} MB required, '
+               f'{capacity["huge_pages_memory"]} MB available')
+    click.echo(f'Storage volumes: {requirements["storage"] // 2 ** 20} MB')
+    click.echo(f'NICs: {requirements["nics"]}')
+
+    suggestions = plan_capacity(requirements, capacity)
+    if suggestions:
+        display_errors(suggestions)
+    click.echo('The topology fits on the host.')
+
+
+@cli.command(help='''
+    Boot guests with vagrant up in waves.
+
+    DATAFILE - Name of DATAFILE.
+    ''')
+@click.argument('datafile')
+@click.option('--concurrency', type=click.IntRange(min=1), default=BOOT_CONCURRENCY, show_default=True,
+              help='Maximum number of guests booted at once.')
+@click.option('--cpus', type=click.IntRange(min=1), default=None,
+              help='Maximum guest cpus booted at once, defaults to the cpus of this host.')
+@click.option('--dry-run', is_flag=True, default=False,
+              help='Print the vagrant commands without running them.')
+@click.option('--shards', type=click.IntRange(min=1), default=None,
+              help='Number of hosts the guests were partitioned across by create.')
+@click.option('--host', 'hosts', multiple=True,
+              help='Tunnel address of a host, once per shard in shard order.')
+@click.option('--shard', type=click.IntRange(min=1), default=None,
+              help='Only boot the guests of this shard, defaults to every shard.')
+@click.option('--reverse-links', is_flag=True, default=False,
+              help='Add the reverse side of links only declared on one guest.')
+@click.option('--links', type=click.Path(dir_okay=False), default=None,
+              help='JSONL or CSV file of links added to the data interfaces of the guests.')
+@click.option('--blueprint', is_flag=True, default=False,
+              help='DATAFILE is a fabric blueprint to expand into guests.')
+@click.pass_context
+def up(ctx, datafile, concurrency, cpus, dry_run, shards, hosts, shard, reverse_links, links, blueprint):
+    """Boot guests with vagrant up in waves."""
+    shards = check_shard_options(shards, hosts)
+    if shard is not None and shard > shards:
+        display_errors([f'--shard {shard} is not one of the {shards} shards.'])
+
+    engine = ctx.obj['validator']
+    context = load_topology_context(engine)
+    with regeneration_cache(datafile, engine, reverse_links, links, blueprint) as cache:
+        guest_data = load_guest_data(datafile, context, engine, blueprint, links)
+        validated_guest_data = validate_guest_data(guest_data, context, engine, reverse_links, cache)
+
+    # The same partition as create, so each shard is booted from the
+    # directory of its Vagrantfile.
+    if shards > 1:
+        unsorted_connections = generate_connections_list(validated_guest_data, context.interface_mappings,
+                                                         unique=True)
+        guest_shards = partition_guests(validated_guest_data, unsorted_connections, shards)
+    else:
+        guest_shards = [list(validated_guest_data)]
+
+    if cpus is None:
+        cpus = host_capacity()['cpus'] or None
+    for i, shard_guests in enumerate(guest_shards, 1):
+        if shard is not None and i != shard:
+            continue
+        directory = SHARD_DIRECTORY_FORMAT.format(shard=i) if shards > 1 else None
+        try:
+            waves = boot_waves({guest: validated_guest_data[guest] for guest in shard_guests},
+                               context.config.get('guest_pairs'), concurrency, cpus)
+        except ValueError as e:
+            display_errors([str(e)])
+
+        for command in boot_commands(waves):
+            if directory:
+                click.echo(f'cd {directory} && {" ".join(command)}')
+            else:
+                click.echo(' '.join(command))
+            if not dry_run:
+                result = subprocess.run(command, cwd=directory)
+                if result.returncode:
+                    sys.exit(result.returncode)
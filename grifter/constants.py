@@ -1,20 +1,43 @@
+import functools
 import os
 
 from .loaders import load_data
+from .utils import LazyMapping
 
 BASE_DIR = os.path.join(os.path.dirname(__file__))
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 
 VAGRANTFILE_BACKUP_DIR = 'vagrantfile-backup'
+VAGRANTFILE_TEMPLATE = 'guest.j2'
+# Emits guest data as Ruby hashes and defines the guests in a loop.
+COMPACT_VAGRANTFILE_TEMPLATE = 'guest-compact.j2'
+# Template of each guest's block in a Vagrantfile template, rendered on
+# its own so unchanged guests can be reused from the regeneration cache.
+GUEST_BLOCK_TEMPLATES = {
+    VAGRANTFILE_TEMPLATE: 'guest-block.j2',
+    COMPACT_VAGRANTFILE_TEMPLATE: 'guest-compact-block.j2',
+}
+# Vagrantfile lines that change on every run and are ignored when
+# deciding whether a regenerated Vagrantfile differs from the current one.
+# The domain UUID line is only ignored when the UUID was generated for
+# the run rather than passed in, eg: from the state file.
+VAGRANTFILE_VOLATILE_LINES = ('# Created: ',)
+VAGRANTFILE_GENERATED_UUID_LINE = 'domain_uuid = '
+# Prior loopback, MAC and domain UUID allocations, kept next to the
+# Vagrantfile so regenerating it does not change existing guests.
+STATE_FILE = '.grifter-state.json'
+# Parsed datafile, validated guests and rendered guest blocks of each
+# datafile, kept in the cache directory.
+REGENERATION_CACHE_FORMAT = 'regen-{digest}.pickle'
 
 EXAMPLES_DIR = os.path.join(BASE_DIR, 'examples')
 GROUPS_EXAMPLE_FILE = f'{EXAMPLES_DIR}/groups-example.yml'
 GUESTS_EXAMPLE_FILE = f'{EXAMPLES_DIR}/guests-example.yml'
+BLUEPRINT_EXAMPLE_FILE = f'{EXAMPLES_DIR}/blueprint-example.yml'
 
 DEFAULT_CONFIG_FILE = f'{BASE_DIR}/config.yml'
 GUEST_DEFAULTS_FILE = f'{BASE_DIR}/defaults.yml'
-ALL_GUEST_DEFAULTS = load_data(GUEST_DEFAULTS_FILE)
 
 TESTS_DIR = os.path.join(BASE_DIR, '../tests')
 
@@ -22,11 +45,44 @@ SCHEMAS_DIR = os.path.join(BASE_DIR, 'schemas')
 GUEST_SCHEMA_FILE = f'{SCHEMAS_DIR}/guest-schema.yml'
 GUEST_CONFIG_SCHEMA = f'{SCHEMAS_DIR}/guest-config-schema.yml'
 GUEST_PAIRS_SCHEMA = f'{SCHEMAS_DIR}/guest-pairs-schema.yml'
+BLUEPRINT_SCHEMA = f'{SCHEMAS_DIR}/blueprint-schema.yml'
 
 BLACKHOLE_LOOPBACK_MAP = {'blackhole': '127.6.6.6'}
 
 DATA_INTERFACES_BASE_PORT = 10000
 INTERNAL_INTERFACES_BASE_PORT = 11000
 RESERVED_INTERFACES_BASE_PORT = 12000
+# Number of UDP tunnel ports available to each interface type. The base
+# ports must be at least this far apart so the ranges do not overlap.
+INTERFACE_PORT_RANGE = 1000
+INTERFACE_BASE_PORTS = {
+    'data_interfaces': DATA_INTERFACES_BASE_PORT,
+    'internal_interfaces': INTERNAL_INTERFACES_BASE_PORT,
+    'reserved_interfaces': RESERVED_INTERFACES_BASE_PORT,
+}
+BLACKHOLE_PORT = 666
+
+# Sharding a topology across hosts. Links between hosts bind UDP ports
+# on the host tunnel address starting at SHARD_TUNNEL_BASE_PORT.
+SHARD_DIRECTORY_FORMAT = 'shard-{shard}'
+SHARD_IMBALANCE = 0.1
+SHARD_REFINE_PASSES = 10
+SHARD_TUNNEL_BASE_PORT = 20000
+
+# Maximum number of guests booted together in one wave by grifter up.
+BOOT_CONCURRENCY = 10
 
 TIMESTAMP_FORMAT = '%Y-%m-%d--%H-%M-%S'
+
+
+@functools.lru_cache(maxsize=None)
+def get_all_guest_defaults():
+    """
+    Load the packaged guest defaults on first use.
+    :return: Dict of all guest default data
+    """
+    return load_data(GUEST_DEFAULTS_FILE)
+
+
+# Kept for code that imports it, the defaults are loaded on first access.
+ALL_GUEST_DEFAULTS = LazyMapping(get_all_guest_defaults)
@@ -0,0 +1,47 @@
+from .api import (
+    generate_int_to_port_mappings,
+    merge_user_config,
+)
+from .constants import get_all_guest_defaults
+from .loaders import load_config_file
+
+
+class InterfaceMappings(dict):
+    """
+    Guest type to interface port mappings. The mappings of a guest type
+    are generated from its guest_config the first time it is looked up
+    with [], so only guest types in use are generated. `in` and get() only
+    see guest types that were looked up before.
+    """
+    def __init__(self, guest_config):
+        super().__init__()
+        self._guest_config = guest_config
+
+    def __missing__(self, box):
+        mappings = generate_int_to_port_mappings(self._guest_config[box])
+        self[box] = mappings
+        return mappings
+
+
+class TopologyContext:
+    """
+    Configuration shared by every stage of a CLI run. The merged user
+    config, the user guest defaults and the packaged guest defaults are
+    loaded once and the interface mappings are generated from the merged
+    config.
+    """
+    def __init__(self, config=None, guest_defaults=None, all_guest_defaults=None):
+        """
+        :param config: Merged config, defaults to merge_user_config()
+        :param guest_defaults: User guest defaults, defaults to the
+                               guest-defaults.yml files
+        :param all_guest_defaults: Packaged guest defaults
+        """
+        self.config = merge_user_config() if config is None else config
+        if guest_defaults is None:
+            guest_defaults = load_config_file('guest-defaults.yml')
+        self.guest_defaults = guest_defaults
+        if all_guest_defaults is None:
+            all_guest_defaults = get_all_guest_defaults()
+        self.all_guest_defaults = all_guest_defaults
+        self.interface_mappings = InterfaceMappings(self.config['guest_config'])
@@ -1,19 +1,37 @@
-def explode_port(port, base_port=10000):
+from .constants import (
+    DATA_INTERFACES_BASE_PORT,
+    INTERFACE_BASE_PORTS,
+    INTERFACE_PORT_RANGE,
+)
+
+
+def explode_port(port, base_port=DATA_INTERFACES_BASE_PORT):
     """
     Create a high port number > 10000 for use with UDP tunnels
     :param port: port number to add to the base port
     :param base_port: Port number above 10000
     :return: Int port number
     """
-    port_error = 'port must be and integer from 0 to 99 or 666'
+    port_error = f'port must be and integer from 0 to {INTERFACE_PORT_RANGE - 1}'
 
     if not isinstance(port, int):
         raise AttributeError(port_error)
 
-    if port == 666:
-        return base_port + port
-
-    elif not 0 <= port < 100:
+    elif not 0 <= port < INTERFACE_PORT_RANGE:
         raise AttributeError(port_error)
 
     return base_port + port
+
+
+def tunnel_port(port, interface_type='data_interfaces'):
+    """
+    Create the UDP tunnel port for a port of the given interface type.
+    Each interface type has its own range of ports starting at its base
+    port so ports of different types never overlap on a loopback.
+    :param port: port number of the interface
+    :param interface_type: data_interfaces, internal_interfaces or reserved_interfaces
+    :return: Int port number
+    """
+    if interface_type not in INTERFACE_BASE_PORTS:
+        raise AttributeError(f'unknown interface type: {interface_type}')
+    return explode_port(port, INTERFACE_BASE_PORTS[interface_type])
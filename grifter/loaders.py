@@ -1,9 +1,11 @@
-import yaml
+import csv
+import hashlib
 import json
 import logging
 import os
-
-from jinja2 import Environment, FileSystemLoader
+import pickle
+import tempfile
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -13,26 +15,206 @@ DEFAULT_CONFIG_DIRS = [
     f'{USER_HOME}/.grifter',
     '.',
 ]
+USER_CACHE_DIR = f'{USER_HOME}/.grifter/cache'
 
+# Number of template events joined per write when streaming to disk.
+STREAM_BUFFER_SIZE = 64
 
-def render_from_template(
-        template_name, template_directory, custom_filters=None,
-        trim_blocks=True, lstrip_blocks=True, **kwargs
+# Parsed YAML documents are cached per file in the cache directory.
+PARSED_YAML_CACHE_FORMAT = 'yaml-{digest}.pickle'
+PARSED_YAML_CACHE_VERSION = 1
+# Seconds after its last modification before a file's mtime is trusted.
+PARSED_YAML_MTIME_SLACK = 2
+
+# Columns of a link file row, in order.
+LINK_FIELDS = ('local_guest', 'local_port', 'remote_guest', 'remote_port')
+
+# Jinja2 environments keyed by (template_directory, options, filters).
+_environments = {}
+
+
+def get_cache_dir():
+    """
+    Directory used to persist grifter caches. Can be overridden with
+    the GRIFTER_CACHE_DIR environment variable, an empty value disables
+    on-disk caching.
+    :return: Cache directory path or None if caching is disabled.
+    """
+    cache_dir = os.environ.get('GRIFTER_CACHE_DIR', USER_CACHE_DIR)
+    if not cache_dir:
+        return None
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+    except OSError:
+        logger.warning(f'Cache directory: "{cache_dir}" is not writable')
+        return None
+    return cache_dir
+
+
+def get_environment(
+        template_directory, custom_filters=None,
+        trim_blocks=True, lstrip_blocks=True
         ):
     """
-    Render template with custom filters
+    Return a Jinja2 environment for template_directory. Environments are
+    cached per template directory, options and filter set so templates are
+    only compiled once per process. Compiled template bytecode is also
+    persisted to the cache directory and is invalidated by Jinja2 when the
+    template source changes.
+    :param template_directory: Template directory location
+    :param custom_filters: List of custom filter functions
+    :param trim_blocks: Jinja2 trim_blocks option
+    :param lstrip_blocks: Jinja2 lstrip_blocks option
+    :return: Jinja2 Environment
     """
+    filters = tuple(custom_filters) if custom_filters is not None else ()
+    key = (os.path.abspath(template_directory), trim_blocks, lstrip_blocks, filters)
+    env = _environments.get(key)
+    if env is not None:
+        return env
+
+    # Jinja2 is imported on first render so that commands which never
+    # render a template do not pay its import cost.
+    from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache
+
+    bytecode_cache = None
+    cache_dir = get_cache_dir()
+    if cache_dir is not None:
+        bytecode_cache = FileSystemBytecodeCache(cache_dir, pattern='__jinja2_%s.cache')
+
     loader = FileSystemLoader(template_directory)
-    env = Environment(loader=loader, trim_blocks=trim_blocks, lstrip_blocks=lstrip_blocks)
+    env = Environment(
+        loader=loader, trim_blocks=trim_blocks, lstrip_blocks=lstrip_blocks,
+        bytecode_cache=bytecode_cache,
+    )
+
+    for custom_filter in filters:
+        env.filters[custom_filter.__name__] = custom_filter
 
-    if custom_filters is not None:
-        for custom_filter in custom_filters:
-            env.filters[custom_filter.__name__] = custom_filter
+    _environments[key] = env
+    return env
 
+
+def render_from_template(
+        template_name, template_directory, custom_filters=None,
+        trim_blocks=True, lstrip_blocks=True, stream_to=None, **kwargs
+        ):
+    """
+    Render template with custom filters
+    :param stream_to: Optional filename or file object. When set the
+                      template is streamed to it in buffered chunks instead
+                      of being rendered into a single string.
+    :return: Rendered string, or None when stream_to is set.
+    """
+    env = get_environment(template_directory, custom_filters, trim_blocks, lstrip_blocks)
     template = env.get_template(template_name)
+    if stream_to is not None:
+        stream = template.stream(**kwargs)
+        stream.enable_buffering(STREAM_BUFFER_SIZE)
+        stream.dump(stream_to)
+        return None
     return template.render(**kwargs)
 
 
+def parse_yaml(content):
+    """
+    Parse a YAML document with the libyaml based loader when PyYAML was
+    built with it, which is many times faster than the pure Python one.
+    :param content: YAML document bytes or string
+    :return: Parsed data
+    """
+    import yaml
+    loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+    return yaml.load(content, Loader=loader)
+
+
+def _parsed_yaml_cache_file(path):
+    cache_dir = get_cache_dir()
+    if cache_dir is None:
+        return None
+    digest = hashlib.sha256(path.encode()).hexdigest()[:16]
+    return os.path.join(cache_dir, PARSED_YAML_CACHE_FORMAT.format(digest=digest))
+
+
+def _read_parsed_yaml_cache(cache_file, path):
+    try:
+        with open(cache_file, 'rb') as f:
+            entry = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception:
+        logger.warning(f'Cache file: "{cache_file}" is not readable')
+        return None
+    if (not isinstance(entry, dict) or entry.get('version') != PARSED_YAML_CACHE_VERSION
+            or entry.get('path') != path):
+        return None
+    return entry
+
+
+def dump_pickle(data, filename):
+    """
+    Atomically write data to filename as a pickle.
+    :param data: Data to pickle
+    :param filename: Destination file path
+    """
+    fd, tmp_name = tempfile.mkstemp(
+        dir=os.path.dirname(filename), prefix=f'.{os.path.basename(filename)}-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_name, filename)
+    except BaseException:
+        if os.path.exists(tmp_name):
+            os.unlink(tmp_name)
+        raise
+
+
+def load_yaml(location):
+    """
+    Load a YAML file, reusing the parsed document from the cache directory
+    when the file is unchanged. A cached document is used without reading
+    the file when its mtime and size are unchanged, or after reading it
+    when its content hash is unchanged.
+    :param location: Location of YAML file
+    :return: Parsed data
+    """
+    path = os.path.abspath(location)
+    stat = os.stat(path)
+    cache_file = _parsed_yaml_cache_file(path)
+    if cache_file is None:
+        with open(path, 'rb') as f:
+            return parse_yaml(f.read())
+
+    entry = _read_parsed_yaml_cache(cache_file, path)
+    if entry is not None and entry.get('stat') == (stat.st_mtime_ns, stat.st_size):
+        return entry['data']
+
+    with open(path, 'rb') as f:
+        content = f.read()
+    digest = hashlib.sha256(content).hexdigest()
+    # A file modified again within the mtime resolution of the file
+    # system keeps its mtime, so only trust the mtime of older files.
+    trusted = time.time() - stat.st_mtime > PARSED_YAML_MTIME_SLACK
+    if entry is not None and entry.get('digest') == digest:
+        if not trusted:
+            return entry['data']
+        data = entry['data']
+    else:
+        data = parse_yaml(content)
+
+    try:
+        dump_pickle({
+            'version': PARSED_YAML_CACHE_VERSION,
+            'path': path,
+            'stat': (stat.st_mtime_ns, stat.st_size) if trusted else None,
+            'digest': digest,
+            'data': data,
+        }, cache_file)
+    except OSError:
+        logger.warning(f'Cache file: "{cache_file}" is not writable')
+    return data
+
+
 def load_data(location, data_type='yaml'):
     """
     Load data file from location
@@ -44,11 +226,65 @@ def load_data(location, data_type='yaml'):
     if data_type.lower() not in valid_types:
         raise AttributeError('Valid data types are yaml or json')
 
+    if data_type.lower() == 'yaml':
+        return load_yaml(location)
     with open(location, 'r') as f:
-        if data_type.lower() == 'yaml':
-            return yaml.safe_load(f)
-        elif data_type.lower() == 'json':
-            return json.load(f)
+        return json.load(f)
+
+
+def _check_link(link, location, line_number):
+    """
+    Check the values of a link from a link file. Ports are ints, or
+    digit strings which are converted to ints.
+    :return: Link dict
+    """
+    for guest in ('local_guest', 'remote_guest'):
+        if not isinstance(link[guest], str) or not link[guest]:
+            raise ValueError(f'{location}:{line_number}: {guest} must be a guest name')
+    for port in ('local_port', 'remote_port'):
+        value = link[port]
+        if isinstance(value, str) and value.isdigit():
+            link[port] = int(value)
+        elif not isinstance(value, int) or isinstance(value, bool):
+            raise ValueError(f'{location}:{line_number}: {port} must be a port number')
+    return link
+
+
+def _link_from_row(row, location, line_number):
+    if len(row) != len(LINK_FIELDS):
+        raise ValueError(f'{location}:{line_number}: expected {len(LINK_FIELDS)} columns, got {len(row)}')
+    link = dict(zip(LINK_FIELDS, (value.strip() for value in row)))
+    return _check_link(link, location, line_number)
+
+
+def iter_links(location):
+    """
+    Stream links from a JSONL or CSV link file one row at a time, so
+    huge cabling matrices are never held in memory as a whole. JSONL
+    files hold one object per line, CSV files one link per row with an
+    optional header row. Both use the LINK_FIELDS columns, guests are
+    names and ports are port numbers. The format is chosen by the .csv
+    file extension.
+    :param location: Location of link file
+    :return: Generator of link dicts
+    """
+    with open(location, 'r', newline='') as f:
+        if location.lower().endswith('.csv'):
+            for line_number, row in enumerate(csv.reader(f), 1):
+                if not row or tuple(value.strip() for value in row) == LINK_FIELDS:
+                    continue
+                yield _link_from_row(row, location, line_number)
+        else:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    link = json.loads(line)
+                except ValueError as e:
+                    raise ValueError(f'{location}:{line_number}: {e}') from None
+                if not isinstance(link, dict) or set(link) != set(LINK_FIELDS):
+                    raise ValueError(f'{location}:{line_number}: expected an object with {", ".join(LINK_FIELDS)}')
+                yield _check_link(link, location, line_number)
 
 
 def load_config_file(config_file):
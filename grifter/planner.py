@@ -0,0 +1,128 @@
+import math
+import os
+
+MEMINFO_FILE = '/proc/meminfo'
+
+
+def read_meminfo(meminfo_file=MEMINFO_FILE):
+    """
+    Read memory statistics from /proc/meminfo.
+    :param meminfo_file: Path to meminfo file
+    :return: Dict of field name to value in kB, empty if unavailable
+    """
+    meminfo = {}
+    try:
+        with open(meminfo_file, 'r') as f:
+            for line in f:
+                name, _, value = line.partition(':')
+                fields = value.split()
+                if fields and fields[0].isdigit():
+                    meminfo[name] = int(fields[0])
+    except OSError:
+        pass
+    return meminfo
+
+
+def host_capacity(meminfo_file=MEMINFO_FILE):
+    """
+    Detect the cpus, memory and huge pages memory of this host.
+    :param meminfo_file: Path to meminfo file
+    :return: Dict with cpus and memory and huge_pages_memory in MB
+    """
+    meminfo = read_meminfo(meminfo_file)
+    huge_pages = meminfo.get('HugePages_Total', 0) * meminfo.get('Hugepagesize', 0)
+    return {
+        'cpus': os.cpu_count() or 0,
+        'memory': meminfo.get('MemTotal', 0) // 1024,
+        'huge_pages_memory': huge_pages // 1024,
+    }
+
+
+def topology_requirements(guests):
+    """
+    Sum the resources required by a topology in a single pass over
+    validated and merged guest data.
+    CPU demand counts a guest with throttle_cpu set as that percentage
+    of its cpus.
+    :param guests: Dict of merged guest data
+    :return: Dict of resource totals, memory in MB and storage in bytes
+    """
+    cpus = throttled_cpu_demand = unthrottled_cpus = 0
+    memory = huge_pages_memory = storage = nics = 0
+    for data in guests.values():
+        provider_config = data['provider_config']
+        guest_cpus = provider_config['cpus']
+        cpus += guest_cpus
+        throttle_cpu = data['vagrant_box'].get('throttle_cpu')
+        if throttle_cpu:
+            throttled_cpu_demand += guest_cpus * throttle_cpu / 100
+        else:
+            unthrottled_cpus += guest_cpus
+
+        memory += provider_config['memory']
+        if provider_config.get('huge_pages'):
+            huge_pages_memory += provider_config['memory']
+        for volume in provider_config.get('additional_storage_volumes') or []:
+            storage += int(volume.get('size') or 0)
+
+        nics += (len(data.get('internal_interfaces') or [])
+                 + len(data.get('reserved_interfaces') or [])
+                 + len(data.get('data_interfaces') or []))
+
+    return {
+        'guests': len(guests),
+        'cpus': cpus,
+        'cpu_demand': throttled_cpu_demand + unthrottled_cpus,
+        'throttled_cpu_demand': throttled_cpu_demand,
+        'unthrottled_cpus': unthrottled_cpus,
+        'memory': memory,
+        'huge_pages_memory': huge_pages_memory,
+        'storage': storage,
+        'nics': nics,
+    }
+
+
+def plan_capacity(requirements, capacity):
+    """
+    Compare topology requirements against a host's capacity.
+    :param requirements: Dict from topology_requirements
+    :param capacity: Dict from host_capacity
+    :return: List of suggestions, empty if the topology fits
+    """
+    suggestions = []
+    shards = 1
+
+    if requirements['memory'] > capacity['memory']:
+        if capacity['memory']:
+            shards = max(shards, math.ceil(requirements['memory'] / capacity['memory']))
+        suggestions.append(
+            f'Memory: {requirements["memory"]} MB is required but the host has '
+            f'{capacity["memory"]} MB.')
+
+    if requirements['huge_pages_memory'] > capacity['huge_pages_memory']:
+        suggestions.append(
+            f'Huge pages: {requirements["huge_pages_memory"]} MB is required but the host has '
+            f'{capacity["huge_pages_memory"]} MB of huge pages.')
+
+    if requirements['cpu_demand'] > capacity['cpus']:
+        suggestions.append(
+            f'CPUs: {requirements["cpu_demand"]:g} cpus are required but the host has '
+            f'{capacity["cpus"]}.')
+        available = capacity['cpus'] - requirements['throttled_cpu_demand']
+        throttle_cpu = 0
+        if requirements['unthrottled_cpus'] and available > 0:
+            throttle_cpu = min(99, math.floor(100 * available / requirements['unthrottled_cpus']))
+        # throttle_cpu: 1 is forbidden by the guest schema.
+        if throttle_cpu >= 2:
+            suggestions.append(
+                f'Set vagrant_box throttle_cpu: {throttle_cpu} on the guests '
+                f'that are not throttled.')
+        elif capacity['cpus']:
+            shards = max(shards, math.ceil(requirements['cpu_demand'] / capacity['cpus']))
+
+    if shards > 1:
+        hosts = ' '.join(f'--host <host{i}>' for i in range(1, shards + 1))
+        suggestions.append(
+            f'Shard the topology across at least {shards} hosts with '
+            f'grifter create --shards {shards} {hosts}.')
+    return suggestions
@@ -0,0 +1,268 @@
+from collections.abc import Mapping, Sequence, Sized
+
+# Cerberus types the compiled validator understands and their
+# (included types, excluded types) as defined by Cerberus.
+TYPES = {
+    'boolean': ((bool,), ()),
+    'dict': ((Mapping,), ()),
+    'integer': ((int,), ()),
+    'list': ((Sequence,), (str,)),
+    'string': ((str,), ()),
+}
+
+# Rules that only affect normalization or required field checks and
+# are therefore not evaluated against a field's value.
+NON_VALUE_RULES = ('default', 'nullable', 'required', 'type', 'empty')
+
+SUPPORTED_RULES = {
+    'allowed',
+    'default',
+    'empty',
+    'forbidden',
+    'max',
+    'min',
+    'nullable',
+    'required',
+    'schema',
+    'type',
+}
+
+
+class FallbackRequired(Exception):
+    """
+    Raised when a document has a shape the compiled validator does not
+    handle exactly like Cerberus does.
+    """
+
+
+def compile_schema(schema):
+    """
+    Compile a Cerberus schema into a CompiledValidator.
+    :param schema: Cerberus schema dict
+    :return: CompiledValidator or None if the schema uses unsupported rules
+    """
+    try:
+        rules = _compile_mapping(schema)
+    except FallbackRequired:
+        return None
+    return CompiledValidator(schema, rules)
+
+
+def _compile_mapping(schema):
+    if not isinstance(schema, Mapping):
+        raise FallbackRequired
+    return {field: _compile_field(rules) for field, rules in schema.items()}
+
+
+def _compile_field(rules):
+    if not isinstance(rules, Mapping) or not set(rules) <= SUPPORTED_RULES:
+        raise FallbackRequired
+
+    data_type = rules.get('type')
+    if data_type is not None and (not isinstance(data_type, str) or data_type not in TYPES):
+        raise FallbackRequired
+
+    sub_schema = None
+    if 'schema' in rules:
+        if data_type == 'dict':
+            sub_schema = _compile_mapping(rules['schema'])
+        elif data_type == 'list':
+            sub_schema = _compile_field(rules['schema'])
+        else:
+            raise FallbackRequired
+
+    # Cerberus evaluates nullable, type and empty first and then the
+    # remaining rules in the order they are declared in the schema.
+    checks = [rule for rule in rules if rule not in NON_VALUE_RULES]
+    return {
+        'rules': rules,
+        'type': data_type,
+        'types': TYPES.get(data_type),
+        'checks': checks,
+        'schema': sub_schema,
+    }
+
+
+class CompiledValidator:
+    """
+    Plain Python validator for the subset of Cerberus rules used by the
+    grifter schemas. The validate method and errors property mirror the
+    Cerberus Validator API and produce the same error tree.
+    Documents that are not dicts are handed to Cerberus unchanged.
+    """
+    def __init__(self, schema, compiled):
+        self.schema = schema
+        self._compiled = compiled
+        self._errors = []
+        self._fallback = None
+        self._fallback_errors = None
+
+    @property
+    def fallback(self):
+        if self._fallback is None:
+            from cerberus import Validator
+            self._fallback = Validator(self.schema)
+        return self._fallback
+
+    def validate(self, document):
+        self._errors = []
+        self._fallback_errors = None
+        if not isinstance(document, Mapping):
+            return self._validate_with_fallback(document)
+        try:
+            document = _normalize_mapping(document, self._compiled)
+            _validate_mapping(document, self._compiled, (), self._errors)
+        except FallbackRequired:
+            return self._validate_with_fallback(document)
+        return not self._errors
+
+    def _validate_with_fallback(self, document):
+        result = self.fallback.validate(document)
+        self._fallback_errors = self.fallback.errors
+        return result
+
+    @property
+    def errors(self):
+        if self._fallback_errors is not None:
+            return self._fallback_errors
+        return build_error_tree(self._errors)
+
+
+def _normalize_mapping(mapping, compiled):
+    """
+    Apply schema defaults to a copy of mapping, as Cerberus does before
+    validating a document.
+    """
+    mapping = dict(mapping)
+    for field, field_rules in compiled.items():
+        rules = field_rules['rules']
+        if 'default' in rules and (
+                field not in mapping or
+                (mapping[field] is None and not rules.get('nullable', False))):
+            mapping[field] = rules['default']
+
+    for field, value in mapping.items():
+        field_rules = compiled.get(field)
+        if field_rules is None or field_rules['schema'] is None:
+            continue
+        if isinstance(value, Mapping):
+            if field_rules['type'] != 'dict':
+                raise FallbackRequired
+            mapping[field] = _normalize_mapping(value, field_rules['schema'])
+        elif isinstance(value, str):
+            continue
+        elif isinstance(value, Sequence):
+            if field_rules['type'] != 'list':
+                raise FallbackRequired
+            item_rules = {i: field_rules['schema'] for i in range(len(value))}
+            items = _normalize_mapping(dict(enumerate(value)), item_rules)
+            mapping[field] = list(items.values())
+    return mapping
+
+
+def _validate_mapping(document, compiled, path, errors):
+    for field, value in document.items():
+        field_rules = compiled.get(field)
+        if field_rules is None:
+            errors.append((path + (field,), (), 'unknown field'))
+        else:
+            _validate_field(value, field_rules, path + (field,), errors)
+
+    for field, field_rules in compiled.items():
+        if field_rules['rules'].get('required') is True and field not in document:
+            errors.append((path + (field,), ('required',), 'required field'))
+
+
+def _validate_field(value, field_rules, path, errors):
+    rules = field_rules['rules']
+
+    if value is None:
+        if not rules.get('nullable', False):
+            errors.append((path, ('nullable',), 'null value not allowed'))
+        return
+
+    if field_rules['types'] is not None:
+        included, excluded = field_rules['types']
+        if not isinstance(value, included) or isinstance(value, excluded):
+            errors.append((path, ('type',), f'must be of {field_rules["type"]} type'))
+            return
+
+    skip_value_checks = False
+    if 'empty' in rules and isinstance(value, Sized) and len(value) == 0:
+        skip_value_checks = True
+        if not rules['empty']:
+            errors.append((path, ('empty',), 'empty values not allowed'))
+
+    for rule in field_rules['checks']:
+        constraint = rules[rule]
+        if rule == 'allowed':
+            if skip_value_checks:
+                continue
+            if isinstance(value, str) or not isinstance(value, (Sequence, Mapping)):
+                if value not in constraint:
+                    errors.append((path, (rule,), f'unallowed value {value}'))
+            else:
+                raise FallbackRequired
+        elif rule == 'forbidden':
+            if skip_value_checks:
+                continue
+            if isinstance(value, str) or not isinstance(value, (Sequence, Mapping)):
+                if value in constraint:
+                    errors.append((path, (rule,), f'unallowed value {value}'))
+            else:
+                raise FallbackRequired
+        elif rule == 'min':
+            try:
+                if value < constraint:
+                    errors.append((path, (rule,), f'min value is {constraint}'))
+            except TypeError:
+                pass
+        elif rule == 'max':
+            try:
+                if value > constraint:
+                    errors.append((path, (rule,), f'max value is {constraint}'))
+            except TypeError:
+                pass
+        elif rule == 'schema':
+            if isinstance(value, Mapping):
+                _validate_mapping(value, field_rules['schema'], path, errors)
+            elif isinstance(value, Sequence) and not isinstance(value, str):
+                for i, item in enumerate(value):
+                    _validate_field(item, field_rules['schema'], path + (i,), errors)
+
+
+def _path_key(path):
+    # Cerberus orders integer path elements before string elements.
+    return tuple((0, i) if isinstance(i, int) else (1, i) for i in path)
+
+
+def build_error_tree(errors):
+    """
+    Build a Cerberus style error tree from a list of errors.
+    :param errors: List of (document_path, rule, message) tuples
+    :return: Dict of errors in the Cerberus BasicErrorHandler format
+    """
+    tree = {}
+    for path, _, message in sorted(errors, key=lambda e: (_path_key(e[0]), e[1])):
+        node = tree
+        for field in path[:-1]:
+            if field not in node:
+                node[field] = [{}]
+            node = node[field][-1]
+        field = path[-1]
+        if field in node:
+            subtree = node[field].pop()
+            node[field] += [message, subtree]
+        else:
+            node[field] = [message, {}]
+    _purge_empty_dicts(tree)
+    return tree
+
+
+def _purge_empty_dicts(tree):
+    for field in tree:
+        error_list = tree[field]
+        if not error_list[-1]:
+            error_list.pop()
+        else:
+            _purge_empty_dicts(error_list[-1])
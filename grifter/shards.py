@@ -0,0 +1,259 @@
+import heapq
+
+from .constants import (
+    SHARD_IMBALANCE,
+    SHARD_REFINE_PASSES,
+    SHARD_TUNNEL_BASE_PORT,
+)
+
+MAX_UDP_PORT = 65535
+
+
+def guest_weights(guests):
+    """
+    Weight each guest by its share of the total memory and cpus so that
+    both resources are balanced across hosts.
+    :param guests: Dict of merged guest data
+    :return: Dict of guest to weight
+    """
+    memory = {k: v['provider_config']['memory'] for k, v in guests.items()}
+    cpus = {k: v['provider_config']['cpus'] for k, v in guests.items()}
+    total_memory = sum(memory.values()) or 1
+    total_cpus = sum(cpus.values()) or 1
+    return {k: memory[k] / total_memory + cpus[k] / total_cpus for k in guests}
+
+
+def colocated_groups(guests):
+    """
+    Group guests joined by internal interfaces, such as the control and
+    forwarding planes of a vMX, which must run on the same host.
+    :param guests: Dict of merged guest data
+    :return: Dict of guest to group leader
+    """
+    leaders = {k: k for k in guests}
+
+    def find(guest):
+        while leaders[guest] != guest:
+            leaders[guest] = leaders[leaders[guest]]
+            guest = leaders[guest]
+        return guest
+
+    for guest, data in guests.items():
+        for interface in data.get('internal_interfaces') or []:
+            if interface['remote_guest'] in guests:
+                leaders[find(interface['remote_guest'])] = find(guest)
+    return {k: find(k) for k in guests}
+
+
+def partition_guests(guests, connections, num_shards, imbalance=SHARD_IMBALANCE):
+    """
+    Partition guests across num_shards hosts, keeping the number of links
+    between hosts low while balancing memory and cpus.
+    Guests are placed by growing each shard along links from the largest
+    guests, then refined with Fiduccia-Mattheyses passes, see
+    _refine_partition. This is a heuristic, it finds a minimum cut for
+    small and clustered topologies but is not guaranteed to in general.
+    :param guests: Dict of merged guest data
+    :param connections: List of Connections from generate_connections_list
+    :param num_shards: Number of hosts
+    :param imbalance: Fraction a shard may exceed an even share of the load by
+    :return: List of lists of guest names, one per shard
+    """
+    if num_shards < 1:
+        raise ValueError('num_shards must be at least 1')
+
+    leaders = colocated_groups(guests)
+    weights = guest_weights(guests)
+    unit_weights = {}
+    for guest, leader in leaders.items():
+        unit_weights[leader] = unit_weights.get(leader, 0) + weights[guest]
+
+    # Number of links between each pair of units.
+    adjacency = {unit: {} for unit in unit_weights}
+    for connection in connections:
+        local_unit = leaders.get(connection['local_guest'])
+        remote_unit = leaders.get(connection['remote_guest'])
+        if local_unit is None or remote_unit is None or local_unit == remote_unit:
+            continue
+        adjacency[local_unit][remote_unit] = adjacency[local_unit].get(remote_unit, 0) + 1
+        adjacency[remote_unit][local_unit] = adjacency[remote_unit].get(local_unit, 0) + 1
+
+    total_weight = sum(unit_weights.values())
+    capacity = max(total_weight / num_shards * (1 + imbalance), max(unit_weights.values(), default=0))
+
+    # Breadth first order from the heaviest unit of each connected
+    # component so neighbours are placed one after another.
+    order = []
+    seen = set()
+    for start in sorted(unit_weights, key=lambda u: (-unit_weights[u], str(u))):
+        if start in seen:
+            continue
+        seen.add(start)
+        queue = [start]
+        for unit in queue:
+            order.append(unit)
+            for neighbour in sorted(adjacency[unit], key=str):
+                if neighbour not in seen:
+                    seen.add(neighbour)
+                    queue.append(neighbour)
+
+    load = [0.0] * num_shards
+    assignment = {}
+    for unit in order:
+        weight = unit_weights[unit]
+        links = _links_per_shard(unit, adjacency, assignment, num_shards)
+        candidates = [s for s in range(num_shards) if load[s] + weight <= capacity]
+        if not candidates:
+            candidates = [min(range(num_shards), key=lambda s: load[s])]
+        shard = max(candidates, key=lambda s: (links[s], -load[s], -s))
+        assignment[unit] = shard
+        load[shard] += weight
+
+    for _ in range(SHARD_REFINE_PASSES):
+        if not _refine_partition(order, adjacency, unit_weights, assignment, load, capacity, num_shards):
+            break
+
+    shards = [[] for _ in range(num_shards)]
+    for guest in guests:
+        shards[assignment[leaders[guest]]].append(guest)
+    return shards
+
+
+def _links_per_shard(unit, adjacency, assignment, num_shards):
+    links = [0] * num_shards
+    for neighbour, count in adjacency[unit].items():
+        if neighbour in assignment:
+            links[assignment[neighbour]] += count
+    return links
+
+
+def _refine_partition(order, adjacency, unit_weights, assignment, load, capacity, num_shards):
+    """
+    One Fiduccia-Mattheyses pass over a partition. Units are moved one at
+    a time, highest gain in cross-host links first even when the gain is
+    negative, and each unit moves at most once. The pass then rolls back
+    to the best prefix of moves: the least load over capacity, then the
+    fewest cross-host links, then the lowest peak load. A shard may go
+    one unit over capacity during the pass, so that units can trade
+    places between full shards.
+    :param order: List of units, ties between equal gains go to the first
+    :param adjacency: Dict of unit to dict of neighbour unit to link count
+    :param unit_weights: Dict of unit to weight
+    :param assignment: Dict of unit to shard, updated in place
+    :param load: List of shard loads, updated in place
+    :param capacity: Maximum shard load
+    :param num_shards: Number of shards
+    :return: True if the partition improved
+    """
+    position = {unit: i for i, unit in enumerate(order)}
+    pass_capacity = capacity + max(unit_weights.values(), default=0)
+
+    def best_move(unit):
+        links = _links_per_shard(unit, adjacency, assignment, num_shards)
+        current = assignment[unit]
+        best = None
+        for shard in range(num_shards):
+            if shard == current or load[shard] + unit_weights[unit] > pass_capacity:
+                continue
+            key = (links[shard] - links[current], -load[shard])
+            if best is None or key > best[0]:
+                best = (key, shard)
+        return best
+
+    def score(cut_change):
+        peak = max(load)
+        return max(peak - capacity, 0), cut_change, peak
+
+    heap = []
+
+    def queue(unit):
+        move = best_move(unit)
+        if move is not None:
+            heapq.heappush(heap, (-move[0][0], position[unit], unit))
+
+    for unit in order:
+        queue(unit)
+    locked = set()
+    moves = []
+    cut_change = 0
+    best_score = score(cut_change)
+    best_moves = 0
+    while heap:
+        negative_gain, _, unit = heapq.heappop(heap)
+        if unit in locked:
+            continue
+        move = best_move(unit)
+        if move is None:
+            continue
+        (gain, _), shard = move
+        if gain != -negative_gain:
+            # The gain changed since the unit was queued.
+            queue(unit)
+            continue
+
+        current = assignment[unit]
+        assignment[unit] = shard
+        load[current] -= unit_weights[unit]
+        load[shard] += unit_weights[unit]
+        locked.add(unit)
+        moves.append((unit, current))
+        cut_change -= gain
+        if score(cut_change) < best_score:
+            best_score = score(cut_change)
+            best_moves = len(moves)
+        for neighbour in adjacency[unit]:
+            if neighbour not in locked:
+                queue(neighbour)
+
+    for unit, shard in reversed(moves[best_moves:]):
+        load[assignment[unit]] -= unit_weights[unit]
+        load[shard] += unit_weights[unit]
+        assignment[unit] = shard
+    return best_moves > 0
+
+
+def generate_cross_host_endpoints(guests, shards, hosts, base_port=SHARD_TUNNEL_BASE_PORT):
+    """
+    Generate the UDP tunnel endpoints of data interfaces that link guests
+    on different hosts. Both ends bind the address of their host, with
+    ports allocated per host from base_port in guest and port order.
+    Every cross-host link must be declared on both guests.
+    :param guests: Dict of merged guest data
+    :param shards: List of lists of guest names, one per shard
+    :param hosts: List of host tunnel addresses, one per shard
+    :param base_port: First UDP port allocated on each host
+    :return: Dict of (guest, local_port) to endpoint dict with the keys
+             local_ip, local_port, remote_ip and remote_port
+    """
+    if len(hosts) != len(shards):
+        raise ValueError(f'{len(shards)} shards need {len(shards)} host addresses, got {len(hosts)}')
+
+    guest_shard = {guest: i for i, shard in enumerate(shards) for guest in shard}
+    cross_host_links = []
+    for guest, data in guests.items():
+        for interface in data.get('data_interfaces') or []:
+            remote_guest = interface['remote_guest']
+            if remote_guest in guest_shard and guest_shard[remote_guest] != guest_shard[guest]:
+                cross_host_links.append((guest, interface['local_port'], remote_guest, interface['remote_port']))
+
+    next_port = [base_port] * len(shards)
+    ports = {}
+    for guest, local_port, _, _ in sorted(cross_host_links, key=lambda x: (str(x[0]), x[1])):
+        shard = guest_shard[guest]
+        if next_port[shard] > MAX_UDP_PORT:
+            raise ValueError(f'{hosts[shard]} has more cross-host links than available UDP ports')
+        ports[(guest, local_port)] = next_port[shard]
+        next_port[shard] += 1
+
+    endpoints = {}
+    for guest, local_port, remote_guest, remote_port in cross_host_links:
+        if (remote_guest, remote_port) not in ports:
+            raise ValueError(f'{guest}\'s local_port: {local_port} connects to {remote_guest}\'s port: '
+                             f'{remote_port} on another host, but it is not connected back.')
+        endpoints[(guest, local_port)] = {
+            'local_ip': hosts[guest_shard[guest]],
+            'local_port': ports[(guest, local_port)],
+            'remote_ip': hosts[guest_shard[remote_guest]],
+            'remote_port': ports[(remote_guest, remote_port)],
+        }
+    return endpoints
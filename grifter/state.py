@@ -0,0 +1,79 @@
+import contextlib
+import json
+import logging
+
+from .api import write_if_changed
+from .constants import STATE_FILE
+
+logger = logging.getLogger(__name__)
+
+STATE_VERSION = 1
+
+
+def empty_state():
+    return {
+        'version': STATE_VERSION,
+        'domain_uuid': '',
+        'loopbacks': {},
+        'macs': {},
+    }
+
+
+def load_state(filename=STATE_FILE):
+    """
+    Load prior allocations from a state file. A missing file, or one
+    written by an incompatible version, results in an empty state.
+    :param filename: State file path
+    :return: Dict of allocation state
+    """
+    try:
+        with open(filename, 'r') as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return empty_state()
+    except ValueError:
+        logger.warning(f'State file: "{filename}" is not valid JSON, allocating from scratch')
+        return empty_state()
+
+    if not isinstance(state, dict) or state.get('version') != STATE_VERSION:
+        logger.warning(f'State file: "{filename}" has an unknown version, allocating from scratch')
+        return empty_state()
+    return {**empty_state(), **state}
+
+
+def save_state(state, filename=STATE_FILE):
+    """
+    Write the allocation state to filename. The file is only replaced
+    when the allocations have changed.
+    :param state: Dict of allocation state
+    :param filename: State file path
+    :return: True if the state file was written, False if it was unchanged
+    """
+    def render(f):
+        json.dump(state, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+    return write_if_changed(filename, render)
+
+
+@contextlib.contextmanager
+def locked_state(filename=STATE_FILE):
+    """
+    Hold an exclusive lock on the state file while allocations are read
+    and updated. The state yielded is saved when the block exits without
+    an exception.
+    :param filename: State file path
+    :return: Dict of allocation state
+    """
+    # fcntl is only available on POSIX platforms, which is all libvirt
+    # supports anyway.
+    import fcntl
+
+    with open(f'{filename}.lock', 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            state = load_state(filename)
+            yield state
+            save_state(state, filename)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
@@ -1,8 +1,18 @@
+import hashlib
+import os
 import random
 import uuid
 import string
 import re
 
+from collections.abc import Mapping, MutableMapping
+
+
+# qcow2 images start with this magic, the virtual size is the big endian
+# 64 bit integer at offset 24.
+QCOW2_MAGIC = b'QFI\xfb'
+QCOW2_HEADER_SIZE = 32
+
 
 def get_mac(oui='28:b7:ad'):
     """
@@ -22,18 +32,48 @@ def get_uuid():
     return str(uuid.uuid5(uuid.uuid4(), string.ascii_letters))
 
 
+def get_image_virtual_size(path):
+    """
+    Get the size of the disk presented by an image file. For qcow2 images
+    this is the virtual size from the image header, otherwise the file size.
+    :param path: Path to the image file.
+    :return: Size in bytes.
+    """
+    with open(path, 'rb') as f:
+        header = f.read(QCOW2_HEADER_SIZE)
+    if len(header) == QCOW2_HEADER_SIZE and header.startswith(QCOW2_MAGIC):
+        return int.from_bytes(header[24:32], 'big')
+    return os.path.getsize(path)
+
+
 def remove_duplicates(list_of_tuples):
     """
-    Takes a list of tuples and removes duplicate entries.
+    Takes a list of tuples and removes duplicate entries, keeping the
+    first of each in order.
     Reverses the pairs (0, 1, 2, 3) to (2, 3, 0, 1) for comparison.
     :param list_of_tuples: [(0, 1, 2, 3), (2, 3, 0, 1)]
     :return: List of unique tuples.
     """
     reduced = set()
+    unique = []
     for i in list_of_tuples:
-        if not (i[2], i[3], i[0], i[1]) in reduced:
+        if i not in reduced and (i[2], i[3], i[0], i[1]) not in reduced:
             reduced.add(i)
-    return list(reduced)
+            unique.append(i)
+    return unique
+
+
+_DIGITS = re.compile('([0-9]+)')
+
+
+def natural_key(text):
+    """
+    Key to sort strings in the way that humans expect, runs of digits
+    are compared as numbers.
+    :param text: String to make a key of.
+    :return: Tuple of alternating strings and ints.
+    """
+    return tuple(int(c) if c.isdigit() else c for c in _DIGITS.split(text))
 
 
 def sort_nicely(the_list):
@@ -47,13 +87,7 @@ def sort_nicely(the_list):
     if not the_list:
         return the_list
 
-    def convert(text):
-        return int(text) if text.isdigit() else text
-
-    def alphanum_key(key):
-        return [convert(c) for c in re.split('([0-9]+)', key)]
-
-    return sorted(the_list, key=alphanum_key)
+    return sorted(the_list, key=natural_key)
 
 
 def dict_merge(a, b):
@@ -70,3 +104,144 @@ def dict_merge(a, b):
         else:
             a[key] = b[key]
     return a
+
+
+class LazyMapping(Mapping):
+    """
+    Read-only mapping whose data is loaded by a function on first access,
+    for module level data that is too slow to load at import time.
+    """
+    __slots__ = ('_load',)
+
+    def __init__(self, load):
+        self._load = load
+
+    def __getitem__(self, key):
+        return self._load()[key]
+
+    def __iter__(self):
+        return iter(self._load())
+
+    def __len__(self):
+        return len(self._load())
+
+    def __repr__(self):
+        return repr(self._load())
+
+
+# Common value types that are never merged, checked before the slower
+# isinstance check against Mapping.
+_LEAF_TYPES = frozenset((str, int, bool, float, list, type(None)))
+
+
+class LayeredDict(MutableMapping):
+    """
+    Copy-on-write view that merges dict-like layers with the same
+    semantics as dict_merge, without copying them. Layers are given from
+    least to most preferred. Lookups are resolved lazily, nested dicts are
+    returned as views over the matching nested layers and writes or
+    deletes are recorded on the view, leaving the layers untouched.
+    """
+    __slots__ = ('_layers', '_overrides', '_deleted', '_children')
+
+    def __init__(self, *layers):
+        self._layers = layers
+        self._overrides = {}
+        self._deleted = set()
+        self._children = {}
+
+    def __getitem__(self, key):
+        if key in self._overrides:
+            return self._overrides[key]
+        if key in self._deleted:
+            raise KeyError(key)
+        if key in self._children:
+            return self._children[key]
+
+        nested = []
+        for layer in reversed(self._layers):
+            if key not in layer:
+                continue
+            value = layer[key]
+            if type(value) in _LEAF_TYPES or not isinstance(value, Mapping):
+                if nested:
+                    # A non dict value in a less preferred layer is
+                    # replaced, not merged.
+                    break
+                return value
+            nested.append(value)
+        if not nested:
+            raise KeyError(key)
+
+        child = LayeredDict(*reversed(nested))
+        self._children[key] = child
+        return child
+
+    def __setitem__(self, key, value):
+        self._overrides[key] = value
+        self._deleted.discard(key)
+        self._children.pop(key, None)
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self._overrides.pop(key, None)
+        self._children.pop(key, None)
+        self._deleted.add(key)
+
+    def __iter__(self):
+        # Keys are ordered as dict_merge would order them, keys from less
+        # preferred layers first and new keys appended in layer order.
+        seen = set()
+        for layer in self._layers + (self._overrides,):
+            for key in layer:
+                if key not in seen and key not in self._deleted:
+                    seen.add(key)
+                    yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __contains__(self, key):
+        if key in self._overrides:
+            return True
+        if key in self._deleted:
+            return False
+        return any(key in layer for layer in self._layers)
+
+    def __copy__(self):
+        new = LayeredDict(*self._layers)
+        new._overrides = dict(self._overrides)
+        new._deleted = set(self._deleted)
+        new._children = dict(self._children)
+        return new
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.to_dict()!r})'
+
+    def to_dict(self):
+        """
+        Materialise the view into plain nested dicts.
+        :return: Dict
+        """
+        return {
+            key: value.to_dict() if isinstance(value, LayeredDict) else value
+            for key, value in self.items()
+        }
+
+
+def file_digest(path, ignore_prefixes=()):
+    """
+    Generate a SHA256 digest of a text file's content.
+    :param path: Path to the file.
+    :param ignore_prefixes: Tuple of line prefixes to exclude from the digest.
+    :return: Hex digest string.
+    """
+    ignore_prefixes = tuple(ignore_prefixes)
+    digest = hashlib.sha256()
+    with open(path, 'r') as f:
+        for line in f:
+            if ignore_prefixes and line.lstrip().startswith(ignore_prefixes):
+                continue
+            digest.update(line.encode())
+    return digest.hexdigest()
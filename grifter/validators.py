@@ -1,27 +1,100 @@
-from cerberus import Validator
+import copy
+import functools
+
 from grifter.loaders import load_data
+from grifter.schema_compiler import compile_schema
+from grifter.custom_filters import tunnel_port
 from grifter.constants import (
     GUEST_SCHEMA_FILE,
     GUEST_CONFIG_SCHEMA,
     GUEST_PAIRS_SCHEMA,
-
+    BLUEPRINT_SCHEMA,
+    INTERFACE_BASE_PORTS,
+    INTERFACE_PORT_RANGE,
 )
 required_keys = ['vagrant_box']
 
 
-def validate_config(guest_config):
+@functools.lru_cache(maxsize=None)
+def load_schema(schema_file):
+    """
+    Load a schema file once per process.
+    The returned dict is shared and must not be mutated.
+    :param schema_file: Path to schema file
+    :return: Schema dict
+    """
+    return load_data(schema_file)
+
+
+def guest_defaults_schema():
+    """
+    Guest default schema should be the same as a guest
+    schema apart from the vagrant box name attribute.
+    :return: Schema dict
+    """
+    schema = copy.deepcopy(load_schema(GUEST_SCHEMA_FILE))
+    schema['vagrant_box']['schema'].pop('name')
+    return schema
+
+
+SCHEMAS = {
+    'guest': lambda: load_schema(GUEST_SCHEMA_FILE),
+    'guest_defaults': guest_defaults_schema,
+    'guest_config': lambda: load_schema(GUEST_CONFIG_SCHEMA),
+    'guest_pairs': lambda: load_schema(GUEST_PAIRS_SCHEMA),
+    'blueprint': lambda: load_schema(BLUEPRINT_SCHEMA),
+}
+
+
+VALIDATOR_ENGINES = ('fast', 'cerberus')
+DEFAULT_VALIDATOR_ENGINE = 'fast'
+
+
+@functools.lru_cache(maxsize=None)
+def get_validator(schema_name, engine=DEFAULT_VALIDATOR_ENGINE):
+    """
+    Return a Validator for one of the named SCHEMAS. The schema is
+    compiled once and the Validator is reused for every document.
+    :param schema_name: Key of SCHEMAS
+    :param engine: fast to use a validator compiled from the schema,
+                   falling back to Cerberus if the schema uses rules it does
+                   not support, or cerberus to always use Cerberus
+    :return: Validator
+    """
+    if engine not in VALIDATOR_ENGINES:
+        raise AttributeError(f'Valid validator engines are: {", ".join(VALIDATOR_ENGINES)}')
+
+    schema = SCHEMAS[schema_name]()
+    if engine == 'fast':
+        validator = compile_schema(schema)
+        if validator is not None:
+            return validator
+
+    from cerberus import Validator
+    return Validator(schema)
+
+
+def validate_documents(documents, schema_name, engine=DEFAULT_VALIDATOR_ENGINE):
+    """
+    Validate each document against a named schema.
+    :param documents: Dict of documents to validate
+    :param schema_name: Key of SCHEMAS
+    :param engine: Validator engine, one of VALIDATOR_ENGINES
+    :return: errors list
+    """
+    validator = get_validator(schema_name, engine)
     errors = []
+    for key, data in documents.items():
+        if not validator.validate(data):
+            errors.append(validator.errors)
+    return errors
+
 
-    def _validate(config, schema):
-        validation_errors = []
-        for key, data in config.items():
-            result = validate_schema(data, schema)
-            if result.errors:
-                validation_errors.append(result.errors)
-        return validation_errors
+def validate_config(guest_config, engine=DEFAULT_VALIDATOR_ENGINE):
+    errors = []
 
-    guest_config_result = _validate(guest_config['guest_config'], load_data(GUEST_CONFIG_SCHEMA))
-    guest_pairs_result = _validate(guest_config['guest_pairs'], load_data(GUEST_PAIRS_SCHEMA))
+    guest_config_result = validate_documents(guest_config['guest_config'], 'guest_config', engine)
+    guest_pairs_result = validate_documents(guest_config['guest_pairs'], 'guest_pairs', engine)
 
     if guest_config_result:
         errors += guest_config_result
@@ -32,26 +105,28 @@ def validate_config(guest_config):
     return errors
 
 
-def validate_data(guest_data, guest_default_data=False):
+def validate_data(guest_data, guest_default_data=False, engine=DEFAULT_VALIDATOR_ENGINE):
     """
     Validate data conforms to required schema
     :param guest_data: Guest data dict
     :param guest_default_data: True if validating guest defaults
+    :param engine: Validator engine, one of VALIDATOR_ENGINES
     :return: errors list
     """
-    errors = []
-    schema = load_data(GUEST_SCHEMA_FILE)
-    # Guest default schema should be the same as a guest
-    # schema apart from the vagrant box name attribute.
-    if guest_default_data:
-        schema['vagrant_box']['schema'].pop('name')
+    schema_name = 'guest_defaults' if guest_default_data else 'guest'
+    return validate_documents(guest_data, schema_name, engine)
 
-    for guest, data in guest_data.items():
-        result = validate_schema(data, schema)
-        if result.errors:
-            errors.append(result.errors)
 
-    return errors
+def validate_blueprint(blueprint, engine=DEFAULT_VALIDATOR_ENGINE):
+    """
+    Validate a fabric blueprint conforms to the blueprint schema
+    :param blueprint: Blueprint dict
+    :param engine: Validator engine, one of VALIDATOR_ENGINES
+    :return: errors list
+    """
+    if not isinstance(blueprint, dict):
+        return ['A blueprint must be a mapping.']
+    return validate_documents({'blueprint': blueprint}, 'blueprint', engine)
 
 
 def validate_guests_in_guest_config(guests, config):
@@ -132,6 +207,164 @@ def validate_guest_interfaces(guests, config, int_map):
     return True
 
 
+def _occupy_port(occupancy, guest, interface, errors):
+    """
+    Record the remote end of a data interface by its (guest, local_port).
+    :return: False with an error appended if the port is already in use
+    """
+    port = (guest, interface['local_port'])
+    if port in occupancy:
+        errors.append(
+            f'{guest}\'s local_port: {interface["local_port"]} '
+            f'is defined more than once.')
+        return False
+    occupancy[port] = (interface['remote_guest'], interface['remote_port'])
+    return True
+
+
+def _asymmetric_link_errors(links, occupancy):
+    """
+    Report links whose remote port does not connect back to them.
+    :param links: List of (guest, local_port, remote_guest, remote_port)
+    :param occupancy: Dict of (guest, local_port) to (remote_guest, remote_port)
+    :return: errors list
+    """
+    errors = []
+    for guest, local_port, remote_guest, remote_port in links:
+        peer = occupancy.get((remote_guest, remote_port))
+        if peer != (guest, local_port):
+            if peer is None or peer[0] == 'blackhole':
+                reason = 'is not connected back'
+            else:
+                reason = f'is connected to {peer[0]}\'s port: {peer[1]}'
+            errors.append(
+                f'{guest}\'s local_port: {local_port} connects to '
+                f'{remote_guest}\'s port: {remote_port}, but {remote_guest}\'s '
+                f'local_port: {remote_port} {reason}.')
+    return errors
+
+
+def validate_links(guests):
+    """
+    Validate that no data port is used more than once and that every
+    link is declared on both guests. validate_topology makes the same
+    checks along with the box and port range checks.
+    :param guests: Dict of guest data
+    :return: errors list
+    """
+    errors = []
+    occupancy = {}
+    links = []
+    for guest, data in guests.items():
+        for interface in data.get('data_interfaces') or []:
+            if _occupy_port(occupancy, guest, interface, errors) and interface['remote_guest'] != 'blackhole':
+                links.append((guest, interface['local_port'], interface['remote_guest'], interface['remote_port']))
+    errors += _asymmetric_link_errors(links, occupancy)
+    return errors
+
+
+def validate_topology(guests, config, int_map):
+    """
+    Validate guest boxes and data interface connections in a single pass.
+    Unlike validate_guests_in_guest_config and validate_guest_interfaces
+    every error is collected rather than raising on the first one.
+    Guest to box and (guest, port) occupancy indexes are built once so
+    the total cost is linear in the number of links.
+    :param guests: Dict of merged guest data
+    :param config: Dict of config data
+    :param int_map: Dict of guest type interface port mappings
+    :return: errors list
+    """
+    guest_config = config['guest_config']
+    errors = []
+
+    box_index = {}
+    for guest, data in guests.items():
+        local_box = data['vagrant_box']['name']
+        if not guest_config.get(local_box):
+            errors.append(
+                f'{guest}\'s vagrant box type: {local_box} '
+                f'is not defined in the config file.')
+        else:
+            box_index[guest] = local_box
+
+    occupancy = {}
+    links = []
+    missing_guests = set()
+    for guest, data in guests.items():
+        local_box = box_index.get(guest)
+        if local_box is not None:
+            box_config = guest_config[local_box]
+            num_internal_interfaces = len(data['internal_interfaces'])
+            total_interfaces = (box_config['max_data_interfaces'] + num_internal_interfaces
+                                + len(data['reserved_interfaces']))
+            if data['provider_config']['nic_adapter_count'] > total_interfaces:
+                errors.append(
+                    f'The number of data interfaces for {guest} '
+                    f'is greater than the allowed {local_box} maximum data interfaces.')
+            if num_internal_interfaces != box_config['internal_interfaces']:
+                errors.append(
+                    f'The number of internal interfaces for {guest}: {num_internal_interfaces} '
+                    f'is not equal to the {local_box} internal interfaces value: '
+                    f'{box_config["internal_interfaces"]}.')
+
+        for interface in data['data_interfaces']:
+            local_port = interface['local_port']
+            remote_guest = interface['remote_guest']
+            remote_port = interface['remote_port']
+
+            if local_box is not None and not int_map[local_box]['data_interfaces'].get(local_port):
+                errors.append(
+                    f'{guest}\'s local_port: {local_port} '
+                    f'is outside the supported range.')
+
+            if not _occupy_port(occupancy, guest, interface, errors):
+                continue
+
+            if remote_guest == 'blackhole':
+                continue
+
+            if remote_guest not in guests:
+                if remote_guest not in missing_guests:
+                    missing_guests.add(remote_guest)
+                    errors.append(f'{remote_guest} is not defined in the guests file.')
+                continue
+
+            remote_box = box_index.get(remote_guest)
+            if remote_box is not None and not int_map[remote_box]['data_interfaces'].get(remote_port):
+                errors.append(
+                    f'Error with {guest}\'s interface config.\n'
+                    f'{remote_guest}\'s interface: {remote_port} '
+                    f'is outside the supported range.')
+                continue
+            links.append((guest, local_port, remote_guest, remote_port))
+
+    errors += _asymmetric_link_errors(links, occupancy)
+    return errors
+
+
+def validate_tunnel_ports(guests):
+    """
+    Validate that the UDP tunnel port of every interface is within its
+    interface type's range. A port past the end of its range would
+    collide with the ports of the next interface type on the loopback.
+    :param guests: Dict of merged guest data
+    :return: errors list
+    """
+    errors = []
+    for guest, data in guests.items():
+        for interface_type, base_port in INTERFACE_BASE_PORTS.items():
+            for interface in data.get(interface_type) or []:
+                local_port = interface['local_port']
+                try:
+                    tunnel_port(local_port, interface_type)
+                except AttributeError:
+                    errors.append(
+                        f'{guest}\'s {interface_type} local_port: {local_port} is outside the {interface_type} '
+                        f'UDP tunnel port range: {base_port}-{base_port + INTERFACE_PORT_RANGE - 1}.')
+    return errors
+
+
 def validate_required_keys(guest):
     for key in required_keys:
         if not guest.get(key):
@@ -146,6 +379,7 @@ def validate_required_values(guest):
 
 
 def validate_schema(data, schema):
+    from cerberus import Validator
     v = Validator()
     v.validate(data, schema)
     return v
@@ -0,0 +1,40 @@
+import os
+import shutil
+import tempfile
+
+import pytest
+
+from grifter import loaders
+
+_session_cache_dir = None
+_saved_cache_dir = None
+
+
+def pytest_configure(config):
+    # Test modules load YAML at import time, before any fixture runs.
+    global _session_cache_dir, _saved_cache_dir
+    _saved_cache_dir = os.environ.get('GRIFTER_CACHE_DIR')
+    _session_cache_dir = tempfile.mkdtemp(prefix='grifter-cache-')
+    os.environ['GRIFTER_CACHE_DIR'] = _session_cache_dir
+
+
+def pytest_unconfigure(config):
+    if _saved_cache_dir is None:
+        os.environ.pop('GRIFTER_CACHE_DIR', None)
+    else:
+        os.environ['GRIFTER_CACHE_DIR'] = _saved_cache_dir
+    if _session_cache_dir:
+        shutil.rmtree(_session_cache_dir, ignore_errors=True)
+
+
+@pytest.fixture(autouse=True)
+def grifter_cache_dir(tmp_path, monkeypatch):
+    """
+    Keep the caches of every test in its own directory, so tests never
+    write to or read stale entries from ~/.grifter/cache. Cached Jinja2
+    environments are dropped as they hold the bytecode cache directory.
+    """
+    cache_dir = tmp_path / 'grifter-cache'
+    monkeypatch.setenv('GRIFTER_CACHE_DIR', str(cache_dir))
+    monkeypatch.setattr(loaders, '_environments', {})
+    return cache_dir
@@ -36,9 +36,9 @@ Vagrant.configure("2") do |config|
       # sw01-eth1 <--> sw02-eth1
       :mac => "#{get_mac()}",
       :libvirt__tunnel_type => "udp",
-      :libvirt__tunnel_local_ip => "127.255.255.1",
+      :libvirt__tunnel_local_ip => "127.107.225.136",
       :libvirt__tunnel_local_port => 10001,
-      :libvirt__tunnel_ip => "127.255.255.2",
+      :libvirt__tunnel_ip => "127.55.64.112",
       :libvirt__tunnel_port => 10001,
       :libvirt__iface_name => "sw01-eth1-#{domain_uuid}",
       auto_config: false
@@ -47,9 +47,9 @@ Vagrant.configure("2") do |config|
       # sw01-eth2 <--> sw02-eth2
       :mac => "#{get_mac()}",
       :libvirt__tunnel_type => "udp",
-      :libvirt__tunnel_local_ip => "127.255.255.1",
+      :libvirt__tunnel_local_ip => "127.107.225.136",
       :libvirt__tunnel_local_port => 10002,
-      :libvirt__tunnel_ip => "127.255.255.2",
+      :libvirt__tunnel_ip => "127.55.64.112",
       :libvirt__tunnel_port => 10002,
       :libvirt__iface_name => "sw01-eth2-#{domain_uuid}",
       auto_config: false
@@ -74,9 +74,9 @@ Vagrant.configure("2") do |config|
       # sw02-eth1 <--> sw01-eth1
       :mac => "#{get_mac()}",
       :libvirt__tunnel_type => "udp",
-      :libvirt__tunnel_local_ip => "127.255.255.2",
+      :libvirt__tunnel_local_ip => "127.55.64.112",
       :libvirt__tunnel_local_port => 10001,
-      :libvirt__tunnel_ip => "127.255.255.1",
+      :libvirt__tunnel_ip => "127.107.225.136",
       :libvirt__tunnel_port => 10001,
       :libvirt__iface_name => "sw02-eth1-#{domain_uuid}",
       auto_config: false
@@ -85,9 +85,9 @@ Vagrant.configure("2") do |config|
       # sw02-eth2 <--> sw01-eth2
       :mac => "#{get_mac()}",
       :libvirt__tunnel_type => "udp",
-      :libvirt__tunnel_local_ip => "127.255.255.2",
+      :libvirt__tunnel_local_ip => "127.55.64.112",
       :libvirt__tunnel_local_port => 10002,
-      :libvirt__tunnel_ip => "127.255.255.1",
+      :libvirt__tunnel_ip => "127.107.225.136",
       :libvirt__tunnel_port => 10002,
       :libvirt__iface_name => "sw02-eth2-#{domain_uuid}",
       auto_config: false
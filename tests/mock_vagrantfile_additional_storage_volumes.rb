@@ -35,42 +35,32 @@ Vagrant.configure("2") do |config|
     end
 
     add_volumes = [
-      "virsh vol-create-as default #{domain_prefix}-#{guest_name}-#{domain_uuid}-volume1.qcow2 10000",
-      "sleep 1",
-      "virsh vol-upload --pool default #{domain_prefix}-#{guest_name}-#{domain_uuid}-volume1.qcow2 /fake/location/volume1.qcow2",
-      "sleep 1",
-      "virsh vol-create-as default #{domain_prefix}-#{guest_name}-#{domain_uuid}-volume2.img 10000",
-      "sleep 1",
-      "virsh vol-upload --pool default #{domain_prefix}-#{guest_name}-#{domain_uuid}-volume2.img /fake/location/volume2.img",
-      "sleep 1"
+      "(virsh vol-info --pool default #{domain_prefix}-#{guest_name}-#{domain_uuid}-volume1.qcow2 >/dev/null 2>&1 || (virsh vol-create-as default #{domain_prefix}-#{guest_name}-#{domain_uuid}-volume1.qcow2 10000 && virsh vol-upload --pool default #{domain_prefix}-#{guest_name}-#{domain_uuid}-volume1.qcow2 /fake/location/volume1.qcow2))",
+      "(virsh vol-info --pool default #{domain_prefix}-#{guest_name}-#{domain_uuid}-volume2.img >/dev/null 2>&1 || (virsh vol-create-as default #{domain_prefix}-#{guest_name}-#{domain_uuid}-volume2.img 10000 && virsh vol-upload --pool default #{domain_prefix}-#{guest_name}-#{domain_uuid}-volume2.img /fake/location/volume2.img))"
     ]
-    add_volumes.each do |i|
-      node.trigger.before :up do |trigger|
-        trigger.name = "add-volumes"
-        trigger.info = "Adding Volumes"
-        trigger.run = {inline: i}
-      end
+    node.trigger.before :up do |trigger|
+      trigger.name = "add-volumes"
+      trigger.info = "Adding Volumes"
+      trigger.run = {inline: "sh -c '" + add_volumes.join(" && ") + "'"}
     end
 
     delete_volumes = [
       "virsh vol-delete #{domain_prefix}-#{guest_name}-#{domain_uuid}-volume1.qcow2 default",
       "virsh vol-delete #{domain_prefix}-#{guest_name}-#{domain_uuid}-volume2.img default"
     ]
-    delete_volumes.each do |i|
-      node.trigger.after :destroy do |trigger|
-        trigger.name = "remove-volumes"
-        trigger.info = "Removing Volumes"
-        trigger.run = {inline: i}
-      end
+    node.trigger.after :destroy do |trigger|
+      trigger.name = "remove-volumes"
+      trigger.info = "Removing Volumes"
+      trigger.run = {inline: "sh -c '" + delete_volumes.join("; ") + "'"}
     end
 
     node.vm.network :private_network,
       # sw01-eth1 <--> sw02-eth1
       :mac => "#{get_mac()}",
       :libvirt__tunnel_type => "udp",
-      :libvirt__tunnel_local_ip => "127.255.255.1",
+      :libvirt__tunnel_local_ip => "127.107.225.136",
       :libvirt__tunnel_local_port => 10001,
-      :libvirt__tunnel_ip => "127.255.255.2",
+      :libvirt__tunnel_ip => "127.55.64.112",
       :libvirt__tunnel_port => 10001,
       :libvirt__iface_name => "sw01-eth1-#{domain_uuid}",
       auto_config: false
@@ -79,9 +69,9 @@ Vagrant.configure("2") do |config|
       # sw01-eth2 <--> sw02-eth2
       :mac => "#{get_mac()}",
       :libvirt__tunnel_type => "udp",
-      :libvirt__tunnel_local_ip => "127.255.255.1",
+      :libvirt__tunnel_local_ip => "127.107.225.136",
       :libvirt__tunnel_local_port => 10002,
-      :libvirt__tunnel_ip => "127.255.255.2",
+      :libvirt__tunnel_ip => "127.55.64.112",
       :libvirt__tunnel_port => 10002,
       :libvirt__iface_name => "sw01-eth2-#{domain_uuid}",
       auto_config: false
@@ -106,9 +96,9 @@ Vagrant.configure("2") do |config|
       # sw02-eth1 <--> sw01-eth1
       :mac => "#{get_mac()}",
       :libvirt__tunnel_type => "udp",
-      :libvirt__tunnel_local_ip => "127.255.255.2",
+      :libvirt__tunnel_local_ip => "127.55.64.112",
       :libvirt__tunnel_local_port => 10001,
-      :libvirt__tunnel_ip => "127.255.255.1",
+      :libvirt__tunnel_ip => "127.107.225.136",
       :libvirt__tunnel_port => 10001,
       :libvirt__iface_name => "sw02-eth1-#{domain_uuid}",
       auto_config: false
@@ -117,9 +107,9 @@ Vagrant.configure("2") do |config|
       # sw02-eth2 <--> sw01-eth2
       :mac => "#{get_mac()}",
       :libvirt__tunnel_type => "udp",
-      :libvirt__tunnel_local_ip => "127.255.255.2",
+      :libvirt__tunnel_local_ip => "127.55.64.112",
       :libvirt__tunnel_local_port => 10002,
-      :libvirt__tunnel_ip => "127.255.255.1",
+      :libvirt__tunnel_ip => "127.107.225.136",
       :libvirt__tunnel_port => 10002,
       :libvirt__iface_name => "sw02-eth2-#{domain_uuid}",
       auto_config: false
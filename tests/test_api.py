@@ -5,6 +5,7 @@ from unittest import mock
 
 from grifter.constants import (
     BASE_DIR,
+    VAGRANTFILE_BACKUP_DIR,
     DEFAULT_CONFIG_FILE,
 )
 from grifter.loaders import (
@@ -21,6 +22,18 @@ from grifter.api import (
     generate_int_to_port_mappings,
     create_reserved_interfaces,
     generate_connection_strings,
+    generate_vagrant_file,
+    guest_block_key,
+    generate_dotfile,
+    write_if_changed,
+    generate_connections_list,
+    Connection,
+    generate_guest_interface_mappings,
+    add_reverse_interfaces,
+    add_link_interfaces,
+    generate_macs,
+    loopback_address,
+    LOOPBACK_POOL_SIZE,
 )
 from .mock_data import (
     mock_guest_data,
@@ -54,16 +67,114 @@ def test_generate_loopbacks_guest_dict_empty_raises_exception():
         generate_loopbacks(guest_dict={})
 
 
-@mock.patch('random.randint', return_value=255)
-def test_generate_loopbacks_returned_loopback_dict(mock_random):
+def test_generate_loopbacks_returned_loopback_dict():
     expected_loopback_dict = {
         'blackhole': '127.6.6.6',
-        'sw01': '127.255.255.1',
-        'sw02': '127.255.255.2'
+        'sw01': '127.107.225.136',
+        'sw02': '127.55.64.112'
     }
     assert generate_loopbacks(mock_guest_data) == expected_loopback_dict
 
 
+def test_generate_loopbacks_is_stable_when_guests_are_added():
+    loopbacks = generate_loopbacks(mock_guest_data)
+    more_guests = {**mock_guest_data, 'sw03': {}, 'sw04': {}}
+    more_loopbacks = generate_loopbacks(more_guests)
+    assert {k: more_loopbacks[k] for k in loopbacks} == loopbacks
+
+
+def test_generate_loopbacks_scales_beyond_a_single_network():
+    guests = {f'guest{i}': {} for i in range(20000)}
+    loopbacks = generate_loopbacks(guests)
+    addresses = [v for k, v in loopbacks.items() if k != 'blackhole']
+
+    assert len(set(addresses)) == 20000
+    assert '127.6.6.6' not in addresses
+    for address in addresses:
+        octets = [int(i) for i in address.split('.')]
+        assert octets[0] == 127
+        assert 2 <= octets[1] <= 254
+        assert 0 <= octets[2] <= 255
+        assert 1 <= octets[3] <= 254
+
+
+def test_loopback_address_pool_bounds():
+    assert loopback_address(0) == '127.2.0.1'
+    assert loopback_address(LOOPBACK_POOL_SIZE - 1) == '127.254.255.254'
+
+
+def test_generate_loopbacks_keeps_prior_allocations():
+    allocated = {'sw01': '127.9.9.9', 'sw03': '127.9.9.10', 'blackhole': '127.6.6.6'}
+    loopbacks = generate_loopbacks({'sw01': {}, 'sw02': {}}, allocated)
+    assert loopbacks['sw01'] == '127.9.9.9'
+    assert loopbacks['sw02'] == generate_loopbacks({'sw02': {}})['sw02']
+    assert 'sw03' not in loopbacks
+
+
+def test_generate_loopbacks_ignores_duplicate_and_reserved_prior_allocations():
+    allocated = {'sw01': '127.9.9.9', 'sw02': '127.9.9.9', 'sw03': '127.6.6.6'}
+    loopbacks = generate_loopbacks({'sw01': {}, 'sw02': {}, 'sw03': {}}, allocated)
+    assert loopbacks['sw01'] == '127.9.9.9'
+    assert len({loopbacks['sw01'], loopbacks['sw02'], loopbacks['sw03'], '127.6.6.6'}) == 4
+
+
+def test_generate_macs_allocates_unique_macs_per_interface():
+    macs = generate_macs(mock_guest_data, generate_guest_interface_mappings())
+    assert sorted(macs) == ['sw01-eth1', 'sw01-eth2', 'sw02-eth1', 'sw02-eth2']
+    assert len(set(macs.values())) == 4
+
+
+def test_generate_macs_keeps_prior_allocations_and_drops_stale_ones():
+    allocated = {'sw01-eth1': '28:b7:ad:00:00:01', 'sw09-eth1': '28:b7:ad:00:00:02'}
+    macs = generate_macs(mock_guest_data, generate_guest_interface_mappings(), allocated)
+    assert macs['sw01-eth1'] == '28:b7:ad:00:00:01'
+    assert 'sw09-eth1' not in macs
+    assert '28:b7:ad:00:00:01' not in [v for k, v in macs.items() if k != 'sw01-eth1']
+
+
+def test_generate_vagrant_file_uses_allocated_macs_and_domain_uuid(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    guests = copy.deepcopy(mock_guest_data)
+    loopbacks = generate_loopbacks(guests)
+    macs = generate_macs(guests, generate_guest_interface_mappings())
+
+    generate_vagrant_file(guests, loopbacks, macs=macs, domain_uuid='abc')
+    vagrantfile = (tmp_path / 'Vagrantfile').read_text()
+    assert 'domain_uuid = "abc"' in vagrantfile
+    assert ':mac => "#{get_mac()}"' not in vagrantfile
+    for mac in macs.values():
+        assert f':mac => "{mac}"' in vagrantfile
+
+
+def test_generate_vagrant_file_compact_template_emits_guest_data_tables(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    guests = copy.deepcopy(mock_guest_data)
+    loopbacks = {'sw01': '127.1.1.1', 'sw02': '127.1.1.2', 'blackhole': '127.6.6.6'}
+    macs = {'sw01-eth1': '28:b7:ad:00:00:01'}
+
+    generate_vagrant_file(guests, loopbacks, template_name='guest-compact.j2', macs=macs)
+    vagrantfile = (tmp_path / 'Vagrantfile').read_text()
+    assert '    "sw01" => "127.1.1.1",\n' in vagrantfile
+    assert '        ["eth1", "28:b7:ad:00:00:01", 10001, "sw02", 10001],\n' in vagrantfile
+    assert '        ["eth2", nil, 10002, "sw02", 10002],\n' in vagrantfile
+    assert vagrantfile.count('config.vm.define') == 1
+
+
+@mock.patch('grifter.api.LOOPBACK_POOL_SIZE', 4)
+def test_generate_loopbacks_probes_past_collisions():
+    loopbacks = generate_loopbacks({'a': {}, 'b': {}, 'c': {}})
+    pool = {'127.2.0.1', '127.2.0.2', '127.2.0.3', '127.2.0.4'}
+    addresses = {loopbacks['a'], loopbacks['b'], loopbacks['c']}
+    assert len(addresses) == 3
+    assert addresses <= pool
+
+
+@mock.patch('grifter.api.LOOPBACK_POOL_SIZE', 2)
+def test_generate_loopbacks_more_guests_than_pool_raises_value_error():
+    with pytest.raises(ValueError):
+        generate_loopbacks({'a': {}, 'b': {}})
+
+
 def test_guest_without_interfaces():
     expected = {
         'sw01': {
@@ -129,6 +240,31 @@ def test_update_interfaces_with_blackhole_interfaces():
     assert add_blackhole_interfaces(1, 4, mock_guest_interfaces) == expected_intefaces
 
 
+def test_add_blackhole_interfaces_sparse_ports():
+    interfaces = [
+        {'local_port': 4, 'remote_guest': 'sw02', 'remote_port': 1},
+        {'local_port': 2, 'remote_guest': 'sw02', 'remote_port': 2},
+    ]
+    result = add_blackhole_interfaces(1, 5, interfaces)
+    assert [i['local_port'] for i in result] == [1, 2, 3, 4, 5]
+    assert [i['remote_guest'] for i in result] == ['blackhole', 'sw02', 'blackhole', 'sw02', 'blackhole']
+    assert result[1] is interfaces[1]
+    assert result[3] is interfaces[0]
+
+
+def test_add_blackhole_interfaces_ignores_ports_outside_range_and_duplicates():
+    interfaces = [
+        {'local_port': 0, 'remote_guest': 'sw02', 'remote_port': 0},
+        {'local_port': 1, 'remote_guest': 'sw02', 'remote_port': 1},
+        {'local_port': 1, 'remote_guest': 'sw03', 'remote_port': 1},
+    ]
+    result = add_blackhole_interfaces(1, 2, interfaces)
+    assert result == [
+        {'local_port': 1, 'remote_guest': 'sw02', 'remote_port': 1},
+        {'local_port': 2, 'remote_guest': 'blackhole', 'remote_port': 666},
+    ]
+
+
 @mock.patch('grifter.api.load_config_file', side_effect=mock_data)
 def test_create_guest_with_group_vars(mock_data):
     seed_data = {'sw01': {'vagrant_box': {'name': 'arista/veos'}}}
@@ -173,6 +309,24 @@ def test_create_guest_with_group_vars(mock_data):
     assert expected == update_guest_data(seed_data, f'{BASE_DIR}/../examples/guest-defaults.yml')
 
 
+@mock.patch('grifter.api.load_config_file', side_effect=mock_data)
+def test_update_guest_data_does_not_modify_inputs(mock_data):
+    seed_data = {
+        'sw01': {'vagrant_box': {'name': 'arista/veos'}, 'provider_config': {'cpus': 4}},
+        'sw02': {'vagrant_box': {'name': 'arista/veos'}},
+    }
+    expected_seed_data = copy.deepcopy(seed_data)
+
+    result = update_guest_data(seed_data, f'{BASE_DIR}/../examples/guest-defaults.yml')
+    result['sw01']['provider_config']['memory'] = 1
+    result['sw02']['data_interfaces'] = [1]
+
+    assert result['sw01']['provider_config']['cpus'] == 4
+    assert result['sw02']['provider_config']['cpus'] == 2
+    assert result['sw02']['provider_config']['memory'] == 2048
+    assert seed_data == expected_seed_data
+
+
 def test_create_guest_without_group_vars():
     seed_data = {'sw01': {}}
 
@@ -252,6 +406,32 @@ def test_update_guest_additional_storage_size(mock_data):
     assert result['some-guest']['provider_config']['additional_storage_volumes'][0]['size'] == '10000'
 
 
+def test_update_guest_additional_storage_overlay_uses_virtual_size(tmp_path):
+    image = tmp_path / 'base.qcow2'
+    image.write_bytes(b'QFI\xfb' + bytes(20) + (8 * 2 ** 30).to_bytes(8, 'big') + bytes(64))
+    guests = {
+        guest: {
+            'provider_config': {
+                'additional_storage_volumes': [
+                    {'location': str(image), 'overlay': True}
+                ]
+            }
+        } for guest in ('sw01', 'sw02')
+    }
+    result = update_guest_additional_storage(guests)
+    for guest in ('sw01', 'sw02'):
+        assert result[guest]['provider_config']['additional_storage_volumes'][0]['size'] == 8 * 2 ** 30
+
+
+@mock.patch('os.path.getsize', return_value=10000)
+def test_update_guest_additional_storage_stats_shared_images_once(mock_getsize):
+    volumes = [{'location': '/fake/path/file.img'}]
+    guests = {guest: {'provider_config': {'additional_storage_volumes': copy.deepcopy(volumes)}}
+              for guest in ('sw01', 'sw02', 'sw03')}
+    update_guest_additional_storage(guests)
+    mock_getsize.assert_called_once_with('/fake/path/file.img')
+
+
 def test_int_to_port_map_returns_expected():
     expected = {}
     for i in range(0, 12):
@@ -309,3 +489,230 @@ def test_create_reserved_interfaces():
 ])
 def test_generate_connection_strings_return_expected_string_list(data, expected, dotfile):
     assert generate_connection_strings(data, dotfile) == expected
+
+
+def test_write_if_changed_only_replaces_file_on_change(tmp_path):
+    target = tmp_path / 'out.txt'
+    backup_dir = tmp_path / 'backup'
+
+    assert write_if_changed(str(target), lambda f: f.write('a\n'), backup_dir=str(backup_dir))
+    assert not backup_dir.exists()
+
+    assert not write_if_changed(str(target), lambda f: f.write('a\n'), backup_dir=str(backup_dir))
+    assert not backup_dir.exists()
+
+    assert write_if_changed(str(target), lambda f: f.write('b\n'), backup_dir=str(backup_dir))
+    assert target.read_text() == 'b\n'
+    assert [i.read_text() for i in backup_dir.iterdir()] == ['a\n']
+    assert [i.name for i in tmp_path.iterdir() if i.name.endswith('.tmp')] == []
+
+
+def test_write_if_changed_removes_temp_file_on_error(tmp_path):
+    def render(f):
+        raise ValueError('boom')
+
+    with pytest.raises(ValueError):
+        write_if_changed(str(tmp_path / 'out.txt'), render)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_generate_vagrant_file_is_idempotent(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    guests = copy.deepcopy(mock_guest_data)
+    loopbacks = {'sw01': '127.1.1.1', 'sw02': '127.1.1.2', 'blackhole': '127.6.6.6'}
+
+    assert generate_vagrant_file(guests, loopbacks) is True
+    content = (tmp_path / 'Vagrantfile').read_text()
+    assert generate_vagrant_file(guests, loopbacks) is False
+    assert (tmp_path / 'Vagrantfile').read_text() == content
+    assert not (tmp_path / VAGRANTFILE_BACKUP_DIR).exists()
+
+    guests['sw01']['provider_config']['cpus'] = 4
+    assert generate_vagrant_file(guests, loopbacks) is True
+    assert len(list((tmp_path / VAGRANTFILE_BACKUP_DIR).iterdir())) == 1
+
+
+def test_generate_vagrant_file_writes_a_changed_domain_uuid(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    guests = copy.deepcopy(mock_guest_data)
+    loopbacks = {'sw01': '127.1.1.1', 'sw02': '127.1.1.2', 'blackhole': '127.6.6.6'}
+
+    assert generate_vagrant_file(guests, loopbacks, domain_uuid='abc') is True
+    assert generate_vagrant_file(guests, loopbacks, domain_uuid='abc') is False
+    assert generate_vagrant_file(guests, loopbacks, domain_uuid='def') is True
+    assert 'domain_uuid = "def"' in (tmp_path / 'Vagrantfile').read_text()
+
+
+@pytest.mark.parametrize('template_name', ['guest.j2', 'guest-compact.j2'])
+def test_generate_vagrant_file_with_block_cache_matches_full_render(tmp_path, template_name):
+    guests = copy.deepcopy(mock_guest_data)
+    loopbacks = {'sw01': '127.1.1.1', 'sw02': '127.1.1.2', 'blackhole': '127.6.6.6'}
+    block_cache = {}
+
+    generate_vagrant_file(guests, loopbacks, template_name=template_name, domain_uuid='abc',
+                          filename=str(tmp_path / 'full'))
+    generate_vagrant_file(guests, loopbacks, template_name=template_name, domain_uuid='abc',
+                          filename=str(tmp_path / 'cached'), block_cache=block_cache)
+    full = (tmp_path / 'full').read_text().splitlines()[4:]
+    assert (tmp_path / 'cached').read_text().splitlines()[4:] == full
+    assert set(block_cache) == {'sw01', 'sw02'}
+
+
+def test_generate_vagrant_file_only_renders_changed_guest_blocks(tmp_path):
+    guests = copy.deepcopy(mock_guest_data)
+    loopbacks = {'sw01': '127.1.1.1', 'sw02': '127.1.1.2', 'blackhole': '127.6.6.6'}
+    filename = str(tmp_path / 'Vagrantfile')
+    block_cache = {}
+    generate_vagrant_file(guests, loopbacks, filename=filename, block_cache=block_cache)
+
+    key, _ = block_cache['sw02']
+    block_cache['sw02'] = (key, '  # cached sw02')
+    guests['sw01']['provider_config']['cpus'] = 4
+    generate_vagrant_file(guests, loopbacks, filename=filename, block_cache=block_cache)
+    vagrantfile = (tmp_path / 'Vagrantfile').read_text()
+    assert 'domain.cpus = 4' in vagrantfile
+    assert '  # cached sw02\n' in vagrantfile
+    assert 'config.vm.define "sw02"' not in vagrantfile
+
+
+def test_guest_block_key_changes_with_remote_guest_loopback():
+    guests = copy.deepcopy(mock_guest_data)
+    int_map = generate_guest_interface_mappings()
+    loopbacks = {'sw01': '127.1.1.1', 'sw02': '127.1.1.2'}
+    guest_digests = {'sw01': 'abc', 'sw02': 'def'}
+
+    def key():
+        return guest_block_key('guest-block.j2', 'sw01', guests, guest_digests, loopbacks, int_map, {}, None)
+
+    original = key()
+    assert key() == original
+    loopbacks['sw02'] = '127.1.1.3'
+    assert key() != original
+
+
+def test_guest_block_key_changes_with_links_added_to_the_guest():
+    guests = copy.deepcopy(mock_guest_data)
+    int_map = generate_guest_interface_mappings()
+    loopbacks = {'sw01': '127.1.1.1', 'sw02': '127.1.1.2'}
+    guest_digests = {'sw01': 'abc', 'sw02': 'def'}
+
+    def key():
+        return guest_block_key('guest-block.j2', 'sw02', guests, guest_digests, loopbacks, int_map, {}, None)
+
+    original = key()
+    guest_digests['sw01'] = 'ghi'
+    assert key() == original
+    guests['sw02']['data_interfaces'].append(
+        {'local_port': 9, 'remote_guest': 'sw01', 'remote_port': 9, 'description': 'reverse'})
+    assert key() != original
+
+
+def test_generate_dotfile_is_idempotent(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    connections_list = ['"sw1":"swp7" -- "r7":"ge-0/0/9";']
+    assert generate_dotfile(connections_list) is True
+    assert generate_dotfile(connections_list) is False
+
+
+def test_generate_connections_list_raises_on_double_booked_port():
+    guests = copy.deepcopy(mock_guest_data)
+    guests['sw01']['data_interfaces'][1]['local_port'] = 1
+    with pytest.raises(AttributeError, match="sw01's local_port: 1 is defined more than once"):
+        generate_connections_list(guests, generate_guest_interface_mappings())
+
+
+def test_generate_connections_list_raises_on_asymmetric_link():
+    guests = copy.deepcopy(mock_guest_data)
+    guests['sw02']['data_interfaces'].pop()
+    with pytest.raises(AttributeError, match="sw01's local_port: 2 connects to sw02's port: 2, but sw02's "
+                                             "local_port: 2 is not connected back."):
+        generate_connections_list(guests, generate_guest_interface_mappings())
+
+
+def test_generate_connections_list_without_check_links():
+    guests = copy.deepcopy(mock_guest_data)
+    guests['sw02']['data_interfaces'].pop()
+    result = generate_connections_list(guests, generate_guest_interface_mappings(), check_links=False)
+    assert len(result) == 3
+
+
+def test_generate_connections_list_without_check_links_keeps_double_booked_ports():
+    guests = copy.deepcopy(mock_guest_data)
+    guests['sw01']['data_interfaces'][1]['local_port'] = 1
+    result = generate_connections_list(guests, generate_guest_interface_mappings(), check_links=False)
+    assert result[:2] == [
+        Connection('sw01', 'eth1', 'sw02', 'eth1'),
+        Connection('sw01', 'eth1', 'sw02', 'eth2'),
+    ]
+
+
+def test_generate_connections_list_returns_connections_in_declared_order():
+    result = generate_connections_list(mock_guest_data, generate_guest_interface_mappings())
+    assert result == [
+        Connection('sw01', 'eth1', 'sw02', 'eth1'),
+        Connection('sw01', 'eth2', 'sw02', 'eth2'),
+        Connection('sw02', 'eth1', 'sw01', 'eth1'),
+        Connection('sw02', 'eth2', 'sw01', 'eth2'),
+    ]
+    assert result[0]['remote_guest'] == result[0].remote_guest == 'sw02'
+
+
+def test_generate_connections_list_unique_keeps_first_declared_direction():
+    guests = copy.deepcopy(mock_guest_data)
+    guests['sw02']['data_interfaces'].reverse()
+    result = generate_connections_list(guests, generate_guest_interface_mappings(), unique=True)
+    assert result == [
+        Connection('sw01', 'eth1', 'sw02', 'eth1'),
+        Connection('sw01', 'eth2', 'sw02', 'eth2'),
+    ]
+
+
+def test_generate_connection_strings_sorts_naturally_by_guest_then_port():
+    connections = [
+        Connection('sw10', 'eth1', 'sw2', 'eth1'),
+        Connection('sw2', 'eth10', 'sw10', 'eth2'),
+        Connection('sw2', 'eth9', 'sw10', 'eth1'),
+        Connection('sw2', 'eth10', 'sw1', 'eth2'),
+    ]
+    assert generate_connection_strings(connections) == [
+        'sw2-eth9 <--> sw10-eth1',
+        'sw2-eth10 <--> sw1-eth2',
+        'sw2-eth10 <--> sw10-eth2',
+        'sw10-eth1 <--> sw2-eth1',
+    ]
+
+
+def test_add_reverse_interfaces():
+    guests = copy.deepcopy(mock_guest_data)
+    sw02_interfaces = guests['sw02']['data_interfaces']
+    guests['sw02']['data_interfaces'] = [sw02_interfaces[0]]
+    shared = guests['sw02']['data_interfaces']
+
+    add_reverse_interfaces(guests)
+    assert guests['sw02']['data_interfaces'] == sw02_interfaces
+    assert guests['sw01']['data_interfaces'] == mock_guest_data['sw01']['data_interfaces']
+    assert shared == [sw02_interfaces[0]]
+
+
+def test_add_reverse_interfaces_leaves_occupied_ports():
+    guests = copy.deepcopy(mock_guest_data)
+    guests['sw02']['data_interfaces'][1]['remote_port'] = 1
+    expected = copy.deepcopy(guests)
+    assert add_reverse_interfaces(guests) == expected
+
+
+def test_add_link_interfaces():
+    guests = copy.deepcopy(mock_guest_data)
+    sw02_interfaces = guests['sw02']['data_interfaces']
+    guests['sw02']['data_interfaces'] = []
+    links = ({'local_guest': 'sw02', **interface} for interface in sw02_interfaces)
+
+    assert add_link_interfaces(guests, links) == []
+    assert guests == mock_guest_data
+
+
+def test_add_link_interfaces_with_unknown_guest_returns_errors():
+    guests = copy.deepcopy(mock_guest_data)
+    links = [{'local_guest': 'sw03', 'local_port': 1, 'remote_guest': 'sw01', 'remote_port': 1}]
+    assert add_link_interfaces(guests, links) == ['Link from unknown guest: sw03 local_port: 1']
+    assert guests == mock_guest_data
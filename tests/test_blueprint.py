@@ -0,0 +1,102 @@
+import pytest
+
+from grifter.api import (
+    get_default_config,
+    generate_guest_interface_mappings,
+    update_guest_data,
+    update_guest_interfaces,
+)
+from grifter.blueprint import (
+    expand_blueprint,
+    parse_port_range,
+)
+from grifter.constants import BLUEPRINT_EXAMPLE_FILE
+from grifter.loaders import load_data
+from grifter.validators import validate_topology
+
+config = get_default_config()
+interface_mappings = generate_guest_interface_mappings()
+
+
+def nodes(count, box='arista/veos', **kwargs):
+    return dict(count=count, box=box, **kwargs)
+
+
+def test_parse_port_range_defaults_to_every_data_port():
+    assert parse_port_range(None, 'cisco/csr1000v', config['guest_config']['cisco/csr1000v']) == range(2, 27)
+
+
+@pytest.mark.parametrize('ports, expected', [
+    ('3-5', range(3, 6)),
+    ('7', range(7, 8)),
+])
+def test_parse_port_range(ports, expected):
+    assert parse_port_range(ports, 'arista/veos', config['guest_config']['arista/veos']) == expected
+
+
+@pytest.mark.parametrize('ports', ['0-4', '20-25', '5-3', 'eth1'])
+def test_parse_port_range_outside_box_ports_raises_value_error(ports):
+    with pytest.raises(ValueError):
+        parse_port_range(ports, 'arista/veos', config['guest_config']['arista/veos'])
+
+
+def test_expand_clos_blueprint():
+    blueprint = {
+        'topology': 'clos',
+        'spines': nodes(2, name='spine{index:02}'),
+        'leaves': nodes(3, ports='10-11'),
+    }
+    guests = expand_blueprint(blueprint, config)
+
+    assert list(guests) == ['spine01', 'spine02', 'leaf1', 'leaf2', 'leaf3']
+    assert guests['leaf2'] == {
+        'vagrant_box': {'name': 'arista/veos'},
+        'provider_config': {'nic_adapter_count': 11},
+        'data_interfaces': [
+            {'local_port': 10, 'remote_guest': 'spine01', 'remote_port': 2},
+            {'local_port': 11, 'remote_guest': 'spine02', 'remote_port': 2},
+        ],
+    }
+    assert guests['spine01']['provider_config'] == {'nic_adapter_count': 3}
+
+
+@pytest.mark.parametrize('blueprint, links', [
+    ({'topology': 'clos', 'spines': nodes(2), 'leaves': nodes(4), 'uplinks': 2}, 32),
+    ({'topology': 'ring', 'nodes': nodes(5), 'links': 2}, 20),
+    ({'topology': 'mesh', 'nodes': nodes(5)}, 20),
+])
+def test_expanded_blueprint_is_a_valid_topology(blueprint, links):
+    guests = update_guest_data(expand_blueprint(blueprint, config))
+    assert sum(len(data['data_interfaces']) for data in guests.values()) == links
+
+    update_guest_interfaces(guests, config)
+    assert validate_topology(guests, config, interface_mappings) == []
+
+
+def test_expand_blueprint_merges_guest_data():
+    guests = expand_blueprint(load_data(BLUEPRINT_EXAMPLE_FILE), config)
+
+    assert guests['leaf01']['provider_config'] == {'cpus': 1, 'memory': 768, 'nic_adapter_count': 52}
+    assert guests['spine01']['provider_config'] == {'cpus': 1, 'nic_adapter_count': 8}
+    guests['leaf01']['provider_config']['cpus'] = 2
+    assert guests['leaf02']['provider_config']['cpus'] == 1
+
+
+@pytest.mark.parametrize('blueprint, error', [
+    ({'topology': 'clos', 'spines': nodes(2)}, 'A clos blueprint requires: leaves.'),
+    ({'topology': 'ring', 'nodes': nodes(2)}, 'A ring blueprint requires at least 3 nodes.'),
+    ({'topology': 'mesh', 'nodes': nodes(2, box='unknown/box')},
+     'nodes vagrant box type: unknown/box is not defined in the config file.'),
+    ({'topology': 'mesh', 'nodes': nodes(2, name='sw')},
+     'Guest: sw is defined more than once, the nodes name must contain {index}.'),
+    ({'topology': 'mesh', 'nodes': nodes(2, name='sw{id}')},
+     'Invalid nodes name: sw{id}, use {index} for the guest index.'),
+    ({'topology': 'mesh', 'nodes': nodes(2, name='sw{index.x}')},
+     'Invalid nodes name: sw{index.x}, use {index} for the guest index.'),
+    ({'topology': 'clos', 'spines': nodes(1, ports='1-2'), 'leaves': nodes(3)},
+     'spine1 has no free data port left to connect to leaf3.'),
+])
+def test_expand_invalid_blueprint_raises_value_error(blueprint, error):
+    with pytest.raises(ValueError) as e:
+        expand_blueprint(blueprint, config)
+    assert str(e.value) == error
@@ -0,0 +1,91 @@
+import pytest
+
+from grifter.boot import (
+    boot_dependencies,
+    boot_waves,
+    boot_commands,
+)
+
+GUEST_PAIRS = {
+    'juniper/vmx': {
+        'child': 'juniper/vmx-vcp',
+        'parent': 'juniper/vmx-vfp',
+    },
+}
+
+
+def guest(box='arista/veos', cpus=1, internal_interfaces=None):
+    return {
+        'vagrant_box': {'name': box},
+        'provider_config': {'cpus': cpus},
+        'internal_interfaces': internal_interfaces or [],
+    }
+
+
+def internal_link(remote_guest):
+    return [{'local_port': 1, 'remote_guest': remote_guest, 'remote_port': 1}]
+
+
+def vmx_guests():
+    return {
+        'vcp1': guest('juniper/vmx-vcp', internal_interfaces=internal_link('vfp1')),
+        'vfp1': guest('juniper/vmx-vfp', cpus=3, internal_interfaces=internal_link('vcp1')),
+        'sw01': guest(),
+    }
+
+
+def test_boot_dependencies_child_boots_after_parent():
+    assert boot_dependencies(vmx_guests(), GUEST_PAIRS) == {
+        'vcp1': {'vfp1'},
+        'vfp1': set(),
+        'sw01': set(),
+    }
+
+
+def test_boot_dependencies_when_only_the_parent_declares_the_link():
+    guests = vmx_guests()
+    guests['vcp1']['internal_interfaces'] = []
+    assert boot_dependencies(guests, GUEST_PAIRS)['vcp1'] == {'vfp1'}
+
+
+def test_boot_dependencies_without_guest_pairs():
+    assert boot_dependencies(vmx_guests(), None)['vcp1'] == set()
+
+
+def test_boot_waves_boots_children_after_parents():
+    assert boot_waves(vmx_guests(), GUEST_PAIRS) == [['vfp1', 'sw01'], ['vcp1']]
+
+
+def test_boot_waves_limits_guests_per_wave():
+    guests = {f'sw{i:02}': guest() for i in range(5)}
+    assert boot_waves(guests, concurrency=2) == [['sw00', 'sw01'], ['sw02', 'sw03'], ['sw04']]
+
+
+def test_boot_waves_limits_cpus_per_wave():
+    guests = {'sw01': guest(cpus=2), 'sw02': guest(cpus=4), 'sw03': guest(cpus=2), 'sw04': guest(cpus=8)}
+    assert boot_waves(guests, cpus=4) == [['sw04'], ['sw02'], ['sw01', 'sw03']]
+
+
+def test_boot_waves_with_zero_concurrency_raises_value_error():
+    with pytest.raises(ValueError):
+        boot_waves(vmx_guests(), concurrency=0)
+
+
+def test_boot_waves_with_circular_dependencies_raises_value_error():
+    guest_pairs = {
+        'a': {'child': 'box/a', 'parent': 'box/b'},
+        'b': {'child': 'box/b', 'parent': 'box/a'},
+    }
+    guests = {
+        'a1': guest('box/a', internal_interfaces=internal_link('b1')),
+        'b1': guest('box/b'),
+    }
+    with pytest.raises(ValueError):
+        boot_waves(guests, guest_pairs)
+
+
+def test_boot_commands():
+    assert boot_commands([['vfp1', 'sw01'], ['vcp1']]) == [
+        ['vagrant', 'up', 'vfp1', 'sw01', '--parallel'],
+        ['vagrant', 'up', 'vcp1', '--parallel'],
+    ]
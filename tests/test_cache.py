@@ -0,0 +1,92 @@
+import pytest
+
+from grifter.cache import (
+    empty_cache,
+    cache_filename,
+    inputs_digest,
+    guest_digest,
+    load_cache,
+    save_cache,
+    regeneration_cache,
+)
+
+
+def test_cache_filename_is_per_datafile(tmp_path, monkeypatch):
+    monkeypatch.setenv('GRIFTER_CACHE_DIR', str(tmp_path))
+    assert cache_filename('guests.yml') == cache_filename('./guests.yml')
+    assert cache_filename('guests.yml') != cache_filename('other.yml')
+    assert cache_filename('guests.yml').startswith(str(tmp_path))
+
+
+def test_cache_filename_with_caching_disabled_returns_none(monkeypatch):
+    monkeypatch.setenv('GRIFTER_CACHE_DIR', '')
+    assert cache_filename('guests.yml') is None
+
+
+def test_inputs_digest_changes_with_options():
+    assert inputs_digest('fast') == inputs_digest('fast')
+    assert inputs_digest('fast') != inputs_digest('cerberus')
+
+
+def test_guest_digest_ignores_key_order():
+    assert guest_digest({'a': 1, 'b': [1, 2]}) == guest_digest({'b': [1, 2], 'a': 1})
+    assert guest_digest({'a': 1}) != guest_digest({'a': 2})
+
+
+def test_save_and_load_cache(tmp_path):
+    cache_file = str(tmp_path / 'cache.pickle')
+    cache = empty_cache('inputs')
+    cache['valid_guests'] = {'sw01': 'abc'}
+
+    save_cache(cache, cache_file)
+    assert load_cache(cache_file, 'inputs') == cache
+
+
+@pytest.mark.parametrize('content', [b'', b'not a pickle'])
+def test_load_cache_with_unreadable_file_returns_empty_cache(tmp_path, content):
+    cache_file = tmp_path / 'cache.pickle'
+    cache_file.write_bytes(content)
+    assert load_cache(str(cache_file), 'inputs') == empty_cache('inputs')
+
+
+def test_load_cache_with_changed_inputs_returns_empty_cache(tmp_path):
+    cache_file = str(tmp_path / 'cache.pickle')
+    cache = empty_cache('inputs')
+    cache['valid_guests'] = {'sw01': 'abc'}
+    save_cache(cache, cache_file)
+    assert load_cache(cache_file, 'changed') == empty_cache('changed')
+
+
+def test_regeneration_cache_saves_on_exit(tmp_path, monkeypatch):
+    monkeypatch.setenv('GRIFTER_CACHE_DIR', str(tmp_path))
+    with regeneration_cache('guests.yml', 'fast') as cache:
+        cache['valid_guests'] = {'sw01': 'abc'}
+    with regeneration_cache('guests.yml', 'fast') as cache:
+        assert cache['valid_guests'] == {'sw01': 'abc'}
+
+
+def test_regeneration_cache_is_not_saved_on_error(tmp_path, monkeypatch):
+    monkeypatch.setenv('GRIFTER_CACHE_DIR', str(tmp_path))
+    with pytest.raises(SystemExit):
+        with regeneration_cache('guests.yml', 'fast') as cache:
+            cache['valid_guests'] = {'sw01': 'abc'}
+            raise SystemExit(1)
+    with regeneration_cache('guests.yml', 'fast') as cache:
+        assert cache['valid_guests'] == {}
+
+
+def test_regeneration_cache_is_not_saved_when_unchanged(tmp_path, monkeypatch):
+    monkeypatch.setenv('GRIFTER_CACHE_DIR', str(tmp_path))
+    with regeneration_cache('guests.yml', 'fast') as cache:
+        cache['valid_guests'] = {'sw01': 'abc'}
+    cache_file = tmp_path / cache_filename('guests.yml')
+    cache_file.unlink()
+    with regeneration_cache('guests.yml', 'fast') as cache:
+        pass
+    assert not cache_file.exists()
+
+
+def test_regeneration_cache_with_caching_disabled_yields_none(monkeypatch):
+    monkeypatch.setenv('GRIFTER_CACHE_DIR', '')
+    with regeneration_cache('guests.yml', 'fast') as cache:
+        assert cache is None
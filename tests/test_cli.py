@@ -1,16 +1,25 @@
+import importlib
+import json
+import os
 import pytest
 
 from click.testing import CliRunner
 
 from grifter.constants import (
+    BASE_DIR,
+    STATE_FILE,
     GUESTS_EXAMPLE_FILE,
     GROUPS_EXAMPLE_FILE,
+    BLUEPRINT_EXAMPLE_FILE,
 )
 from grifter.cli import (
     cli,
     load_data_file,
 )
-from .mock_data import mock_invalid_guest_data_file
+from .mock_data import (
+    mock_invalid_guest_data_file,
+    mock_one_sided_guest_data_file,
+)
 
 
 def test_cli_example_guest_output():
@@ -35,6 +44,17 @@ def test_cli_example_group_output():
     assert result.output == f'{expected}\n'
 
 
+def test_cli_example_blueprint_output():
+    runner = CliRunner()
+    result = runner.invoke(cli, ['example', '--blueprint'])
+
+    with open(BLUEPRINT_EXAMPLE_FILE, 'r') as f:
+        expected = f.read()
+
+    assert result.exit_code == 0
+    assert result.output == f'{expected}\n'
+
+
 def test_cli_create_with_invalid_data_output():
     runner = CliRunner()
     result = runner.invoke(cli, ['create', mock_invalid_guest_data_file])
@@ -43,6 +63,262 @@ def test_cli_create_with_invalid_data_output():
     assert result.output == "{'vagrant_box': [{'name': ['empty values not allowed']}]}\n"
 
 
+@pytest.mark.parametrize('validator', ['fast', 'cerberus'])
+def test_cli_create_with_invalid_data_output_per_validator(validator):
+    runner = CliRunner()
+    result = runner.invoke(cli, ['--validator', validator, 'create', mock_invalid_guest_data_file])
+
+    assert result.exit_code == 1
+    assert result.output == "{'vagrant_box': [{'name': ['empty values not allowed']}]}\n"
+
+
 def test_load_datafile_with_unknown_file_raises_system_exit():
     with pytest.raises(SystemExit):
         load_data_file('/some/fake/file')
+
+
+def test_cli_connections_with_one_sided_links_reports_errors():
+    runner = CliRunner()
+    result = runner.invoke(cli, ['connections', mock_one_sided_guest_data_file])
+
+    assert result.exit_code == 1
+    assert "sw01's local_port: 1 connects to sw02's port: 1" in result.output
+
+
+def test_cli_connections_with_reverse_links_adds_missing_side():
+    runner = CliRunner()
+    result = runner.invoke(cli, ['connections', '--reverse-links', mock_one_sided_guest_data_file])
+
+    assert result.exit_code == 0
+    assert result.output == (
+        'sw01-eth1 <--> sw02-eth1\n'
+        'sw01-eth2 <--> sw02-eth2\n'
+        'sw02-eth1 <--> sw01-eth1\n'
+        'sw02-eth2 <--> sw01-eth2\n'
+    )
+
+
+def test_cli_create_reuses_allocations_from_state_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    guests_file = os.path.abspath(f'{BASE_DIR}/../examples/guests.yml')
+    runner = CliRunner()
+    result = runner.invoke(cli, ['create', guests_file])
+    assert result.exit_code == 0
+    state = json.loads((tmp_path / STATE_FILE).read_text())
+    vagrantfile = (tmp_path / 'Vagrantfile').read_text()
+
+    result = runner.invoke(cli, ['create', guests_file])
+    assert result.exit_code == 0
+    assert json.loads((tmp_path / STATE_FILE).read_text()) == state
+    assert (tmp_path / 'Vagrantfile').read_text() == vagrantfile
+
+
+def test_cli_create_writes_the_domain_uuid_of_a_new_state_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    guests_file = os.path.abspath(f'{BASE_DIR}/../examples/guests.yml')
+    runner = CliRunner()
+    assert runner.invoke(cli, ['create', guests_file]).exit_code == 0
+    (tmp_path / STATE_FILE).unlink()
+
+    assert runner.invoke(cli, ['create', guests_file]).exit_code == 0
+    domain_uuid = json.loads((tmp_path / STATE_FILE).read_text())['domain_uuid']
+    assert f'domain_uuid = "{domain_uuid}"' in (tmp_path / 'Vagrantfile').read_text()
+
+
+def test_cli_create_with_shards_requires_a_host_per_shard():
+    runner = CliRunner()
+    result = runner.invoke(cli, ['create', '--shards', '2', '--host', '10.0.0.1', 'guests.yml'])
+
+    assert result.exit_code == 1
+    assert result.output == '--shards 2 requires a --host address for each shard.\n'
+
+
+def test_cli_create_with_shards_writes_a_vagrantfile_per_host(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    guests_file = os.path.abspath(f'{BASE_DIR}/../examples/guests.yml')
+    runner = CliRunner()
+    result = runner.invoke(cli, ['create', '--host', '10.0.0.1', '--host', '10.0.0.2', guests_file])
+
+    assert result.exit_code == 0
+    assert result.output == 'shard-1 (10.0.0.1): sw01\nshard-2 (10.0.0.2): sw02\n'
+    shard_1 = (tmp_path / 'shard-1' / 'Vagrantfile').read_text()
+    assert 'config.vm.define "sw01"' in shard_1
+    assert 'config.vm.define "sw02"' not in shard_1
+    assert ':libvirt__tunnel_ip => "10.0.0.2",' in shard_1
+
+
+@pytest.mark.parametrize('options, define', [
+    ([], 'config.vm.define "{}"'),
+    (['--compact'], '"{}" => {{'),
+])
+def test_cli_create_with_more_hosts_than_guests_leaves_a_shard_empty(tmp_path, monkeypatch, options, define):
+    monkeypatch.chdir(tmp_path)
+    guests_file = os.path.abspath(f'{BASE_DIR}/../examples/guests.yml')
+    runner = CliRunner()
+    hosts = ['--host', '10.0.0.1', '--host', '10.0.0.2', '--host', '10.0.0.3']
+    result = runner.invoke(cli, ['create', *options, *hosts, guests_file])
+
+    assert result.exit_code == 0
+    vagrantfiles = [(tmp_path / f'shard-{i}' / 'Vagrantfile').read_text() for i in (1, 2, 3)]
+    for guest in ('sw01', 'sw02'):
+        assert sum(define.format(guest) in v for v in vagrantfiles) == 1
+
+
+def test_cli_plan_when_topology_fits():
+    guests_file = os.path.abspath(f'{BASE_DIR}/../examples/guests.yml')
+    runner = CliRunner()
+    result = runner.invoke(cli, ['plan', '--cpus', '8', '--memory', '8192', '--huge-pages', '0', guests_file])
+
+    assert result.exit_code == 0
+    assert result.output.endswith('The topology fits on the host.\n')
+
+
+def test_cli_plan_when_topology_does_not_fit_suggests_sharding():
+    guests_file = os.path.abspath(f'{BASE_DIR}/../examples/guests.yml')
+    runner = CliRunner()
+    result = runner.invoke(cli, ['plan', '--cpus', '8', '--memory', '2048', '--huge-pages', '0', guests_file])
+
+    assert result.exit_code == 1
+    assert 'grifter create --shards 2' in result.output
+
+
+def test_cli_create_compact_writes_compact_vagrantfile(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    guests_file = os.path.abspath(f'{BASE_DIR}/../examples/guests.yml')
+    runner = CliRunner()
+    result = runner.invoke(cli, ['create', '--compact', guests_file])
+
+    assert result.exit_code == 0
+    assert 'guests.each do |guest_name, data|' in (tmp_path / 'Vagrantfile').read_text()
+
+
+def test_cli_up_dry_run_prints_a_vagrant_command_per_wave():
+    guests_file = os.path.abspath(f'{BASE_DIR}/../examples/guests.yml')
+    runner = CliRunner()
+    result = runner.invoke(cli, ['up', '--dry-run', '--concurrency', '1', guests_file])
+
+    assert result.exit_code == 0
+    assert result.output.splitlines() == [
+        'vagrant up sw01 --parallel',
+        'vagrant up sw02 --parallel',
+    ]
+
+
+def test_cli_up_with_shards_boots_each_shard_from_its_directory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    guests_file = os.path.abspath(f'{BASE_DIR}/../examples/guests.yml')
+    hosts = ['--host', '10.0.0.1', '--host', '10.0.0.2']
+    runner = CliRunner()
+    result = runner.invoke(cli, ['create', *hosts, guests_file])
+    assert result.output == 'shard-1 (10.0.0.1): sw01\nshard-2 (10.0.0.2): sw02\n'
+
+    result = runner.invoke(cli, ['up', '--dry-run', *hosts, guests_file])
+    assert result.exit_code == 0
+    assert result.output.splitlines() == [
+        'cd shard-1 && vagrant up sw01 --parallel',
+        'cd shard-2 && vagrant up sw02 --parallel',
+    ]
+
+    result = runner.invoke(cli, ['up', '--dry-run', '--shard', '2', *hosts, guests_file])
+    assert result.exit_code == 0
+    assert result.output.splitlines() == ['cd shard-2 && vagrant up sw02 --parallel']
+
+
+@pytest.mark.parametrize('options, error', [
+    (['--shards', '2', '--host', '10.0.0.1'], '--shards 2 requires a --host address for each shard.'),
+    (['--shard', '3', '--host', '10.0.0.1', '--host', '10.0.0.2'], '--shard 3 is not one of the 2 shards.'),
+])
+def test_cli_up_with_invalid_shard_options_output(options, error):
+    runner = CliRunner()
+    result = runner.invoke(cli, ['up', '--dry-run', *options, 'guests.yml'])
+
+    assert result.exit_code == 1
+    assert result.output == f'{error}\n'
+
+
+def test_cli_create_only_validates_changed_guests(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('GRIFTER_CACHE_DIR', str(tmp_path / 'cache'))
+    guests_file = tmp_path / 'guests.yml'
+    guests = open(f'{BASE_DIR}/../examples/guests.yml').read()
+    guests_file.write_text(guests)
+    runner = CliRunner()
+    assert runner.invoke(cli, ['create', str(guests_file)]).exit_code == 0
+
+    # grifter.cli is shadowed by the cli group on the grifter package.
+    cli_module = importlib.import_module('grifter.cli')
+    validated = []
+    validate_data = cli_module.validate_data
+
+    def record_validate_data(guest_data, **kwargs):
+        validated.append(sorted(guest_data))
+        return validate_data(guest_data, **kwargs)
+
+    monkeypatch.setattr(cli_module, 'validate_data', record_validate_data)
+    guests_file.write_text(guests.replace('cpus: 2', 'cpus: 4', 1))
+    assert runner.invoke(cli, ['create', str(guests_file)]).exit_code == 0
+    assert validated == [['sw01']]
+    assert 'domain.cpus = 4' in (tmp_path / 'Vagrantfile').read_text()
+
+
+def test_cli_create_uses_interface_mappings_from_user_config(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('GRIFTER_CACHE_DIR', '')
+    (tmp_path / 'config.yml').write_text(
+        'guest_config:\n'
+        '  arista/veos:\n'
+        '    data_interface_base: "Ethernet"\n'
+    )
+    guests_file = os.path.abspath(f'{BASE_DIR}/../examples/guests.yml')
+    runner = CliRunner()
+    result = runner.invoke(cli, ['create', guests_file])
+
+    assert result.exit_code == 0
+    vagrantfile = (tmp_path / 'Vagrantfile').read_text()
+    assert ':libvirt__iface_name => "sw01-Ethernet1-#{domain_uuid}",' in vagrantfile
+
+
+def test_cli_connections_with_links_file_adds_links(tmp_path):
+    links_file = tmp_path / 'links.csv'
+    links_file.write_text('sw02,1,sw01,1\nsw02,2,sw01,2\n')
+    runner = CliRunner()
+    result = runner.invoke(cli, ['connections', '--links', str(links_file), mock_one_sided_guest_data_file])
+
+    assert result.exit_code == 0
+    assert result.output == (
+        'sw01-eth1 <--> sw02-eth1\n'
+        'sw01-eth2 <--> sw02-eth2\n'
+        'sw02-eth1 <--> sw01-eth1\n'
+        'sw02-eth2 <--> sw01-eth2\n'
+    )
+
+
+def test_cli_connections_with_unknown_links_file_output():
+    runner = CliRunner()
+    result = runner.invoke(cli, ['connections', '--links', '/some/fake/file.csv', mock_one_sided_guest_data_file])
+
+    assert result.exit_code == 1
+    assert result.output == 'Link file: /some/fake/file.csv not found.\n'
+
+
+def test_cli_connections_with_blueprint_expands_guests():
+    runner = CliRunner()
+    result = runner.invoke(cli, ['connections', '--blueprint', BLUEPRINT_EXAMPLE_FILE, 'leaf01'])
+
+    assert result.exit_code == 0
+    assert result.output == (
+        'leaf01-swp49 <--> spine01-eth1\n'
+        'leaf01-swp50 <--> spine01-eth2\n'
+        'leaf01-swp51 <--> spine02-eth1\n'
+        'leaf01-swp52 <--> spine02-eth2\n'
+    )
+
+
+def test_cli_create_with_invalid_blueprint_output(tmp_path):
+    blueprint_file = tmp_path / 'blueprint.yml'
+    blueprint_file.write_text('topology: "ring"\nnodes:\n  count: 2\n  box: "arista/veos"\n')
+    runner = CliRunner()
+    result = runner.invoke(cli, ['create', '--blueprint', str(blueprint_file)])
+
+    assert result.exit_code == 1
+    assert result.output == 'A ring blueprint requires at least 3 nodes.\n'
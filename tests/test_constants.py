@@ -1,5 +1,13 @@
-from grifter.constants import BLACKHOLE_LOOPBACK_MAP
+from grifter.constants import (
+    ALL_GUEST_DEFAULTS,
+    BLACKHOLE_LOOPBACK_MAP,
+    get_all_guest_defaults,
+)
 
 
 def test_blackhole_loopback_map():
     assert BLACKHOLE_LOOPBACK_MAP == {'blackhole': '127.6.6.6'}
+
+
+def test_all_guest_defaults_matches_loaded_guest_defaults():
+    assert ALL_GUEST_DEFAULTS == get_all_guest_defaults()
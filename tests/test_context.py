@@ -0,0 +1,49 @@
+import pytest
+
+from grifter.api import (
+    generate_guest_interface_mappings,
+    get_default_config,
+)
+from grifter.context import (
+    InterfaceMappings,
+    TopologyContext,
+)
+
+
+def test_interface_mappings_are_generated_on_lookup():
+    config = get_default_config()
+    mappings = InterfaceMappings(config['guest_config'])
+    assert mappings == {}
+
+    assert mappings['arista/veos'] == generate_guest_interface_mappings()['arista/veos']
+    assert list(mappings) == ['arista/veos']
+
+
+def test_interface_mappings_with_unknown_box_raises_key_error():
+    mappings = InterfaceMappings(get_default_config()['guest_config'])
+    with pytest.raises(KeyError):
+        mappings['unknown/box']
+
+
+def test_topology_context_interface_mappings_use_merged_config():
+    config = get_default_config()
+    config['guest_config']['custom/box'] = {
+        'data_interface_base': 'port',
+        'data_interface_offset': 1,
+        'internal_interfaces': 0,
+        'max_data_interfaces': 2,
+        'management_interface': 'mgmt0',
+        'reserved_interfaces': 0,
+    }
+    context = TopologyContext(config=config, guest_defaults={}, all_guest_defaults={})
+
+    assert context.interface_mappings['custom/box']['data_interfaces'] == {1: 'port1', 2: 'port2'}
+
+
+def test_topology_context_loads_user_guest_defaults(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'guest-defaults.yml').write_text('arista/veos:\n  provider_config:\n    cpus: 4\n')
+    context = TopologyContext(config=get_default_config())
+
+    assert context.guest_defaults == {'arista/veos': {'provider_config': {'cpus': 4}}}
+    assert 'guest_defaults' in context.all_guest_defaults
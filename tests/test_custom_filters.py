@@ -1,10 +1,19 @@
 import pytest
 
-from grifter.custom_filters import explode_port
+from grifter.constants import (
+    INTERFACE_BASE_PORTS,
+    INTERFACE_PORT_RANGE,
+)
+from grifter.custom_filters import (
+    explode_port,
+    tunnel_port,
+)
 
 test_ports = [
     (0, 10000),
     (10, 10010),
+    (100, 10100),
+    (999, 10999),
 ]
 
 
@@ -24,4 +33,29 @@ def test_port_explosion_non_int_raises_exception():
 
 def test_port_explosion_greater_than_999_raises_exception():
     with pytest.raises(AttributeError):
-        explode_port(100)
+        explode_port(1000)
+
+
+def test_port_explosion_negative_port_raises_exception():
+    with pytest.raises(AttributeError):
+        explode_port(-1)
+
+
+@pytest.mark.parametrize("interface_type,expected", [
+    ('data_interfaces', 10001),
+    ('internal_interfaces', 11001),
+    ('reserved_interfaces', 12001),
+])
+def test_tunnel_port_uses_interface_type_base_port(interface_type, expected):
+    assert tunnel_port(1, interface_type) == expected
+
+
+def test_tunnel_port_unknown_interface_type_raises_exception():
+    with pytest.raises(AttributeError):
+        tunnel_port(1, 'management_interface')
+
+
+def test_interface_port_ranges_do_not_overlap():
+    base_ports = sorted(INTERFACE_BASE_PORTS.values())
+    for lower, upper in zip(base_ports, base_ports[1:]):
+        assert upper - lower >= INTERFACE_PORT_RANGE
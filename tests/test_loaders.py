@@ -1,3 +1,4 @@
+import os
 import time
 import pytest
 from unittest import mock
@@ -10,10 +11,16 @@ from grifter.constants import (
 from grifter.constants import TEMPLATES_DIR
 from grifter.custom_filters import (
     explode_port,
+    tunnel_port,
 )
+from grifter import loaders
 from grifter.loaders import (
     render_from_template,
-    load_data
+    load_data,
+    load_yaml,
+    iter_links,
+    parse_yaml,
+    get_environment,
 )
 from grifter.api import (
     generate_loopbacks,
@@ -26,6 +33,7 @@ from .mock_data import (
 
 custom_filters = [
     explode_port,
+    tunnel_port,
 ]
 
 interface_mappings = generate_guest_interface_mappings()
@@ -51,6 +59,30 @@ def test_render_from_template(mock_random, mock_uuid, mock_time):
     assert vagrantfile == mock_vagrantfile
 
 
+@mock.patch('random.randint', return_value=255)
+def test_render_from_template_stream_to_matches_render(mock_random, tmp_path):
+    loopbacks = generate_loopbacks(mock_guest_data)
+    template_vars = dict(
+        guests=mock_guest_data,
+        loopbacks=loopbacks,
+        interface_mappings=interface_mappings,
+        domain_uuid='688c29aa-e657-5d27-b4bb-d745aad2812e',
+        creation_time='2018-12-26--17-58-55',
+        blackhole_interfaces={},
+    )
+    vagrantfile = tmp_path / 'Vagrantfile'
+    with open(vagrantfile, 'w') as f:
+        result = render_from_template(
+            template_name='guest.j2',
+            template_directory=TEMPLATES_DIR,
+            custom_filters=custom_filters,
+            stream_to=f,
+            **template_vars
+        )
+    assert result is None
+    assert vagrantfile.read_text() == mock_vagrantfile
+
+
 def test_load_data_with_invalid_data_type_raises_attribute_error():
     with pytest.raises(AttributeError):
         load_data('blah', data_type='invalid')
@@ -59,3 +91,156 @@ def test_load_data_with_invalid_data_type_raises_attribute_error():
 def test_load_json_data():
     data = load_data(f'{BASE_DIR}/../tests/mock_json_data.json', data_type='json')
     assert {'some': 'data'} == data
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv('GRIFTER_CACHE_DIR', str(tmp_path / 'cache'))
+    monkeypatch.setattr(loaders, '_environments', {})
+    return tmp_path / 'cache'
+
+
+def test_get_environment_is_cached_per_directory_and_filters(cache_dir):
+    env = get_environment(TEMPLATES_DIR, custom_filters)
+    assert get_environment(TEMPLATES_DIR, custom_filters) is env
+    assert get_environment(TEMPLATES_DIR) is not env
+    assert env.filters['explode_port'] is explode_port
+
+
+def test_get_environment_writes_bytecode_cache(cache_dir):
+    render_from_template(
+        template_name='throttle-cpu-trigger.j2',
+        template_directory=TEMPLATES_DIR,
+        data={'vagrant_box': {'throttle_cpu': 33}},
+    )
+    assert list(cache_dir.glob('__jinja2_*.cache'))
+
+
+def test_get_environment_empty_cache_dir_disables_bytecode_cache(monkeypatch):
+    monkeypatch.setenv('GRIFTER_CACHE_DIR', '')
+    monkeypatch.setattr(loaders, '_environments', {})
+    assert get_environment(TEMPLATES_DIR).bytecode_cache is None
+
+
+def test_render_from_template_picks_up_changed_template(cache_dir, tmp_path):
+    template = tmp_path / 'test.j2'
+    template.write_text('one')
+    assert render_from_template('test.j2', str(tmp_path)) == 'one'
+
+    # Simulate a new process that only has the on-disk bytecode cache.
+    loaders._environments.clear()
+    template.write_text('two')
+    assert render_from_template('test.j2', str(tmp_path)) == 'two'
+
+
+def test_parse_yaml_uses_libyaml_loader_when_available(monkeypatch):
+    import yaml
+    loaders_used = []
+    load = yaml.load
+
+    def record_load(content, Loader):
+        loaders_used.append(Loader)
+        return load(content, Loader=Loader)
+
+    monkeypatch.setattr(yaml, 'load', record_load)
+    assert parse_yaml('a: 1') == {'a': 1}
+    assert loaders_used == [getattr(yaml, 'CSafeLoader', yaml.SafeLoader)]
+
+
+def _age(path, seconds=60):
+    stat = path.stat()
+    mtime_ns = stat.st_mtime_ns - seconds * 10 ** 9
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_load_yaml_reuses_parsed_document_when_file_is_unchanged(cache_dir, tmp_path, monkeypatch):
+    data_file = tmp_path / 'data.yml'
+    data_file.write_text('a: 1\n')
+    _age(data_file)
+    assert load_yaml(str(data_file)) == {'a': 1}
+    assert list(cache_dir.glob('yaml-*.pickle'))
+
+    monkeypatch.setattr(loaders, 'parse_yaml', mock.Mock(side_effect=AssertionError))
+    assert load_yaml(str(data_file)) == {'a': 1}
+
+
+def test_load_yaml_reparses_changed_file(cache_dir, tmp_path):
+    data_file = tmp_path / 'data.yml'
+    data_file.write_text('a: 1\n')
+    assert load_yaml(str(data_file)) == {'a': 1}
+
+    # Same size and mtime, only the content hash differs.
+    stat = data_file.stat()
+    data_file.write_text('a: 2\n')
+    os.utime(data_file, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert load_yaml(str(data_file)) == {'a': 2}
+
+
+def test_load_yaml_with_touched_file_reuses_parsed_document(cache_dir, tmp_path, monkeypatch):
+    data_file = tmp_path / 'data.yml'
+    data_file.write_text('a: 1\n')
+    _age(data_file, 120)
+    assert load_yaml(str(data_file)) == {'a': 1}
+
+    _age(data_file, 60)
+    monkeypatch.setattr(loaders, 'parse_yaml', mock.Mock(side_effect=AssertionError))
+    assert load_yaml(str(data_file)) == {'a': 1}
+
+
+def test_load_yaml_empty_cache_dir_disables_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv('GRIFTER_CACHE_DIR', '')
+    data_file = tmp_path / 'data.yml'
+    data_file.write_text('a: 1\n')
+    assert load_yaml(str(data_file)) == {'a': 1}
+    assert list(tmp_path.iterdir()) == [data_file]
+
+
+def test_iter_links_from_jsonl(tmp_path):
+    links_file = tmp_path / 'links.jsonl'
+    links_file.write_text(
+        '{"local_guest": "sw01", "local_port": 1, "remote_guest": "sw02", "remote_port": 1}\n'
+        '\n'
+        '{"local_guest": "sw02", "local_port": 1, "remote_guest": "sw01", "remote_port": 1}\n'
+    )
+    assert list(iter_links(str(links_file))) == [
+        {'local_guest': 'sw01', 'local_port': 1, 'remote_guest': 'sw02', 'remote_port': 1},
+        {'local_guest': 'sw02', 'local_port': 1, 'remote_guest': 'sw01', 'remote_port': 1},
+    ]
+
+
+def test_iter_links_from_jsonl_converts_digit_string_ports(tmp_path):
+    links_file = tmp_path / 'links.jsonl'
+    links_file.write_text('{"local_guest": "sw01", "local_port": "1", "remote_guest": "sw02", "remote_port": 2}\n')
+    assert list(iter_links(str(links_file))) == [
+        {'local_guest': 'sw01', 'local_port': 1, 'remote_guest': 'sw02', 'remote_port': 2},
+    ]
+
+
+def test_iter_links_from_csv_with_header(tmp_path):
+    links_file = tmp_path / 'links.csv'
+    links_file.write_text(
+        'local_guest,local_port,remote_guest,remote_port\n'
+        'sw01, 1, sw02, 1\n'
+        'sw01,2,blackhole,999\n'
+    )
+    assert list(iter_links(str(links_file))) == [
+        {'local_guest': 'sw01', 'local_port': 1, 'remote_guest': 'sw02', 'remote_port': 1},
+        {'local_guest': 'sw01', 'local_port': 2, 'remote_guest': 'blackhole', 'remote_port': 999},
+    ]
+
+
+@pytest.mark.parametrize('filename, content', [
+    ('links.csv', 'sw01,1,sw02\n'),
+    ('links.csv', 'sw01,eth1,sw02,1\n'),
+    ('links.csv', ',1,sw02,1\n'),
+    ('links.jsonl', '{"local_guest": "sw01"}\n'),
+    ('links.jsonl', 'not json\n'),
+    ('links.jsonl', '{"local_guest": ["x"], "local_port": 1, "remote_guest": "sw02", "remote_port": 1}\n'),
+    ('links.jsonl', '{"local_guest": "sw01", "local_port": 1.5, "remote_guest": "sw02", "remote_port": 1}\n'),
+    ('links.jsonl', '{"local_guest": "sw01", "local_port": true, "remote_guest": "sw02", "remote_port": 1}\n'),
+])
+def test_iter_links_with_invalid_row_raises_value_error(tmp_path, filename, content):
+    links_file = tmp_path / filename
+    links_file.write_text(content)
+    with pytest.raises(ValueError, match=f'{filename}:1:'):
+        list(iter_links(str(links_file)))
@@ -0,0 +1,100 @@
+import copy
+
+from grifter.planner import (
+    read_meminfo,
+    host_capacity,
+    topology_requirements,
+    plan_capacity,
+)
+from .mock_data import mock_guest_data
+
+MEMINFO = '''MemTotal:       16303428 kB
+MemFree:         1203328 kB
+HugePages_Total:       8
+Hugepagesize:       2048 kB
+'''
+
+
+def capacity(cpus=8, memory=16384, huge_pages_memory=0):
+    return {'cpus': cpus, 'memory': memory, 'huge_pages_memory': huge_pages_memory}
+
+
+def test_read_meminfo(tmp_path):
+    meminfo_file = tmp_path / 'meminfo'
+    meminfo_file.write_text(MEMINFO)
+    assert read_meminfo(str(meminfo_file)) == {
+        'MemTotal': 16303428,
+        'MemFree': 1203328,
+        'HugePages_Total': 8,
+        'Hugepagesize': 2048,
+    }
+
+
+def test_read_meminfo_with_missing_file_returns_empty_dict(tmp_path):
+    assert read_meminfo(str(tmp_path / 'meminfo')) == {}
+
+
+def test_host_capacity_reads_memory_and_huge_pages(tmp_path):
+    meminfo_file = tmp_path / 'meminfo'
+    meminfo_file.write_text(MEMINFO)
+    result = host_capacity(str(meminfo_file))
+    assert result['memory'] == 15921
+    assert result['huge_pages_memory'] == 16
+
+
+def test_topology_requirements():
+    guests = copy.deepcopy(mock_guest_data)
+    guests['sw01']['provider_config']['huge_pages'] = True
+    guests['sw01']['provider_config']['additional_storage_volumes'] = [{'size': 2 ** 20}]
+    guests['sw02']['vagrant_box']['throttle_cpu'] = 50
+
+    assert topology_requirements(guests) == {
+        'guests': 2,
+        'cpus': 4,
+        'cpu_demand': 3,
+        'throttled_cpu_demand': 1,
+        'unthrottled_cpus': 2,
+        'memory': 4096,
+        'huge_pages_memory': 2048,
+        'storage': 2 ** 20,
+        'nics': 4,
+    }
+
+
+def test_plan_capacity_when_topology_fits_returns_no_suggestions():
+    requirements = topology_requirements(mock_guest_data)
+    assert plan_capacity(requirements, capacity()) == []
+
+
+def test_plan_capacity_suggests_throttling_cpus():
+    requirements = topology_requirements(mock_guest_data)
+    assert plan_capacity(requirements, capacity(cpus=3)) == [
+        'CPUs: 4 cpus are required but the host has 3.',
+        'Set vagrant_box throttle_cpu: 75 on the guests that are not throttled.',
+    ]
+
+
+def test_plan_capacity_suggests_sharding_when_memory_is_short():
+    requirements = topology_requirements(mock_guest_data)
+    assert plan_capacity(requirements, capacity(memory=1500)) == [
+        'Memory: 4096 MB is required but the host has 1500 MB.',
+        'Shard the topology across at least 3 hosts with '
+        'grifter create --shards 3 --host <host1> --host <host2> --host <host3>.',
+    ]
+
+
+def test_plan_capacity_does_not_suggest_forbidden_throttle_cpu():
+    requirements = dict(topology_requirements(mock_guest_data), cpu_demand=150, unthrottled_cpus=150)
+    assert plan_capacity(requirements, capacity(cpus=2)) == [
+        'CPUs: 150 cpus are required but the host has 2.',
+        'Shard the topology across at least 75 hosts with '
+        f'grifter create --shards 75 {" ".join(f"--host <host{i}>" for i in range(1, 76))}.',
+    ]
+
+
+def test_plan_capacity_reports_missing_huge_pages():
+    guests = copy.deepcopy(mock_guest_data)
+    guests['sw01']['provider_config']['huge_pages'] = True
+    assert plan_capacity(topology_requirements(guests), capacity()) == [
+        'Huge pages: 2048 MB is required but the host has 0 MB of huge pages.',
+    ]
@@ -15,6 +15,7 @@ from grifter.constants import (
     TIMESTAMP_FORMAT)
 from grifter.custom_filters import (
     explode_port,
+    tunnel_port,
 )
 from tests.mock_data import (
     mock_guest_data,
@@ -24,6 +25,7 @@ from tests.mock_data import (
 
 custom_filters = [
     explode_port,
+    tunnel_port,
 ]
 
 
@@ -59,11 +61,9 @@ def test_blackhole_interfaces_trigger_rendering():
     blackhole_interfaces = {'sw01': ['swp1', 'swp2']}
     expected = """
     blackhole_interfaces = ["swp1", "swp2"]
-    blackhole_interfaces.each do |interface|
-      node.trigger.after :up do |trigger|
-        trigger.info = "Shutting down #{guest_name}-#{interface}"
-        trigger.run = {inline: "virsh domif-setlink #{domain_prefix}_#{guest_name} #{guest_name}-#{interface}-#{domain_uuid} down"}
-      end
+    node.trigger.after :up do |trigger|
+      trigger.info = "Shutting down #{guest_name} blackhole interfaces"
+      trigger.run = {inline: "virsh '" + blackhole_interfaces.map { |interface| "domif-setlink #{domain_prefix}_#{guest_name} #{guest_name}-#{interface}-#{domain_uuid} down" }.join("; ") + "'"}
     end
 """
     result = render_from_template(
@@ -91,3 +91,39 @@ def test_throttle_cpu_trigger_rendering():
         data=data,
     )
     assert result == expected
+
+
+def test_additional_storage_trigger_overlay_rendering():
+    data = {
+        'provider_config': {
+            'storage_pool': '',
+            'additional_storage_volumes': [{
+                'location': '/fake/location/base.qcow2',
+                'type': 'qcow2',
+                'size': 10000,
+                'overlay': True,
+            }],
+        }
+    }
+    result = render_from_template(
+        template_name='additional-data-storage-trigger.j2',
+        template_directory=TEMPLATES_DIR,
+        data=data,
+    )
+    assert (
+        '"(flock 9 && (virsh vol-info --pool default #{domain_prefix}-base-base.qcow2 >/dev/null 2>&1 || '
+        '(virsh vol-create-as default #{domain_prefix}-base-base.qcow2 10000 --format qcow2 && '
+        'virsh vol-upload --pool default #{domain_prefix}-base-base.qcow2 /fake/location/base.qcow2)) && '
+        '(virsh vol-info --pool default #{domain_prefix}-#{guest_name}-#{domain_uuid}-base.qcow2 >/dev/null 2>&1 || '
+        'virsh vol-create-as default #{domain_prefix}-#{guest_name}-#{domain_uuid}-base.qcow2 10000 '
+        '--format qcow2 --backing-vol #{domain_prefix}-base-base.qcow2 --backing-vol-format qcow2)) '
+        '9>/tmp/#{domain_prefix}-base-base.qcow2.lock"'
+    ) in result
+    assert (
+        '"virsh vol-delete #{domain_prefix}-#{guest_name}-#{domain_uuid}-base.qcow2 default; '
+        '(flock 9 && (virsh vol-list --pool default --name | grep -v -x -F #{domain_prefix}-base-base.qcow2 | '
+        'grep -q -x \\"#{domain_prefix}-.*-base.qcow2\\" || '
+        '! virsh vol-info --pool default #{domain_prefix}-base-base.qcow2 >/dev/null 2>&1 || '
+        'virsh vol-delete #{domain_prefix}-base-base.qcow2 default)) 9>/tmp/#{domain_prefix}-base-base.qcow2.lock"'
+    ) in result
+    assert 'sleep' not in result
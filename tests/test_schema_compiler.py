@@ -0,0 +1,121 @@
+import copy
+import pytest
+
+from cerberus import Validator
+
+from grifter.constants import (
+    GUEST_SCHEMA_FILE,
+    GUEST_CONFIG_SCHEMA,
+    GUEST_PAIRS_SCHEMA,
+)
+from grifter.loaders import load_data
+from grifter.schema_compiler import (
+    compile_schema,
+    build_error_tree,
+)
+from grifter.validators import guest_defaults_schema
+from .mock_data import mock_guest_data
+
+guest_schema = load_data(GUEST_SCHEMA_FILE)
+
+
+def guest(**updates):
+    data = copy.deepcopy(mock_guest_data['sw01'])
+    for path, value in updates.items():
+        node = data
+        keys = path.split('__')
+        for key in keys[:-1]:
+            node = node[int(key)] if isinstance(node, list) else node.setdefault(key, {})
+        node[keys[-1]] = value
+    return data
+
+
+guest_documents = [
+    guest(),
+    {'vagrant_box': {'name': 'box'}},
+    {},
+    {'vagrant_box': None},
+    {'vagrant_box': 'box'},
+    {'vagrant_box': {'name': ''}},
+    {'vagrant_box': {}},
+    {'vagrant_box': {'name': 1, 'version': 2}},
+    {'vagrant_box': {'name': 'box', 'provider': 'virtualbox'}},
+    {'vagrant_box': {'name': 'box', 'boot_timeout': 1, 'throttle_cpu': 100}},
+    {'vagrant_box': {'name': 'box', 'boot_timeout': -1, 'throttle_cpu': 1}},
+    {'vagrant_box': {'name': 'box', 'boot_timeout': True}},
+    {'vagrant_box': {'name': 'box', 'unknown': 1}, 'other': {}},
+    guest(ssh__insert_key='yes', synced_folder__id=1),
+    guest(provider_config__cpus=0, provider_config__memory=100000),
+    guest(provider_config__disk_bus='scsi', provider_config__nic_model_type=''),
+    guest(provider_config__nic_model_type='rtl8139'),
+    guest(provider_config__additional_storage_volumes=[{}]),
+    guest(provider_config__additional_storage_volumes=[
+        {'location': '/tmp/x', 'type': 'vmdk', 'bus': 'ide', 'device': 'hdb'},
+        'not-a-dict',
+        None,
+    ]),
+    guest(provider_config__additional_storage_volumes={'location': 'x'}),
+    guest(data_interfaces__0__local_port=97, data_interfaces__1__remote_port=-1),
+    guest(data_interfaces__1__remote_guest=None, data_interfaces__0__extra=1),
+    guest(data_interfaces='swp1'),
+    guest(data_interfaces=[[1, 2]]),
+    guest(internal_interfaces=[{'local_port': 3, 'remote_port': 'a'}]),
+    guest(reserved_interfaces=[{'local_port': 6}] * 12),
+    {f'field{i}': i for i in range(12)},
+]
+
+
+@pytest.mark.parametrize('schema', [guest_schema, guest_defaults_schema()])
+@pytest.mark.parametrize('document', guest_documents)
+def test_compiled_guest_schema_matches_cerberus(schema, document):
+    compiled = compile_schema(schema)
+    cerberus = Validator(schema)
+    assert compiled.validate(document) == cerberus.validate(document)
+    assert repr(compiled.errors) == repr(cerberus.errors)
+
+
+@pytest.mark.parametrize('schema_file, document', [
+    (GUEST_CONFIG_SCHEMA, {'data_interface_base': 'eth', 'management_interface': ''}),
+    (GUEST_CONFIG_SCHEMA, {'data_interface_base': '', 'data_interface_offset': None}),
+    (GUEST_CONFIG_SCHEMA, {'max_data_interfaces': 'x', 'reserved_interfaces': 1}),
+    (GUEST_PAIRS_SCHEMA, {'child': 'a', 'parent': 'b'}),
+    (GUEST_PAIRS_SCHEMA, {'child': ''}),
+])
+def test_compiled_config_schemas_match_cerberus(schema_file, document):
+    schema = load_data(schema_file)
+    compiled = compile_schema(schema)
+    cerberus = Validator(schema)
+    assert compiled.validate(document) == cerberus.validate(document)
+    assert compiled.errors == cerberus.errors
+
+
+def test_compiled_validator_does_not_mutate_document():
+    document = {'data_interface_base': 'eth', 'management_interface': ''}
+    compile_schema(load_data(GUEST_CONFIG_SCHEMA)).validate(document)
+    assert document == {'data_interface_base': 'eth', 'management_interface': ''}
+
+
+def test_compile_schema_with_unsupported_rule_returns_none():
+    assert compile_schema({'name': {'type': 'string', 'regex': '^a'}}) is None
+    assert compile_schema({'name': {'type': ['string', 'integer']}}) is None
+
+
+def test_compiled_validator_falls_back_for_non_dict_document():
+    compiled = compile_schema(guest_schema)
+    with pytest.raises(Exception) as compiled_error:
+        compiled.validate(None)
+    with pytest.raises(Exception) as cerberus_error:
+        Validator(guest_schema).validate(None)
+    assert compiled_error.type is cerberus_error.type
+
+
+def test_build_error_tree():
+    errors = [
+        (('b', 0, 'c'), ('min',), 'min value is 0'),
+        (('a',), ('type',), 'must be of string type'),
+        (('b', 0, 'c'), ('forbidden',), 'unallowed value 1'),
+    ]
+    assert build_error_tree(errors) == {
+        'a': ['must be of string type'],
+        'b': [{0: [{'c': ['unallowed value 1', 'min value is 0']}]}],
+    }
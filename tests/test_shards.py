@@ -0,0 +1,164 @@
+import pytest
+
+from grifter.shards import (
+    guest_weights,
+    colocated_groups,
+    partition_guests,
+    generate_cross_host_endpoints,
+)
+
+
+def make_guest(links, memory=2048, cpus=2, internal=()):
+    return {
+        'provider_config': {'memory': memory, 'cpus': cpus},
+        'internal_interfaces': [
+            {'local_port': 1, 'remote_guest': remote, 'remote_port': 1} for remote in internal],
+        'data_interfaces': [
+            {'local_port': local_port, 'remote_guest': remote_guest, 'remote_port': remote_port}
+            for local_port, remote_guest, remote_port in links],
+    }
+
+
+def make_connections(guests):
+    connections = []
+    for guest, data in guests.items():
+        for interface in data['data_interfaces']:
+            if interface['remote_guest'] != 'blackhole' and guest < interface['remote_guest']:
+                connections.append({
+                    'local_guest': guest,
+                    'local_port': interface['local_port'],
+                    'remote_guest': interface['remote_guest'],
+                    'remote_port': interface['remote_port'],
+                })
+    return connections
+
+
+def make_clusters(num_clusters, cluster_size):
+    """
+    Fully meshed clusters of guests, with the first guest of each cluster
+    linked to the first guest of the next cluster.
+    """
+    links = {}
+
+    def link(a, port_a, b, port_b):
+        links.setdefault(a, []).append((port_a, b, port_b))
+        links.setdefault(b, []).append((port_b, a, port_a))
+
+    for c in range(num_clusters):
+        members = [f'c{c}g{i}' for i in range(cluster_size)]
+        for i, a in enumerate(members):
+            for j, b in enumerate(members[i + 1:], i + 1):
+                link(a, j, b, i)
+        if c:
+            link(f'c{c - 1}g0', 20, f'c{c}g0', 21)
+    return {guest: make_guest(guest_links) for guest, guest_links in links.items()}
+
+
+def make_clos(num_spines, num_leaves, uplinks):
+    links = {}
+    for leaf in range(1, num_leaves + 1):
+        for spine in range(1, num_spines + 1):
+            for uplink in range(uplinks):
+                leaf_port = (spine - 1) * uplinks + uplink + 1
+                spine_port = (leaf - 1) * uplinks + uplink + 1
+                links.setdefault(f'leaf{leaf}', []).append((leaf_port, f'spine{spine}', spine_port))
+                links.setdefault(f'spine{spine}', []).append((spine_port, f'leaf{leaf}', leaf_port))
+    return {guest: make_guest(guest_links) for guest, guest_links in links.items()}
+
+
+def cross_host_links(shards, connections):
+    guest_shard = {guest: i for i, shard in enumerate(shards) for guest in shard}
+    return sum(1 for c in connections if guest_shard[c['local_guest']] != guest_shard[c['remote_guest']])
+
+
+def test_guest_weights_balance_memory_and_cpus():
+    guests = {'a': make_guest([], memory=3072, cpus=1), 'b': make_guest([], memory=1024, cpus=3)}
+    assert guest_weights(guests) == {'a': 1.0, 'b': 1.0}
+
+
+def test_colocated_groups_joins_internal_interfaces():
+    guests = {
+        'vcp': make_guest([], internal=['vfp']),
+        'vfp': make_guest([], internal=['vcp']),
+        'sw01': make_guest([]),
+    }
+    groups = colocated_groups(guests)
+    assert groups['vcp'] == groups['vfp']
+    assert groups['sw01'] == 'sw01'
+
+
+def test_partition_guests_keeps_clusters_together():
+    guests = make_clusters(num_clusters=4, cluster_size=4)
+    connections = make_connections(guests)
+    shards = partition_guests(guests, connections, 4)
+
+    assert sorted(len(shard) for shard in shards) == [4, 4, 4, 4]
+    assert cross_host_links(shards, connections) == 3
+    for shard in shards:
+        assert len({guest.split('g')[0] for guest in shard}) == 1
+
+
+def test_partition_guests_finds_the_minimum_cut_of_a_clos_fabric():
+    # Each spine with half the leaves is the only balanced cut with 8 of
+    # the 16 links between hosts.
+    guests = make_clos(num_spines=2, num_leaves=4, uplinks=2)
+    connections = make_connections(guests)
+    shards = partition_guests(guests, connections, 2)
+
+    assert sorted(len(shard) for shard in shards) == [3, 3]
+    assert cross_host_links(shards, connections) == 8
+    for shard in shards:
+        assert len([guest for guest in shard if guest.startswith('spine')]) == 1
+
+
+def test_partition_guests_places_every_guest_once():
+    guests = make_clusters(num_clusters=3, cluster_size=5)
+    shards = partition_guests(guests, make_connections(guests), 2)
+    assert sorted(g for shard in shards for g in shard) == sorted(guests)
+
+
+def test_partition_guests_keeps_colocated_guests_on_one_shard():
+    guests = {
+        'vcp': make_guest([], internal=['vfp']),
+        'vfp': make_guest([], internal=['vcp']),
+        'sw01': make_guest([]),
+        'sw02': make_guest([]),
+    }
+    shards = partition_guests(guests, [], 2)
+    assert any({'vcp', 'vfp'} <= set(shard) for shard in shards)
+
+
+def test_partition_guests_with_zero_shards_raises_value_error():
+    with pytest.raises(ValueError):
+        partition_guests({'a': make_guest([])}, [], 0)
+
+
+def test_generate_cross_host_endpoints_links_both_ends():
+    guests = {
+        'sw01': make_guest([(1, 'sw02', 1), (2, 'sw03', 1)]),
+        'sw02': make_guest([(1, 'sw01', 1)]),
+        'sw03': make_guest([(1, 'sw01', 2)]),
+    }
+    endpoints = generate_cross_host_endpoints(guests, [['sw01', 'sw03'], ['sw02']], ['10.0.0.1', '10.0.0.2'])
+
+    assert endpoints == {
+        ('sw01', 1): {'local_ip': '10.0.0.1', 'local_port': 20000,
+                      'remote_ip': '10.0.0.2', 'remote_port': 20000},
+        ('sw02', 1): {'local_ip': '10.0.0.2', 'local_port': 20000,
+                      'remote_ip': '10.0.0.1', 'remote_port': 20000},
+    }
+
+
+def test_generate_cross_host_endpoints_raises_on_one_sided_link():
+    guests = {
+        'sw01': make_guest([(1, 'sw02', 1)]),
+        'sw02': make_guest([]),
+    }
+    with pytest.raises(ValueError, match="sw01's local_port: 1 connects to sw02's port: 1 on another host, "
+                                         "but it is not connected back."):
+        generate_cross_host_endpoints(guests, [['sw01'], ['sw02']], ['10.0.0.1', '10.0.0.2'])
+
+
+def test_generate_cross_host_endpoints_needs_a_host_per_shard():
+    with pytest.raises(ValueError):
+        generate_cross_host_endpoints({}, [[], []], ['10.0.0.1'])
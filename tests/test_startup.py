@@ -0,0 +1,45 @@
+import subprocess
+import sys
+import time
+
+# Upper bound in seconds for `grifter --version` in a fresh interpreter.
+# Generous enough for slow CI runners, tight enough to catch a regression
+# that reintroduces YAML parsing or heavy imports at import time.
+STARTUP_BUDGET = 1.5
+
+HEAVY_MODULES = ['yaml', 'jinja2', 'cerberus']
+
+
+def run_python(code):
+    return subprocess.run(
+        [sys.executable, '-c', code],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True,
+    )
+
+
+def test_import_grifter_does_not_import_heavy_modules():
+    code = (
+        'import sys, grifter; '
+        f'print(",".join(m for m in {HEAVY_MODULES!r} if m in sys.modules))'
+    )
+    result = run_python(code)
+    assert result.returncode == 0
+    assert result.stdout.strip() == ''
+
+
+def test_import_grifter_does_not_load_guest_defaults():
+    code = (
+        'import grifter.constants as c; '
+        'print(c.get_all_guest_defaults.cache_info().currsize)'
+    )
+    result = run_python(code)
+    assert result.stdout.strip() == '0'
+
+
+def test_cli_version_startup_time_within_budget():
+    start = time.perf_counter()
+    result = run_python('from grifter import cli; cli(["--version"])')
+    elapsed = time.perf_counter() - start
+    assert result.returncode == 0
+    assert 'version' in result.stdout
+    assert elapsed < STARTUP_BUDGET
@@ -0,0 +1,55 @@
+import json
+
+from grifter.state import (
+    STATE_VERSION,
+    empty_state,
+    load_state,
+    save_state,
+    locked_state,
+)
+
+
+def test_load_state_with_missing_file_returns_empty_state(tmp_path):
+    assert load_state(str(tmp_path / 'state.json')) == empty_state()
+
+
+def test_load_state_with_invalid_json_returns_empty_state(tmp_path):
+    state_file = tmp_path / 'state.json'
+    state_file.write_text('{not json')
+    assert load_state(str(state_file)) == empty_state()
+
+
+def test_load_state_with_unknown_version_returns_empty_state(tmp_path):
+    state_file = tmp_path / 'state.json'
+    state_file.write_text(json.dumps({'version': STATE_VERSION + 1, 'domain_uuid': 'abc'}))
+    assert load_state(str(state_file)) == empty_state()
+
+
+def test_save_state_only_writes_changes(tmp_path):
+    state_file = str(tmp_path / 'state.json')
+    state = empty_state()
+    state['loopbacks'] = {'sw01': '127.2.0.1'}
+
+    assert save_state(state, state_file) is True
+    assert save_state(state, state_file) is False
+    assert load_state(state_file) == state
+
+
+def test_locked_state_saves_on_exit(tmp_path):
+    state_file = str(tmp_path / 'state.json')
+    with locked_state(state_file) as state:
+        state['domain_uuid'] = 'abc'
+
+    assert load_state(state_file)['domain_uuid'] == 'abc'
+
+
+def test_locked_state_does_not_save_on_error(tmp_path):
+    state_file = tmp_path / 'state.json'
+    try:
+        with locked_state(str(state_file)) as state:
+            state['domain_uuid'] = 'abc'
+            raise RuntimeError
+    except RuntimeError:
+        pass
+
+    assert not state_file.exists()
@@ -1,10 +1,15 @@
+import copy
 import pytest
 
 from grifter.utils import (
+    get_image_virtual_size,
     get_mac,
     remove_duplicates,
     sort_nicely,
-    dict_merge
+    natural_key,
+    dict_merge,
+    file_digest,
+    LayeredDict,
 )
 
 
@@ -22,6 +27,16 @@ def test_remote_duplicates():
     assert remove_duplicates(data) == expected
 
 
+def test_remove_duplicates_keeps_first_of_each_in_order():
+    data = [(4, 5, 6, 7), (0, 1, 2, 3), (6, 7, 4, 5), (0, 1, 2, 3)]
+    assert remove_duplicates(data) == [(4, 5, 6, 7), (0, 1, 2, 3)]
+
+
+def test_natural_key_compares_digits_as_numbers():
+    assert natural_key('swp10') > natural_key('swp9')
+    assert natural_key('ge-0/0/10') == ('ge-', 0, '/', 0, '/', 10, '')
+
+
 def test_sort_nicely():
     data = [
         'p1r50-ge-0/0/9 <--> p1sw10-swp5',
@@ -54,3 +69,61 @@ def test_dict_merge():
     b = {1: {"a": "A"}, 2: {"b": "D"}, 3: [{4: 5}], 4: {'x': 'y'}, 5: 6}
     expected = {1: {'a': 'A'}, 2: {'b': 'D', 'c': 'C'}, 3: [{4: 5}], 4: {'x': 'y'}, 5: 6}
     assert dict_merge(a, b) == expected
+
+
+def test_file_digest_ignores_prefixed_lines(tmp_path):
+    a = tmp_path / 'a'
+    b = tmp_path / 'b'
+    a.write_text('# Created: 1\nsame\n')
+    b.write_text('# Created: 2\nsame\n')
+    assert file_digest(a) != file_digest(b)
+    assert file_digest(a, ('# Created: ',)) == file_digest(b, ('# Created: ',))
+
+
+def test_layered_dict_matches_dict_merge():
+    a = {1: {"a": "A"}, 2: {"b": "B", "c": "C"}, 3: [{1: 2}], 6: 'x'}
+    b = {1: {"a": "A"}, 2: {"b": "D"}, 3: [{4: 5}], 4: {'x': 'y'}, 5: 6, 6: {'z': 1}}
+    expected = dict_merge(copy.deepcopy(a), copy.deepcopy(b))
+    layered = LayeredDict(a, b)
+    assert layered == expected
+    assert layered.to_dict() == expected
+    assert list(layered) == list(expected)
+
+
+def test_layered_dict_writes_do_not_modify_layers():
+    defaults = {'provider_config': {'cpus': 1, 'memory': 512}, 'data_interfaces': []}
+    host = {'provider_config': {'cpus': 2}}
+    layered = LayeredDict(defaults, host)
+
+    layered['provider_config']['memory'] = 1024
+    layered['data_interfaces'] = [1]
+    del layered['provider_config']['cpus']
+
+    assert layered.to_dict() == {'provider_config': {'memory': 1024}, 'data_interfaces': [1]}
+    assert defaults == {'provider_config': {'cpus': 1, 'memory': 512}, 'data_interfaces': []}
+    assert host == {'provider_config': {'cpus': 2}}
+
+
+def test_layered_dict_copy_is_independent():
+    layered = LayeredDict({'a': 1})
+    copied = copy.copy(layered)
+    copied['b'] = 2
+    assert 'b' not in layered
+    assert copied == {'a': 1, 'b': 2}
+
+
+def test_layered_dict_missing_key_raises_key_error():
+    with pytest.raises(KeyError):
+        LayeredDict({'a': 1})['b']
+
+
+def test_get_image_virtual_size_reads_qcow2_header(tmp_path):
+    image = tmp_path / 'image.qcow2'
+    image.write_bytes(b'QFI\xfb' + bytes(20) + (40 * 2 ** 30).to_bytes(8, 'big') + bytes(64))
+    assert get_image_virtual_size(str(image)) == 40 * 2 ** 30
+
+
+def test_get_image_virtual_size_of_raw_image_is_file_size(tmp_path):
+    image = tmp_path / 'image.img'
+    image.write_bytes(bytes(1024))
+    assert get_image_virtual_size(str(image)) == 1024
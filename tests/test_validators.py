@@ -10,9 +10,11 @@ from grifter.api import (
 from grifter.constants import (
     GUEST_SCHEMA_FILE,
     DEFAULT_CONFIG_FILE,
+    BLUEPRINT_EXAMPLE_FILE,
 )
 
 from grifter.loaders import load_data
+from grifter.utils import LayeredDict
 
 from grifter.validators import (
     validate_required_keys,
@@ -22,6 +24,12 @@ from grifter.validators import (
     validate_guest_interfaces,
     validate_data,
     validate_config,
+    get_validator,
+    load_schema,
+    validate_topology,
+    validate_tunnel_ports,
+    validate_blueprint,
+    validate_links,
 )
 
 config = load_data(DEFAULT_CONFIG_FILE)
@@ -146,3 +154,130 @@ def test_validate_config_default_config_returns_no_errors():
     default_config = get_default_config()
     result = validate_config(default_config)
     assert not result
+
+
+@pytest.mark.parametrize('engine', ['fast', 'cerberus'])
+def test_validate_blueprint_example_returns_no_errors(engine):
+    assert validate_blueprint(load_data(BLUEPRINT_EXAMPLE_FILE), engine) == []
+
+
+@pytest.mark.parametrize('engine', ['fast', 'cerberus'])
+def test_validate_blueprint_with_invalid_data_returns_errors(engine):
+    blueprint = {'topology': 'torus', 'nodes': {'count': 0, 'box': 'arista/veos'}}
+    assert validate_blueprint(blueprint, engine) == [{
+        'nodes': [{'count': ['min value is 1']}],
+        'topology': ['unallowed value torus'],
+    }]
+
+
+def test_get_validator_is_reused():
+    assert get_validator('guest') is get_validator('guest')
+    assert get_validator('guest') is not get_validator('guest_defaults')
+
+
+def test_validate_data_guest_defaults_does_not_mutate_cached_schema():
+    validate_data({'arista/veos': {'vagrant_box': {'version': '1'}}}, guest_default_data=True)
+    assert 'name' in load_schema(GUEST_SCHEMA_FILE)['vagrant_box']['schema']
+    assert validate_data({'sw01': {'vagrant_box': {'version': '1'}}})
+
+
+def test_validate_data_reports_errors_per_guest():
+    data = {
+        'sw01': {'vagrant_box': {'name': ''}},
+        'sw02': {'vagrant_box': {'name': 'arista/veos'}},
+        'sw03': {'vagrant_box': {'name': 'arista/veos', 'boot_timeout': 1}},
+    }
+    result = validate_data(data)
+    assert result == [
+        {'vagrant_box': [{'name': ['empty values not allowed']}]},
+        {'vagrant_box': [{'boot_timeout': ['unallowed value 1']}]},
+    ]
+
+
+def test_validate_topology_with_valid_data_returns_no_errors():
+    assert validate_topology(guest_data(), config, interface_mappings) == []
+
+
+def test_validate_topology_reports_all_errors():
+    data = guest_data()
+    data['sw03'] = copy.deepcopy(data['sw02'])
+    data['sw03']['vagrant_box']['name'] = 'blah/blah'
+    data['sw03']['data_interfaces'] = []
+    data['sw01']['data_interfaces'][0]['local_port'] = 100
+    data['sw01']['data_interfaces'][1]['remote_guest'] = 'sw99'
+    data['sw02']['data_interfaces'][1]['remote_port'] = 100
+    data['sw02']['data_interfaces'].append({'local_port': 1, 'remote_guest': 'blackhole', 'remote_port': 666})
+    data['sw02']['internal_interfaces'] = [1]
+
+    result = validate_topology(data, config, interface_mappings)
+    assert result == [
+        "sw03's vagrant box type: blah/blah is not defined in the config file.",
+        "sw01's local_port: 100 is outside the supported range.",
+        'sw99 is not defined in the guests file.',
+        'The number of internal interfaces for sw02: 1 is not equal to the arista/veos '
+        'internal interfaces value: 0.',
+        "Error with sw02's interface config.\nsw01's interface: 100 is outside the supported range.",
+        "sw02's local_port: 1 is defined more than once.",
+        "sw01's local_port: 100 connects to sw02's port: 1, but sw02's local_port: 1 "
+        "is connected to sw01's port: 1.",
+        "sw02's local_port: 1 connects to sw01's port: 1, but sw01's local_port: 1 "
+        "is not connected back.",
+    ]
+
+
+def test_validate_topology_reports_asymmetric_links():
+    data = guest_data()
+    data['sw02']['data_interfaces'][1]['remote_guest'] = 'blackhole'
+    data['sw02']['data_interfaces'][1]['remote_port'] = 666
+    result = validate_topology(data, config, interface_mappings)
+    assert result == [
+        "sw01's local_port: 2 connects to sw02's port: 2, but sw02's local_port: 2 "
+        "is not connected back."
+    ]
+
+
+def test_validate_links_reports_double_booked_ports_and_asymmetric_links():
+    data = guest_data()
+    data['sw01']['data_interfaces'][1]['local_port'] = 1
+    data['sw02']['data_interfaces'][1]['remote_guest'] = 'blackhole'
+    data['sw02']['data_interfaces'][0]['remote_port'] = 2
+    assert validate_links(data) == [
+        "sw01's local_port: 1 is defined more than once.",
+        "sw01's local_port: 1 connects to sw02's port: 1, but sw02's local_port: 1 "
+        "is connected to sw01's port: 2.",
+        "sw02's local_port: 1 connects to sw01's port: 2, but sw01's local_port: 2 "
+        "is not connected back.",
+    ]
+
+
+@pytest.mark.parametrize('engine', ['fast', 'cerberus'])
+def test_validate_config_with_layered_user_config(engine):
+    user_config = {'guest_config': {'arista/veos': {'max_data_interfaces': 'x'}}}
+    merged_config = LayeredDict(get_default_config(), user_config)
+    result = validate_config(merged_config, engine)
+    assert result == [{'max_data_interfaces': ['must be of integer type']}]
+    assert 'data_interface_offset' not in user_config['guest_config']['arista/veos']
+
+
+def test_validate_tunnel_ports_with_ports_in_range_returns_no_errors():
+    assert validate_tunnel_ports(mock_guest_data) == []
+
+
+def test_validate_tunnel_ports_separates_interface_types():
+    guests = {'sw01': {
+        'internal_interfaces': [{'local_port': 1, 'remote_guest': 'sw01', 'remote_port': 2}],
+        'reserved_interfaces': [{'local_port': 1, 'remote_guest': 'blackhole', 'remote_port': 666}],
+        'data_interfaces': [{'local_port': 1, 'remote_guest': 'blackhole', 'remote_port': 666}],
+    }}
+    assert validate_tunnel_ports(guests) == []
+
+
+def test_validate_tunnel_ports_reports_ports_colliding_with_the_next_range():
+    guests = {'sw01': {
+        'data_interfaces': [{'local_port': 999, 'remote_guest': 'blackhole', 'remote_port': 666}],
+        'internal_interfaces': [{'local_port': 1000, 'remote_guest': 'sw01', 'remote_port': 1001}],
+    }}
+    assert validate_tunnel_ports(guests) == [
+        "sw01's internal_interfaces local_port: 1000 is outside the internal_interfaces "
+        "UDP tunnel port range: 11000-11999.",
+    ]